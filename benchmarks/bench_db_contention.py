@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+SQLite contention benchmark: a price sweep writing while many handlers read
+
+One thread writes sweep results through PriceWriter (chunked commits, history
+and stats) in a loop, while reader threads run the /start user lookup and the
+/list wishlist query. Compares the storage profiles from models/database.py on
+a throwaway database file.
+
+Usage:
+  python benchmarks/bench_db_contention.py [--profile tuned|default|both] [--readers 16] [--seconds 10]
+                                           [--dir /path/on/the/real/disk]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from bot.core.price_writer import PriceWriter
+from models.database import make_engine
+from models.migrations import migrate
+from models.models import User, Game, UserWishlist, PriceStats
+
+
+def seed(engine, users: int, games: int, wishlist_size: int):
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{'telegram_id': 1000 + i, 'region': 'us'} for i in range(users)])
+        conn.execute(insert(Game), [{'source_id': f'game-{i}', 'title': f'Game {i}', 'currency': 'USD',
+                                     'last_price_cents': 5999} for i in range(games)])
+        rng = random.Random(1)
+        conn.execute(insert(UserWishlist), [
+            {'user_id': user_id, 'game_id': game_id, 'desired_price_cents': 3999}
+            for user_id in range(1, users + 1)
+            for game_id in rng.sample(range(1, games + 1), wishlist_size)
+        ])
+
+
+def writer(sessions, games: int, chunk: int, stop: threading.Event, stats: dict):
+    """Sweep the catalog over and over, as the scheduler would"""
+    checked_at = datetime(2026, 1, 1)
+    rng = random.Random(2)
+    while not stop.is_set():
+        checked_at += timedelta(hours=12)
+        db = sessions()
+        try:
+            price_writer = PriceWriter(db, chunk_size=chunk)
+            for game_id in range(1, games + 1):
+                if stop.is_set():
+                    break
+                price = rng.choice((59.99, 59.99, 59.99, 29.99))
+                price_writer.add(game_id, {'current_price': price, 'original_price': 59.99,
+                                           'discount_percent': 50 if price < 59.99 else 0, 'currency': 'USD'},
+                                 checked_at)
+            price_writer.flush()
+            stats['games'] += price_writer.games_written
+            stats['chunks'] += price_writer.chunks
+        except OperationalError:
+            stats['errors'] += 1
+            db.rollback()
+        finally:
+            db.close()
+
+
+def reader(sessions, users: int, stop: threading.Event, timings: list, errors: list):
+    """The two queries every handler starts with"""
+    rng = random.Random(threading.get_ident())
+    while not stop.is_set():
+        start = time.perf_counter()
+        db = sessions()
+        try:
+            user = db.query(User).filter(User.telegram_id == 1000 + rng.randrange(users)).first()
+            (
+                db.query(UserWishlist, Game, PriceStats)
+                .join(Game, UserWishlist.game_id == Game.id)
+                .outerjoin(PriceStats, PriceStats.game_id == Game.id)
+                .filter(UserWishlist.user_id == user.id)
+                .all()
+            )
+            timings.append(time.perf_counter() - start)
+        except OperationalError:
+            errors.append(1)
+        finally:
+            db.close()
+
+
+def run(profile: str, args) -> dict:
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        write_engine = make_engine(url, profile=profile)
+        # The default profile has one pool for everything, like the original setup
+        read_engine = make_engine(url, read_only=True, profile=profile) if profile == 'tuned' else write_engine
+        seed(write_engine, args.users, args.games, args.wishlist)
+
+        stop = threading.Event()
+        writer_stats = {'games': 0, 'chunks': 0, 'errors': 0}
+        timings, errors = [], []
+        threads = [threading.Thread(target=writer, args=(sessionmaker(bind=write_engine), args.games, args.chunk,
+                                                         stop, writer_stats))]
+        threads += [threading.Thread(target=reader, args=(sessionmaker(bind=read_engine), args.users, stop,
+                                                          timings, errors))
+                    for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        write_engine.dispose()
+        read_engine.dispose()
+
+    cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else [0.0] * 99
+    return {
+        'profile': profile,
+        'reads_per_second': len(timings) / args.seconds,
+        'read_p50_ms': cuts[49] * 1000,
+        'read_p95_ms': cuts[94] * 1000,
+        'read_p99_ms': cuts[98] * 1000,
+        'read_errors': len(errors),
+        'games_written_per_second': writer_stats['games'] / args.seconds,
+        'write_errors': writer_stats['errors'],
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="SQLite read/write contention benchmark")
+    arg_parser.add_argument("--profile", choices=("tuned", "default", "both"), default="both")
+    arg_parser.add_argument("--readers", type=int, default=16)
+    arg_parser.add_argument("--seconds", type=float, default=10)
+    arg_parser.add_argument("--users", type=int, default=2000)
+    arg_parser.add_argument("--games", type=int, default=5000)
+    arg_parser.add_argument("--wishlist", type=int, default=10, help="games per user")
+    arg_parser.add_argument("--chunk", type=int, default=500, help="games per write transaction")
+    arg_parser.add_argument("--dir", help="where to create the database (use the disk the bot runs on)")
+    args = arg_parser.parse_args()
+
+    profiles = ("default", "tuned") if args.profile == "both" else (args.profile,)
+    print(f"🧪 {args.readers} readers vs one sweep writer for {args.seconds:.0f}s per profile\n")
+    print(f"{'profile':<10}{'reads/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'read err':>10}"
+          f"{'games/s':>10}{'write err':>11}")
+    for profile in profiles:
+        r = run(profile, args)
+        print(f"{r['profile']:<10}{r['reads_per_second']:>10.0f}{r['read_p50_ms']:>9.2f}{r['read_p95_ms']:>9.2f}"
+              f"{r['read_p99_ms']:>9.2f}{r['read_errors']:>10}{r['games_written_per_second']:>10.0f}"
+              f"{r['write_errors']:>11}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Sweep parsing throughput: pages parsed in a thread (the default) vs the ParsePool worker processes
+
+Parses the recorded item and listing pages in fixtures/dekudeals many times over,
+all submitted at once the way a sweep batch completes. No network needed.
+
+Usage:
+  python benchmarks/bench_parse_pool.py [--pages 2000] [--workers 4] [--chunk 8]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_scraper import CURRENCIES, item_ids, read_fixture
+from benchmarks.fixture_server import REGIONS
+from providers.deku_deals_parser import DekuDealsParser
+from providers.parse_pool import ParsePool, PARSE_CHUNK_SIZE
+
+BASE_URL = "https://www.dekudeals.com"
+
+
+def sweep_jobs(pages: int):
+    """(method, content, args) for item and listing pages, repeated up to the requested count"""
+    recorded = []
+    for region in REGIONS:
+        currency = CURRENCIES[region]
+        recorded.append(("parse_listing", read_fixture(region, "deals.html"), (currency,)))
+        for game_id in item_ids(region):
+            recorded.append(("parse_game_page", read_fixture(region, f"item_{game_id}.html"),
+                             (game_id, currency, f"{BASE_URL}/items/{game_id}")))
+    return [recorded[i % len(recorded)] for i in range(pages)]
+
+
+async def run_threaded(parser, jobs):
+    # Same as the provider without a pool: one to_thread call per page
+    return await asyncio.gather(*(asyncio.to_thread(getattr(parser, method), content, *args)
+                                  for method, content, args in jobs))
+
+
+async def run_pool(parser, jobs, pool):
+    return await asyncio.gather(*(pool.parse(parser, method, content, *args) for method, content, args in jobs))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Parse worker pool throughput benchmark")
+    arg_parser.add_argument("--pages", type=int, default=2000)
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    arg_parser.add_argument("--chunk", type=int, default=PARSE_CHUNK_SIZE, help="pages per worker task")
+    args = arg_parser.parse_args()
+
+    parser = DekuDealsParser(BASE_URL)
+    jobs = sweep_jobs(args.pages)
+
+    start = time.perf_counter()
+    threaded = asyncio.run(run_threaded(parser, jobs))
+    threaded_seconds = time.perf_counter() - start
+
+    pool = ParsePool(workers=args.workers, chunk_size=args.chunk)
+    asyncio.run(run_pool(parser, jobs[:args.workers], pool))  # start the workers outside the timing
+    start = time.perf_counter()
+    pooled = asyncio.run(run_pool(parser, jobs, pool))
+    pooled_seconds = time.perf_counter() - start
+    pool.shutdown()
+
+    assert pooled == threaded, "worker results differ from in-process parsing"
+    print(f"🧪 {args.pages} pages, {args.workers} workers, {args.chunk} pages per task\n")
+    print(f"{'mode':<10}{'seconds':>10}{'pages/s':>10}")
+    print(f"{'thread':<10}{threaded_seconds:>10.2f}{args.pages / threaded_seconds:>10.0f}")
+    print(f"{'pool':<10}{pooled_seconds:>10.2f}{args.pages / pooled_seconds:>10.0f}")
+    print(f"\n⚡ {threaded_seconds / pooled_seconds:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark DekuDeals parser backends on recorded pages
+
+Usage: python benchmarks/bench_parser.py [fixtures_dir] [--repeat N]
+"""
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers.deku_deals_parser import DekuDealsParser, LXML_AVAILABLE
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "dekudeals")
+
+
+def load_pages(fixtures_dir: str):
+    """Load recorded pages as (kind, name, content) tuples"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "**", "*.html"), recursive=True)):
+        name = os.path.relpath(path, fixtures_dir)
+        kind = "item" if os.path.basename(path).startswith("item_") else "listing"
+        with open(path, "rb") as f:
+            pages.append((kind, name, f.read()))
+    return pages
+
+
+def parse_page(parser: DekuDealsParser, kind: str, name: str, content: bytes):
+    if kind == "item":
+        game_id = os.path.basename(name)[len("item_"):-len(".html")]
+        return parser.parse_game_page(content, game_id, "USD", "")
+    return parser.parse_listing(content, "USD")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("fixtures_dir", nargs="?", default=DEFAULT_FIXTURES)
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    pages = load_pages(args.fixtures_dir)
+    if not pages:
+        print(f"❌ No recorded pages found in {args.fixtures_dir}")
+        return 1
+
+    backends = ["html.parser"] + (["lxml"] if LXML_AVAILABLE else [])
+    configs = [(backend, selective) for backend in backends for selective in (False, True)]
+    if not LXML_AVAILABLE:
+        print("⚠️ lxml is not installed, benchmarking html.parser only")
+
+    # Every backend must produce exactly what the reference (full html.parser) produces
+    reference = DekuDealsParser(backend="html.parser", selective=False)
+    expected = [parse_page(reference, *page) for page in pages]
+
+    total_bytes = sum(len(content) for _, _, content in pages)
+    print(f"📄 {len(pages)} pages, {total_bytes / 1024:.0f} KiB, {args.repeat} rounds\n")
+    print(f"{'backend':<14}{'mode':<11}{'ms/page':>9}{'p95 ms':>9}{'pages/s':>10}{'speedup':>9}  same output")
+
+    baseline = None
+    for backend, selective in configs:
+        parser = DekuDealsParser(backend=backend, selective=selective)
+        results = [parse_page(parser, *page) for page in pages]
+        same = results == expected
+
+        timings = []
+        for _ in range(args.repeat):
+            for page in pages:
+                start = time.perf_counter()
+                parse_page(parser, *page)
+                timings.append(time.perf_counter() - start)
+
+        mean = statistics.mean(timings)
+        p95 = statistics.quantiles(timings, n=20)[-1]
+        baseline = baseline or mean
+        mode = "selective" if selective else "full"
+        print(f"{backend:<14}{mode:<11}{mean * 1000:>9.2f}{p95 * 1000:>9.2f}{1 / mean:>10.1f}"
+              f"{baseline / mean:>8.1f}x  {'✅' if same else '❌'}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Offline scraper benchmark: parse speed, latency percentiles and allocations on recorded DekuDeals pages
+
+Runs search_games, get_game_info and _extract_price_info against the fixtures in
+fixtures/dekudeals, end-to-end through a local stand-in server. No network needed.
+
+Usage:
+  python benchmarks/bench_scraper.py [--repeat N] [--json results.json]
+  python benchmarks/bench_scraper.py --baseline results.json --max-regression 0.25
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixture_server import FIXTURES_DIR, REGIONS, FixtureServer
+from providers.base_provider import CURRENCY_BY_REGION
+from providers.deku_deals_parser import DekuDealsParser, GAME_PAGE_STRAINER
+from providers.deku_deals_provider import AsyncDekuDealsProvider
+
+SEARCH_QUERIES = ("zelda", "mario", "pokemon", "kirby")
+CURRENCIES = CURRENCY_BY_REGION
+
+
+def item_ids(region: str):
+    """Game ids that have a recorded item page"""
+    pattern = os.path.join(FIXTURES_DIR, region, "item_*.html")
+    return [os.path.basename(path)[len("item_"):-len(".html")] for path in sorted(glob.glob(pattern))]
+
+
+def read_fixture(region: str, name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, region, name), "rb") as f:
+        return f.read()
+
+
+def summarize(name: str, timings, alloc_bytes=None) -> dict:
+    """Turn per-call timings (seconds) into the reported metrics"""
+    cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else [timings[0]] * 99
+    mean = statistics.mean(timings)
+    result = {
+        "name": name,
+        "calls": len(timings),
+        "pages_per_second": 1 / mean if mean else 0.0,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+    }
+    if alloc_bytes is not None:
+        result["peak_alloc_kib"] = max(alloc_bytes) / 1024
+        result["mean_alloc_kib"] = statistics.mean(alloc_bytes) / 1024
+    return result
+
+
+def time_calls(calls, repeat: int):
+    """Time every zero-argument callable `repeat` times"""
+    timings = []
+    for _ in range(repeat):
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def measure_allocations(calls):
+    """Peak traced memory per call, in bytes"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for call in calls:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            call()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def bench_parsing(parser: DekuDealsParser, repeat: int):
+    """Parse-only benchmarks on the raw fixture bytes"""
+    search_calls, item_calls, price_calls = [], [], []
+    for region in REGIONS:
+        currency = CURRENCIES[region]
+        search_page = read_fixture(region, "search.html")
+        for query in SEARCH_QUERIES:
+            search_calls.append(lambda c=search_page, q=query, cur=currency: parser.parse_search_results(c, q, cur))
+        for game_id in item_ids(region):
+            page = read_fixture(region, f"item_{game_id}.html")
+            item_calls.append(lambda c=page, g=game_id, cur=currency: parser.parse_game_page(c, g, cur, ""))
+            soup = parser._make_soup(page, GAME_PAGE_STRAINER)
+            price_calls.append(lambda s=soup: parser._extract_price_info(s))
+
+    results = []
+    for name, calls in (("parse search page", search_calls), ("parse item page", item_calls),
+                        ("_extract_price_info", price_calls)):
+        timings = time_calls(calls, repeat)
+        results.append(summarize(name, timings, measure_allocations(calls)))
+    return results
+
+
+async def bench_provider(base_url: str, repeat: int):
+    """End-to-end search_games / get_game_info through the local stand-in server"""
+    provider = AsyncDekuDealsProvider(base_url=base_url)
+    results = []
+    try:
+        async def timed(call_factories):
+            timings = []
+            for _ in range(repeat):
+                for factory in call_factories:
+                    start = time.perf_counter()
+                    await factory()
+                    timings.append(time.perf_counter() - start)
+            return timings
+
+        searches = [lambda q=query, r=region: provider.search_games(q, r)
+                    for region in REGIONS for query in SEARCH_QUERIES]
+        items = [lambda g=game_id, r=region: provider.get_game_info(g, r)
+                 for region in REGIONS for game_id in item_ids(region)]
+
+        results.append(summarize("search_games", await timed(searches)))
+        results.append(summarize("get_game_info", await timed(items)))
+    finally:
+        await provider.close()
+    return results
+
+
+def print_results(results):
+    print(f"{'benchmark':<22}{'calls':>7}{'pages/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'peak KiB':>10}")
+    for r in results:
+        alloc = f"{r['peak_alloc_kib']:>10.0f}" if "peak_alloc_kib" in r else f"{'-':>10}"
+        print(f"{r['name']:<22}{r['calls']:>7}{r['pages_per_second']:>10.1f}"
+              f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{alloc}")
+
+
+def check_regressions(results, baseline_path: str, max_regression: float) -> bool:
+    """Compare p50 latency with a saved baseline; True if everything is within tolerance"""
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+    ok = True
+    for r in results:
+        base = baseline.get(r["name"])
+        if not base:
+            continue
+        change = r["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0.0
+        if change > max_regression:
+            ok = False
+            print(f"❌ {r['name']}: p50 {base['p50_ms']:.2f} -> {r['p50_ms']:.2f} ms (+{change:.0%})")
+        else:
+            print(f"✅ {r['name']}: p50 {base['p50_ms']:.2f} -> {r['p50_ms']:.2f} ms ({change:+.0%})")
+    return ok
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Offline DekuDeals scraper benchmark")
+    arg_parser.add_argument("--repeat", type=int, default=10)
+    arg_parser.add_argument("--json", help="write results to this file")
+    arg_parser.add_argument("--baseline", help="compare with results saved by --json")
+    arg_parser.add_argument("--max-regression", type=float, default=0.25,
+                            help="allowed p50 slowdown vs baseline (0.25 = 25%%)")
+    args = arg_parser.parse_args()
+
+    parser = DekuDealsParser()
+    print(f"🧪 Scraper benchmark (backend: {parser.backend}, selective: {parser.selective}, repeat: {args.repeat})\n")
+
+    results = bench_parsing(parser, args.repeat)
+    with FixtureServer() as server:
+        results += asyncio.run(bench_provider(server.base_url, args.repeat))
+        requests_served = server.request_count
+
+    print_results(results)
+    print(f"\n🌐 {requests_served} requests served by the local fixture server")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backend": parser.backend, "selective": parser.selective, "results": results}, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+    if args.baseline:
+        print()
+        if not check_regressions(results, args.baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
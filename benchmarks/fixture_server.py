@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for DekuDeals that serves the recorded pages in fixtures/dekudeals
+
+Usage: python benchmarks/fixture_server.py [--port 8800]
+"""
+
+import argparse
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "dekudeals")
+REGIONS = ("us", "eu", "jp")
+
+
+def region_from_language(accept_language: str) -> str:
+    """Reverse the provider's region-specific Accept-Language header"""
+    if accept_language.startswith("en-GB"):
+        return "eu"
+    if accept_language.startswith("ja"):
+        return "jp"
+    return "us"
+
+
+def fixture_path(fixtures_dir: str, region: str, path: str):
+    """Map a DekuDeals URL path to a recorded page, or None"""
+    if path == "/search":
+        name = "search.html"
+    elif path == "/deals":
+        name = "deals.html"
+    elif path.startswith("/items/"):
+        name = f"item_{path[len('/items/'):]}.html"
+    else:
+        return None
+    full_path = os.path.join(fixtures_dir, region, name)
+    return full_path if os.path.isfile(full_path) else None
+
+
+class FixtureRequestHandler(BaseHTTPRequestHandler):
+    """Serves recorded pages with ETag support so conditional requests can be exercised"""
+
+    fixtures_dir = FIXTURES_DIR
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real site
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def do_GET(self):
+        self.server.request_count += 1
+        region = region_from_language(self.headers.get("Accept-Language", ""))
+        path = fixture_path(self.fixtures_dir, region, urlparse(self.path).path)
+        if path is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        with open(path, "rb") as f:
+            body = f.read()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """Runs the fixture server on a background thread: `with FixtureServer() as server: server.base_url`"""
+
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR, port: int = 0):
+        handler = type("Handler", (FixtureRequestHandler,), {"fixtures_dir": fixtures_dir})
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.request_count = 0
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self) -> int:
+        return self.httpd.request_count
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--port", type=int, default=8800)
+    args = arg_parser.parse_args()
+
+    server = FixtureServer(port=args.port)
+    print(f"🚀 Serving {FIXTURES_DIR} on {server.base_url}")
+    print("⏹️  Press Ctrl+C to stop")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,22 +1,30 @@
 import asyncio
+import hashlib
 import os
 import logging
 from aiogram import Bot, Dispatcher
 from aiogram.enums import ParseMode
 from aiogram.filters import Command
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton
+from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, Update
 from datetime import datetime
 from dotenv import load_dotenv
 
-from models.database import get_db
 from models.models import User, Game, UserWishlist
 from providers.deku_deals_provider import DekuDealsProvider
 from .scheduler import price_checker
+from bot.core.state_storage import make_state_storage
 
 # Load environment variables
 load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
+# polling: one process calls getUpdates | webhook: Telegram posts updates to the FastAPI app in main.py
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # public https base URL, e.g. https://deals.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram/webhook')
+# Telegram echoes this in every webhook request; derived from the token so all workers agree by default
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or hashlib.sha256(f"webhook:{BOT_TOKEN}".encode()).hexdigest()[:32]
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -26,15 +34,19 @@ logger = logging.getLogger(__name__)
 
 # Initialize bot and dispatcher
 bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
+dp = Dispatcher(storage=make_state_storage())
 
 # Initialize price provider
 price_provider = DekuDealsProvider()
 
 from .handlers.keyboards import get_main_menu_keyboard
 from .handlers import commands, callbacks, messages
+from .handlers.middleware import setup_db_middleware
 from bot.core.user_manager import UserManager
 
+# One database session per update, closed when the handler returns
+setup_db_middleware(dp)
+
 # Register command handlers
 commands.register_commands(dp)
 
@@ -44,9 +56,6 @@ callbacks.register_callbacks(dp)
 # Register message handlers
 messages.register_messages(dp)
 
-# Import shared state from commands module
-from .handlers.commands import search_results, user_states
-
 # Payment handlers
 @dp.pre_checkout_query()
 async def process_pre_checkout_query(pre_checkout_query):
@@ -54,7 +63,7 @@ async def process_pre_checkout_query(pre_checkout_query):
     await bot.answer_pre_checkout_query(pre_checkout_query.id, ok=True)
 
 @dp.message(lambda message: message.successful_payment is not None)
-async def process_successful_payment(message):
+async def process_successful_payment(message, db):
     """Handle successful payment"""
     user_id = message.from_user.id
     payment = message.successful_payment
@@ -62,7 +71,7 @@ async def process_successful_payment(message):
     logger.info(f"User {user_id} made payment: {payment.total_amount} {payment.currency}")
 
     # Add premium purchase for the user (+5 games for 6 months)
-    success = UserManager.add_premium_purchase(user_id, bonus_games=5, months=6)
+    success = await asyncio.to_thread(UserManager.add_premium_purchase, user_id, 5, 6, db)
 
     if success:
         await message.reply(
@@ -82,14 +91,40 @@ async def process_successful_payment(message):
 
 
 
-async def main():
-    """Main function to start the bot"""
+async def migrate_database():
+    """Bring the schema up to date off the event loop; data backfills continue in the background"""
+    from models.database import engine, SessionLocal
+    from models.migrations import migrate, pending_backfills, run_backfills
+    await asyncio.to_thread(migrate, engine)
+    if await asyncio.to_thread(pending_backfills, engine):
+        asyncio.get_running_loop().run_in_executor(None, run_backfills, SessionLocal)
+
+
+async def set_webhook():
+    """Point Telegram at this deployment; called by the leader worker"""
+    await bot.set_webhook(
+        f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types()
+    )
+    logger.info(f"Webhook set to {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+
+
+async def feed_webhook_update(payload: dict):
+    """Run one update received on the webhook through the dispatcher"""
+    update = Update.model_validate(payload, context={"bot": bot})
+    await dp.feed_update(bot, update)
+
+
+async def main(migrate: bool = True):
+    """Main function to start the bot; pass migrate=False when the caller has already migrated"""
     logger.info("Starting Nintendo Deals Bot...")
 
-    # Create database tables
-    from models.database import engine
-    from models.models import Base
-    Base.metadata.create_all(bind=engine)
+    if migrate:
+        await migrate_database()
+
+    # A webhook left over from webhook mode would make getUpdates fail
+    await bot.delete_webhook()
 
     # Start polling with error handling for conflicts
     while True:
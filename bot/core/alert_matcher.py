@@ -0,0 +1,68 @@
+import logging
+from typing import Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import or_
+
+from models.models import User, Game, UserWishlist, PriceStats
+
+logger = logging.getLogger(__name__)
+
+# Game ids per IN (...) list, well below SQLite's bound parameter limit
+MATCH_CHUNK_SIZE = 500
+
+
+class AlertMatch(NamedTuple):
+    """One wishlist entry whose price alert should fire"""
+    wishlist_id: int
+    user_id: int
+    telegram_id: int
+    game_id: int
+    source_id: str
+    title: str
+    currency: Optional[str]
+    price_cents: int
+    desired_price_cents: int
+    all_time_low_cents: Optional[int]
+
+
+class AlertMatcher:
+    """Finds the wishlist entries that should be notified with one joined query per chunk of games.
+
+    The stored games.last_price_cents is compared against every wishlist's
+    desired price and last notified price in SQL, so only firing rows come back.
+    """
+
+    def __init__(self, chunk_size: int = MATCH_CHUNK_SIZE):
+        self.chunk_size = max(1, chunk_size)
+
+    def _query(self, db):
+        return (
+            db.query(
+                UserWishlist.id, User.id, User.telegram_id,
+                Game.id, Game.source_id, Game.title, Game.currency,
+                Game.last_price_cents, UserWishlist.desired_price_cents, PriceStats.all_time_low_cents
+            )
+            .join(User, User.id == UserWishlist.user_id)
+            .join(Game, Game.id == UserWishlist.game_id)
+            .outerjoin(PriceStats, PriceStats.game_id == Game.id)
+            .filter(
+                Game.last_price_cents.isnot(None),
+                UserWishlist.desired_price_cents > 0,
+                Game.last_price_cents <= UserWishlist.desired_price_cents,
+                or_(
+                    UserWishlist.last_notified_price_cents.is_(None),
+                    Game.last_price_cents < UserWishlist.last_notified_price_cents
+                )
+            )
+        )
+
+    def match(self, db, game_ids: Iterable[int]) -> List[AlertMatch]:
+        """Alerts to fire for the given games, based on their stored current price"""
+        game_ids = list(dict.fromkeys(game_ids))
+        matches = []
+        for start in range(0, len(game_ids), self.chunk_size):
+            chunk = game_ids[start:start + self.chunk_size]
+            rows = self._query(db).filter(UserWishlist.game_id.in_(chunk)).all()
+            matches.extend(AlertMatch(*row) for row in rows)
+        logger.debug(f"{len(matches)} alerts matched for {len(game_ids)} games")
+        return matches
@@ -0,0 +1,269 @@
+import logging
+import math
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from bot.core.price_writer import GameRef, GAME_REF_COLUMNS, load_game_refs
+from models.models import Game, UserWishlist, PriceHistory, GameCheckSchedule
+
+logger = logging.getLogger(__name__)
+
+# Adaptive scheduling tuning (can be overridden from environment)
+PRICE_CHECK_MODE = os.getenv('PRICE_CHECK_MODE', 'adaptive')  # adaptive | sliced | fixed
+PRICE_CHECKS_PER_GAME_PER_DAY = float(os.getenv('PRICE_CHECKS_PER_GAME_PER_DAY', 2))  # average request budget
+PRICE_CHECK_MIN_INTERVAL = int(os.getenv('PRICE_CHECK_MIN_INTERVAL', 3600))  # seconds, hottest games
+PRICE_CHECK_MAX_INTERVAL = int(os.getenv('PRICE_CHECK_MAX_INTERVAL', 3 * 86400))  # seconds, dead games
+PRICE_CHECK_TICK_SECONDS = int(os.getenv('PRICE_CHECK_TICK_SECONDS', 300))
+PRICE_CHECK_REPLAN_SECONDS = int(os.getenv('PRICE_CHECK_REPLAN_SECONDS', 3600))
+SALE_WINDOWS = os.getenv('SALE_WINDOWS', '')  # recurring sales, e.g. "11-20:11-30,12-15:01-05"
+
+VOLATILITY_WINDOW_DAYS = 30
+# Game ids per IN (...) list, well below SQLite's bound parameter limit
+PLAN_CHUNK_SIZE = 500
+DAY_SECONDS = 86400
+
+
+def parse_sale_windows(spec: str) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """Parse "MM-DD:MM-DD,..." into ((start_month, start_day), (end_month, end_day)) pairs"""
+    windows = []
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        try:
+            start, end = part.split(':')
+            start_month, start_day = (int(x) for x in start.split('-'))
+            end_month, end_day = (int(x) for x in end.split('-'))
+            windows.append(((start_month, start_day), (end_month, end_day)))
+        except ValueError:
+            logger.warning(f"Ignoring invalid sale window '{part}'")
+    return windows
+
+
+def in_sale_window(when: datetime, windows) -> bool:
+    """Whether a date falls into one of the recurring sale windows (windows may wrap the new year)"""
+    day = (when.month, when.day)
+    for start, end in windows:
+        if start <= end:
+            if start <= day <= end:
+                return True
+        elif day >= start or day <= end:
+            return True
+    return False
+
+
+def priority_score(wishlist_count: int, price_changes: int, current_price_cents: Optional[int],
+                   desired_price_cents: Optional[int], on_sale: bool = False,
+                   sale_window: bool = False) -> float:
+    """How much a game deserves to be checked, relative to other games (1.0 = baseline)"""
+    score = 1 + math.log2(1 + wishlist_count)
+
+    # Prices that moved recently are likely to move again
+    score *= 1 + min(price_changes, 10) / 2
+
+    # Prices close to (or under) a user's target are worth watching closely
+    if current_price_cents and desired_price_cents:
+        gap = (current_price_cents - desired_price_cents) / current_price_cents
+        closeness = 1.0 if gap <= 0 else max(0.0, 1 - gap / 0.5)
+        score *= 1 + 2 * closeness
+
+    # A running sale will end, and seasonal sales start many discounts at once
+    if on_sale:
+        score *= 1.5
+    if sale_window:
+        score *= 2
+    return score
+
+
+def allocate_intervals(scores: Dict[int, float], daily_budget: float,
+                       min_interval: int = PRICE_CHECK_MIN_INTERVAL,
+                       max_interval: int = PRICE_CHECK_MAX_INTERVAL) -> Dict[int, int]:
+    """Split a daily request budget between games in proportion to their scores.
+
+    Each game gets checks_per_day = budget * score / total_score, clamped to the
+    min/max interval; budget freed or consumed by clamping is redistributed
+    over the remaining games.
+    """
+    if not scores:
+        return {}
+    max_rate = DAY_SECONDS / min_interval
+    min_rate = DAY_SECONDS / max_interval
+
+    rates: Dict[int, float] = {}
+    free = dict(scores)
+    budget = daily_budget
+    while free:
+        total = sum(free.values())
+        clamped = {}
+        for game_id, score in free.items():
+            rate = budget * score / total if total else min_rate
+            if rate > max_rate:
+                clamped[game_id] = max_rate
+            elif rate < min_rate:
+                clamped[game_id] = min_rate
+        if not clamped:
+            for game_id, score in free.items():
+                rates[game_id] = budget * score / total
+            break
+        for game_id, rate in clamped.items():
+            rates[game_id] = rate
+            budget -= rate
+            del free[game_id]
+        budget = max(budget, 0.0)
+
+    return {game_id: int(min(max(DAY_SECONDS / rate, min_interval), max_interval))
+            for game_id, rate in rates.items()}
+
+
+def stagger_offset(game_id: int, interval_seconds: int) -> int:
+    """Stable per-game offset in [0, interval) so checks don't all line up"""
+    return zlib.crc32(str(game_id).encode()) % max(1, interval_seconds)
+
+
+class CheckPlanner:
+    """Computes a next-check time per wishlisted game so the daily budget goes to games that move"""
+
+    def __init__(self, checks_per_game_per_day: float = PRICE_CHECKS_PER_GAME_PER_DAY,
+                 min_interval: int = PRICE_CHECK_MIN_INTERVAL, max_interval: int = PRICE_CHECK_MAX_INTERVAL,
+                 sale_windows: str = SALE_WINDOWS, chunk_size: int = PLAN_CHUNK_SIZE):
+        self.checks_per_game_per_day = checks_per_game_per_day
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.sale_windows = parse_sale_windows(sale_windows)
+        self.chunk_size = max(1, chunk_size)
+        self.daily_budget = 0.0
+        self.planned_at: Optional[datetime] = None
+
+    def needs_replan(self, now: datetime, replan_seconds: int = PRICE_CHECK_REPLAN_SECONDS) -> bool:
+        return self.planned_at is None or (now - self.planned_at).total_seconds() >= replan_seconds
+
+    def _collect_signals(self, db, now: datetime) -> Dict[int, Dict]:
+        """Per-game inputs for the priority score, gathered with a few aggregate queries"""
+        signals = {}
+        rows = (
+            db.query(UserWishlist.game_id, func.count(UserWishlist.id), func.max(UserWishlist.desired_price_cents))
+            .group_by(UserWishlist.game_id)
+            .all()
+        )
+        for game_id, wishlist_count, desired_price_cents in rows:
+            signals[game_id] = {
+                'wishlist_count': wishlist_count,
+                'desired_price_cents': desired_price_cents,
+                'price_changes': 0
+            }
+
+        since = now - timedelta(days=VOLATILITY_WINDOW_DAYS)
+        volatility = (
+            db.query(PriceHistory.game_id, func.count(func.distinct(PriceHistory.price_cents)))
+            .filter(PriceHistory.recorded_at >= since)
+            .group_by(PriceHistory.game_id)
+            .all()
+        )
+        for game_id, distinct_prices in volatility:
+            if game_id in signals:
+                signals[game_id]['price_changes'] = max(distinct_prices - 1, 0)
+
+        game_ids = list(signals)
+        for start in range(0, len(game_ids), self.chunk_size):
+            games = (
+                db.query(Game.id, Game.last_price_cents, Game.discount_percent, Game.last_checked)
+                .filter(Game.id.in_(game_ids[start:start + self.chunk_size]))
+                .all()
+            )
+            for game_id, last_price_cents, discount_percent, last_checked in games:
+                signals[game_id].update({
+                    'current_price_cents': last_price_cents,
+                    'on_sale': bool(discount_percent),
+                    'last_checked': last_checked
+                })
+        return signals
+
+    def plan(self, db, now: Optional[datetime] = None) -> Dict:
+        """Recompute priorities and intervals for every wishlisted game and store them in game_check_schedule"""
+        now = now or datetime.utcnow()
+        signals = self._collect_signals(db, now)
+        sale_window = in_sale_window(now, self.sale_windows)
+
+        scores = {
+            game_id: priority_score(
+                s['wishlist_count'], s['price_changes'], s.get('current_price_cents'),
+                s['desired_price_cents'], s.get('on_sale', False), sale_window
+            )
+            for game_id, s in signals.items()
+        }
+        self.daily_budget = len(scores) * self.checks_per_game_per_day
+        intervals = allocate_intervals(scores, self.daily_budget, self.min_interval, self.max_interval)
+
+        existing = {row.game_id: row for row in db.query(GameCheckSchedule).all()}
+        for game_id, interval in intervals.items():
+            last_checked = signals[game_id].get('last_checked')
+            if last_checked is None:
+                # Never checked - due right away (tick_limit keeps a large backlog from bursting)
+                next_check_at = now
+            else:
+                next_check_at = last_checked + timedelta(seconds=interval)
+                if next_check_at < now:
+                    # Overdue (e.g. after switching from the fixed schedule) - spread instead of a burst
+                    next_check_at = now + timedelta(seconds=stagger_offset(game_id, interval))
+
+            row = existing.pop(game_id, None)
+            if row is None:
+                db.add(GameCheckSchedule(
+                    game_id=game_id, priority=scores[game_id], interval_seconds=interval,
+                    next_check_at=next_check_at, planned_at=now
+                ))
+            else:
+                row.priority = scores[game_id]
+                row.interval_seconds = interval
+                # Only pull a check forward; an already planned earlier check stays
+                row.next_check_at = min(row.next_check_at, next_check_at)
+                row.planned_at = now
+
+        # Games that left every wishlist are no longer checked
+        for row in existing.values():
+            db.delete(row)
+
+        db.commit()
+        self.planned_at = now
+
+        summary = {
+            'games': len(intervals),
+            'daily_budget': self.daily_budget,
+            'planned_checks_per_day': sum(DAY_SECONDS / i for i in intervals.values()),
+            'min_interval_seconds': min(intervals.values(), default=0),
+            'max_interval_seconds': max(intervals.values(), default=0),
+            'sale_window': sale_window
+        }
+        logger.info(
+            f"Planned checks for {summary['games']} games: {summary['planned_checks_per_day']:.0f} checks/day "
+            f"(budget {summary['daily_budget']:.0f}), intervals {summary['min_interval_seconds']}s-"
+            f"{summary['max_interval_seconds']}s"
+        )
+        return summary
+
+    def tick_limit(self, tick_seconds: int = PRICE_CHECK_TICK_SECONDS) -> int:
+        """Max games per tick: the budget's share of the tick with headroom to catch up"""
+        return max(1, math.ceil(self.daily_budget * tick_seconds / DAY_SECONDS * 2))
+
+    def due_games(self, db, now: Optional[datetime] = None, limit: Optional[int] = None) -> List[GameRef]:
+        """Games whose next check is due, most overdue and highest priority first"""
+        now = now or datetime.utcnow()
+        query = (
+            db.query(*GAME_REF_COLUMNS)
+            .join(GameCheckSchedule, GameCheckSchedule.game_id == Game.id)
+            .filter(GameCheckSchedule.next_check_at <= now)
+            .order_by(GameCheckSchedule.next_check_at, GameCheckSchedule.priority.desc())
+        )
+        if limit:
+            query = query.limit(limit)
+        return load_game_refs(query)
+
+    def mark_checked(self, db, game_ids: List[int], now: Optional[datetime] = None):
+        """Push the next check of the given games one interval into the future"""
+        now = now or datetime.utcnow()
+        game_ids = list(game_ids)
+        for start in range(0, len(game_ids), self.chunk_size):
+            chunk = game_ids[start:start + self.chunk_size]
+            for row in db.query(GameCheckSchedule).filter(GameCheckSchedule.game_id.in_(chunk)).all():
+                row.next_check_at = now + timedelta(seconds=row.interval_seconds)
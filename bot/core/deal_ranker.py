@@ -0,0 +1,162 @@
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import delete, func, insert
+
+from models.models import Game, UserWishlist, PriceHistory, PriceStats, DealRanking
+
+logger = logging.getLogger(__name__)
+
+DEAL_RANKING_SIZE = int(os.getenv('DEAL_RANKING_SIZE', 100))  # ranked deals kept per currency
+DEAL_RANKING_MIN_INTERVAL = int(os.getenv('DEAL_RANKING_MIN_INTERVAL', 300))  # seconds between refreshes
+
+# Score weights: how deep the discount is, how close to the all-time low, how many people want it
+DISCOUNT_WEIGHT = 0.5
+LOW_WEIGHT = 0.3
+POPULARITY_WEIGHT = 0.2
+
+QUERY_CHUNK_SIZE = 500
+
+
+def score_deals(price, regular, discount_percent, all_time_low, wishlists):
+    """Score every game at once from column arrays; returns (score, discount, on_sale mask).
+
+    price/regular/all_time_low are cents (regular and all_time_low may be 0
+    when unknown), discount_percent the site's own figure, wishlists counts.
+    """
+    price = price.astype(np.float64)
+    regular = np.maximum(regular.astype(np.float64), price)
+    all_time_low = np.where(all_time_low > 0, all_time_low, price).astype(np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discount = np.where(regular > 0, 1 - price / regular, 0.0)
+    discount = np.clip(np.maximum(discount, discount_percent / 100.0), 0.0, 1.0)
+
+    # 1.0 at the all-time low, 0.0 once the price is 50% of the regular price above it
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gap = np.where(regular > 0, (price - all_time_low) / regular, 1.0)
+    near_low = 1 - np.clip(gap / 0.5, 0.0, 1.0)
+
+    popularity = np.log1p(wishlists.astype(np.float64))
+    if popularity.size and popularity.max() > 0:
+        popularity /= popularity.max()
+
+    score = DISCOUNT_WEIGHT * discount + LOW_WEIGHT * near_low + POPULARITY_WEIGHT * popularity
+    return score, discount, discount > 0
+
+
+class DealRanker:
+    """Ranks the whole catalog by deal quality with NumPy and stores the result in deal_rankings"""
+
+    def __init__(self, ranking_size: int = DEAL_RANKING_SIZE, min_interval: int = DEAL_RANKING_MIN_INTERVAL):
+        self.ranking_size = ranking_size
+        self.min_interval = min_interval
+        self._last_refresh = None
+
+    def load_arrays(self, db) -> Dict[str, np.ndarray]:
+        """Catalog columns as arrays, using three aggregate queries instead of ORM objects"""
+        rows = (
+            db.query(Game.id, Game.last_price_cents, Game.original_price_cents, Game.discount_percent,
+                     Game.currency, PriceStats.all_time_low_cents)
+            .outerjoin(PriceStats, PriceStats.game_id == Game.id)
+            .filter(Game.last_price_cents > 0, Game.currency.isnot(None))
+            .all()
+        )
+        if not rows:
+            return {}
+        ids, prices, originals, discounts, currencies, lows = zip(*rows)
+
+        game_ids = np.array(ids, dtype=np.int64)
+        all_time_low = np.array([low or 0 for low in lows], dtype=np.int64)
+
+        # Games without stats yet fall back to the lowest price in their history
+        missing = game_ids[all_time_low == 0]
+        if missing.size:
+            history_lows = {}
+            for start in range(0, missing.size, QUERY_CHUNK_SIZE):
+                history_lows.update(
+                    db.query(PriceHistory.game_id, func.min(PriceHistory.price_cents))
+                    .filter(PriceHistory.game_id.in_(missing[start:start + QUERY_CHUNK_SIZE].tolist()))
+                    .group_by(PriceHistory.game_id)
+                    .all()
+                )
+            all_time_low = np.array([low or history_lows.get(game_id, 0) for game_id, low in zip(ids, all_time_low)],
+                                    dtype=np.int64)
+
+        wishlist_counts = dict(
+            db.query(UserWishlist.game_id, func.count(UserWishlist.id)).group_by(UserWishlist.game_id).all()
+        )
+
+        return {
+            'game_id': game_ids,
+            'price': np.array(prices, dtype=np.int64),
+            'regular': np.array([original or 0 for original in originals], dtype=np.int64),
+            'discount_percent': np.array([discount or 0 for discount in discounts], dtype=np.float64),
+            'currency': np.array(currencies, dtype=object),
+            'all_time_low': all_time_low,
+            'wishlists': np.array([wishlist_counts.get(game_id, 0) for game_id in ids], dtype=np.int64)
+        }
+
+    def rank(self, arrays: Dict[str, np.ndarray]) -> List[Dict]:
+        """Top deals per currency as rows for deal_rankings"""
+        if not arrays:
+            return []
+        score, discount, on_sale = score_deals(
+            arrays['price'], arrays['regular'], arrays['discount_percent'],
+            arrays['all_time_low'], arrays['wishlists']
+        )
+
+        now = datetime.utcnow()
+        rows = []
+        for currency in np.unique(arrays['currency'][on_sale]):
+            candidates = np.nonzero(on_sale & (arrays['currency'] == currency))[0]
+            # Best first; ties go to the lower game id so rankings are stable
+            order = candidates[np.lexsort((arrays['game_id'][candidates], -score[candidates]))]
+            for rank, i in enumerate(order[:self.ranking_size], 1):
+                rows.append({
+                    'game_id': int(arrays['game_id'][i]),
+                    'currency': str(currency),
+                    'rank': rank,
+                    'score': float(score[i]),
+                    'price_cents': int(arrays['price'][i]),
+                    'regular_price_cents': int(max(arrays['regular'][i], arrays['price'][i])),
+                    'discount_percent': int(round(discount[i] * 100)),
+                    'all_time_low_cents': int(arrays['all_time_low'][i]) or None,
+                    'wishlist_count': int(arrays['wishlists'][i]),
+                    'computed_at': now
+                })
+        return rows
+
+    def refresh(self, db) -> int:
+        """Recompute and replace the stored rankings in one transaction"""
+        started = time.monotonic()
+        rows = self.rank(self.load_arrays(db))
+        db.execute(delete(DealRanking))
+        if rows:
+            db.execute(insert(DealRanking), rows)
+        db.commit()
+        self._last_refresh = time.monotonic()
+        logger.info(f"Ranked {len(rows)} deals in {self._last_refresh - started:.2f}s")
+        return len(rows)
+
+    def refresh_due(self) -> bool:
+        return self._last_refresh is None or time.monotonic() - self._last_refresh >= self.min_interval
+
+    def top(self, db, currency: str, limit: int = 10):
+        """Best current deals in a currency as (DealRanking, Game) pairs"""
+        return (
+            db.query(DealRanking, Game)
+            .join(Game, Game.id == DealRanking.game_id)
+            .filter(DealRanking.currency == currency)
+            .order_by(DealRanking.rank)
+            .limit(limit)
+            .all()
+        )
+
+
+# Global instance
+deal_ranker = DealRanker()
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from models.database import SessionLocal
+from models.models import ServiceLease
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE_SECONDS = int(os.getenv('LEADER_LEASE_SECONDS', 60))  # a dead leader is replaced after this
+
+
+def worker_id() -> str:
+    """Identifies this process across hosts and restarts"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LeaderElection:
+    """Database lease that makes exactly one worker the leader.
+
+    Every worker tries to take the lease every third of its TTL. The holder
+    renews it; the others take over only once it has expired, so a crashed
+    leader is replaced within LEADER_LEASE_SECONDS.
+    """
+
+    def __init__(self, name: str = 'scheduler', session_factory=SessionLocal,
+                 ttl: float = LEADER_LEASE_SECONDS, holder: str = None):
+        self.name = name
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.holder = holder or worker_id()
+        self.is_leader = False
+        self._table_checked = False
+
+    def _ensure_table(self, db):
+        # The leader runs the migrations, so the lease table can't wait for them on a fresh database
+        if not self._table_checked:
+            try:
+                ServiceLease.__table__.create(db.get_bind(), checkfirst=True)
+            except SQLAlchemyError:
+                pass  # Another worker created it first
+            self._table_checked = True
+
+    def try_acquire(self) -> bool:
+        """Take or renew the lease; returns whether this worker is the leader now"""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        db = self.session_factory()
+        try:
+            self._ensure_table(db)
+            taken = db.execute(
+                update(ServiceLease)
+                .where(ServiceLease.name == self.name,
+                       or_(ServiceLease.holder == self.holder, ServiceLease.expires_at <= now))
+                .values(holder=self.holder, expires_at=expires_at)
+            ).rowcount
+            if not taken:
+                db.execute(insert(ServiceLease).values(name=self.name, holder=self.holder, expires_at=expires_at))
+            db.commit()
+            leader = True
+        except IntegrityError:
+            # The lease exists and is held by a live worker
+            db.rollback()
+            leader = False
+        except SQLAlchemyError as e:
+            # Without the database we can't prove we still hold the lease
+            logger.error(f"Could not renew the {self.name} lease: {e}")
+            db.rollback()
+            leader = False
+        finally:
+            db.close()
+
+        if leader != self.is_leader:
+            logger.info(f"Worker {self.holder} {'is now' if leader else 'is no longer'} the {self.name} leader")
+        self.is_leader = leader
+        return leader
+
+    def release(self):
+        """Give the lease up on shutdown so another worker takes over right away"""
+        if not self.is_leader:
+            return
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(ServiceLease)
+                .where(ServiceLease.name == self.name, ServiceLease.holder == self.holder)
+                .values(expires_at=datetime.utcnow())
+            )
+            db.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Could not release the {self.name} lease: {e}")
+            db.rollback()
+        finally:
+            db.close()
+        self.is_leader = False
+
+    async def run(self, on_elected: Callable[[], Awaitable], on_deposed: Callable[[], Awaitable]):
+        """Keep campaigning until cancelled, calling on_elected / on_deposed when leadership changes"""
+        leader = False
+        while True:
+            was_leader = leader
+            leader = await asyncio.to_thread(self.try_acquire)
+            try:
+                if leader and not was_leader:
+                    await on_elected()
+                elif was_leader and not leader:
+                    await on_deposed()
+            except Exception as e:
+                logger.error(f"Error handling {self.name} leadership change: {e}")
+                if leader:
+                    # Let this or another worker try again on the next round
+                    await asyncio.to_thread(self.release)
+                    leader = False
+            await asyncio.sleep(self.ttl / 3)
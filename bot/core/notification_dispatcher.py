@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from sqlalchemy import and_, insert, or_, update
+
+from bot.utils.rate_limiter import RateLimiter
+from models.database import SessionLocal
+from models.models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_POLL_SECONDS = int(os.getenv('NOTIFY_POLL_SECONDS', 5))  # how often the outbox is checked
+NOTIFY_CONCURRENCY = int(os.getenv('NOTIFY_CONCURRENCY', 16))  # messages in flight at once
+NOTIFY_GLOBAL_RATE = float(os.getenv('NOTIFY_GLOBAL_RATE', 25))  # messages/s overall (Telegram allows ~30)
+NOTIFY_CHAT_RATE = float(os.getenv('NOTIFY_CHAT_RATE', 1))  # messages/s to one chat
+NOTIFY_BATCH_SIZE = int(os.getenv('NOTIFY_BATCH_SIZE', 200))  # messages claimed per round
+NOTIFY_MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', 5))  # network/server errors before giving up
+NOTIFY_CLAIM_TIMEOUT = int(os.getenv('NOTIFY_CLAIM_TIMEOUT', 300))  # seconds before an unfinished send is retried
+NOTIFY_RETENTION_DAYS = int(os.getenv('NOTIFY_RETENTION_DAYS', 7))  # sent messages are deleted after this
+
+# Dedupe keys per IN (...) list when checking for already queued alerts
+DEDUPE_CHUNK_SIZE = 500
+
+
+def enqueue_notifications(db, rows: List[Dict]) -> int:
+    """Queue messages in the caller's transaction, skipping dedupe keys that are already queued"""
+    if not rows:
+        return 0
+    keys = [row['dedupe_key'] for row in rows]
+    existing = set()
+    for start in range(0, len(keys), DEDUPE_CHUNK_SIZE):
+        chunk = keys[start:start + DEDUPE_CHUNK_SIZE]
+        existing.update(key for (key,) in db.query(NotificationOutbox.dedupe_key)
+                        .filter(NotificationOutbox.dedupe_key.in_(chunk)))
+
+    now = datetime.utcnow()
+    new_rows = [
+        {'status': 'pending', 'attempts': 0, 'next_attempt_at': now, 'created_at': now, **row}
+        for row in {row['dedupe_key']: row for row in rows if row['dedupe_key'] not in existing}.values()
+    ]
+    if new_rows:
+        db.execute(insert(NotificationOutbox), new_rows)
+    return len(new_rows)
+
+
+class NotificationDispatcher:
+    """Delivers the notification outbox concurrently within Telegram's rate limits.
+
+    Messages are claimed in batches and each outcome is committed as soon as
+    the send returns, so after a restart only a message that was in flight at
+    the crash can go out twice. A 429 pauses every send for its retry_after;
+    blocked chats and bad requests are not retried, other errors are retried
+    with backoff up to NOTIFY_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, session_factory=SessionLocal, concurrency: int = NOTIFY_CONCURRENCY,
+                 global_rate: float = NOTIFY_GLOBAL_RATE, chat_rate: float = NOTIFY_CHAT_RATE,
+                 batch_size: int = NOTIFY_BATCH_SIZE, max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+                 claim_timeout: float = NOTIFY_CLAIM_TIMEOUT):
+        self.session_factory = session_factory
+        self.concurrency = max(1, concurrency)
+        self.global_limiter = RateLimiter(global_rate)
+        self.chat_rate = chat_rate
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.claim_timeout = claim_timeout
+        self._chat_limiters: Dict[int, RateLimiter] = {}
+        self._paused_until = 0.0
+        self.stats = {'sent': 0, 'retried': 0, 'failed': 0, 'rate_limited': 0}
+
+    def claim(self) -> list:
+        """Mark the next due messages as being sent and return them"""
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            messages = (
+                db.query(NotificationOutbox.id, NotificationOutbox.telegram_id,
+                         NotificationOutbox.text, NotificationOutbox.attempts)
+                .filter(or_(
+                    and_(NotificationOutbox.status == 'pending', NotificationOutbox.next_attempt_at <= now),
+                    and_(NotificationOutbox.status == 'sending',
+                         NotificationOutbox.claimed_at < now - timedelta(seconds=self.claim_timeout))
+                ))
+                .order_by(NotificationOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if messages:
+                db.execute(
+                    update(NotificationOutbox)
+                    .where(NotificationOutbox.id.in_([message.id for message in messages]))
+                    .values(status='sending', claimed_at=now)
+                )
+            db.commit()
+            return messages
+        finally:
+            db.close()
+
+    def _record(self, message_id: int, values: Dict):
+        db = self.session_factory()
+        try:
+            db.execute(update(NotificationOutbox).where(NotificationOutbox.id == message_id).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+    def _chat_limiter(self, chat_id: int) -> RateLimiter:
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            limiter = self._chat_limiters[chat_id] = RateLimiter(self.chat_rate)
+        return limiter
+
+    def _evict_idle_limiters(self):
+        """Forget chats with no pending send slot, so the limiters don't grow with every chat ever messaged"""
+        for chat_id in [chat_id for chat_id, limiter in self._chat_limiters.items() if limiter.idle]:
+            del self._chat_limiters[chat_id]
+
+    async def _send(self, bot, message):
+        """Send one claimed message and store the outcome"""
+        # Wait out a flood-control pause that started while this message was queued
+        while self._paused_until > time.monotonic():
+            await asyncio.sleep(self._paused_until - time.monotonic())
+        await self.global_limiter.acquire()
+
+        now = datetime.utcnow()
+        try:
+            await bot.send_message(chat_id=message.telegram_id, text=message.text, parse_mode='HTML')
+            values = {'status': 'sent', 'sent_at': now, 'attempts': message.attempts + 1, 'last_error': None}
+            self.stats['sent'] += 1
+        except TelegramRetryAfter as e:
+            # Flood control applies to the whole bot: stop sending until Telegram allows it again
+            self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+            logger.warning(f"Telegram flood control, pausing notifications for {e.retry_after}s")
+            values = {'status': 'pending', 'next_attempt_at': now + timedelta(seconds=e.retry_after),
+                      'last_error': str(e)}
+            self.stats['rate_limited'] += 1
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Blocked the bot, deleted the chat or a malformed message: retrying won't help
+            logger.warning(f"Notification to {message.telegram_id} failed permanently: {e}")
+            values = {'status': 'failed', 'attempts': message.attempts + 1, 'last_error': str(e)}
+            self.stats['failed'] += 1
+        except Exception as e:
+            attempts = message.attempts + 1
+            if attempts >= self.max_attempts:
+                logger.error(f"Giving up on notification to {message.telegram_id} after {attempts} attempts: {e}")
+                values = {'status': 'failed', 'attempts': attempts, 'last_error': str(e)}
+                self.stats['failed'] += 1
+            else:
+                backoff = min(30 * 2 ** message.attempts, 3600)
+                values = {'status': 'pending', 'attempts': attempts, 'last_error': str(e),
+                          'next_attempt_at': now + timedelta(seconds=backoff)}
+                self.stats['retried'] += 1
+
+        await asyncio.to_thread(self._record, message.id, values)
+
+    async def drain(self, bot) -> int:
+        """Send every message that is due; returns how many were delivered"""
+        if bot is None:
+            logger.error("Bot not set for notification dispatcher")
+            return 0
+
+        sent_before = self.stats['sent']
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self._evict_idle_limiters()
+
+        async def send(message):
+            # Wait for the chat's slot before taking a send slot, so one busy chat can't hold them all
+            await self._chat_limiter(message.telegram_id).acquire()
+            async with semaphore:
+                await self._send(bot, message)
+
+        while True:
+            messages = await asyncio.to_thread(self.claim)
+            if not messages:
+                break
+            await asyncio.gather(*(send(message) for message in messages))
+
+        sent = self.stats['sent'] - sent_before
+        if sent:
+            logger.info(f"Delivered {sent} notifications")
+        await asyncio.to_thread(self.purge_sent)
+        return sent
+
+    def purge_sent(self):
+        """Drop delivered messages older than NOTIFY_RETENTION_DAYS"""
+        cutoff = datetime.utcnow() - timedelta(days=NOTIFY_RETENTION_DAYS)
+        db = self.session_factory()
+        try:
+            db.query(NotificationOutbox).filter(
+                NotificationOutbox.status == 'sent', NotificationOutbox.sent_at < cutoff
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+# Global instance
+notification_dispatcher = NotificationDispatcher()
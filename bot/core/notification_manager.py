@@ -2,7 +2,9 @@ import logging
 from typing import Dict, List
 
 from aiogram import Bot
-from models.database import get_db
+from sqlalchemy.orm import Session
+
+from models.database import session_scope
 from models.models import User, Game, UserWishlist, Notification
 
 logger = logging.getLogger(__name__)
@@ -14,36 +16,36 @@ class NotificationManager:
     def __init__(self, bot: Bot):
         self.bot = bot
 
-    async def send_price_alert(self, user_id: int, game: Game, old_price: int, new_price: int) -> bool:
+    async def send_price_alert(self, user_id: int, game: Game, old_price: int, new_price: int, db: Session = None) -> bool:
         """Send price drop notification to user"""
         try:
-            db = next(get_db())
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
-                return False
-
-            # Format message
-            message = self._format_price_alert_message(game, old_price, new_price)
-
-            # Send message
-            await self.bot.send_message(
-                chat_id=user.telegram_id,
-                text=message,
-                parse_mode="HTML"
-            )
-
-            # Log notification
-            notification = Notification(
-                user_id=user_id,
-                game_id=game.id,
-                price_cents=new_price,
-                rule="price_drop"
-            )
-            db.add(notification)
-            db.commit()
+            with session_scope(db) as db:
+                user = db.query(User).filter(User.id == user_id).first()
+                if not user:
+                    return False
+
+                # Format message
+                message = self._format_price_alert_message(game, old_price, new_price)
+
+                # Send message
+                await self.bot.send_message(
+                    chat_id=user.telegram_id,
+                    text=message,
+                    parse_mode="HTML"
+                )
+
+                # Log notification
+                notification = Notification(
+                    user_id=user_id,
+                    game_id=game.id,
+                    price_cents=new_price,
+                    rule="price_drop"
+                )
+                db.add(notification)
+                db.commit()
 
-            logger.info(f"Price alert sent to user {user_id} for game {game.title}")
-            return True
+                logger.info(f"Price alert sent to user {user_id} for game {game.title}")
+                return True
 
         except Exception as e:
             logger.error(f"Failed to send price alert to user {user_id}: {e}")
@@ -66,101 +68,100 @@ class NotificationManager:
 
         return message
 
-    async def send_custom_notification(self, user_id: int, message: str) -> bool:
+    async def send_custom_notification(self, user_id: int, message: str, db: Session = None) -> bool:
         """Send custom notification to user"""
         try:
-            db = next(get_db())
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
-                return False
-
-            await self.bot.send_message(
-                chat_id=user.telegram_id,
-                text=message,
-                parse_mode="HTML"
-            )
+            with session_scope(db) as db:
+                user = db.query(User).filter(User.id == user_id).first()
+                if not user:
+                    return False
+
+                await self.bot.send_message(
+                    chat_id=user.telegram_id,
+                    text=message,
+                    parse_mode="HTML"
+                )
 
-            logger.info(f"Custom notification sent to user {user_id}")
-            return True
+                logger.info(f"Custom notification sent to user {user_id}")
+                return True
 
         except Exception as e:
             logger.error(f"Failed to send custom notification to user {user_id}: {e}")
             return False
 
-    def get_user_notifications(self, user_id: int, limit: int = 10) -> List[Dict]:
+    def get_user_notifications(self, user_id: int, limit: int = 10, db: Session = None) -> List[Dict]:
         """Get user's recent notifications"""
-        db = next(get_db())
-
-        notifications = (
-            db.query(Notification, Game)
-            .join(Game, Notification.game_id == Game.id)
-            .filter(Notification.user_id == user_id)
-            .order_by(Notification.sent_at.desc())
-            .limit(limit)
-            .all()
-        )
+        with session_scope(db) as db:
+            notifications = (
+                db.query(Notification, Game)
+                .join(Game, Notification.game_id == Game.id)
+                .filter(Notification.user_id == user_id)
+                .order_by(Notification.sent_at.desc())
+                .limit(limit)
+                .all()
+            )
 
-        result = []
-        for notification, game in notifications:
-            result.append({
-                "notification": notification,
-                "game": game,
-                "price_dollars": notification.price_cents / 100,
-                "sent_at": notification.sent_at
-            })
+            result = []
+            for notification, game in notifications:
+                result.append({
+                    "notification": notification,
+                    "game": game,
+                    "price_dollars": notification.price_cents / 100,
+                    "sent_at": notification.sent_at
+                })
 
-        return result
+            return result
 
-    def check_price_alerts(self, game: Game, current_price: int) -> List[Dict]:
+    def check_price_alerts(self, game: Game, current_price: int, db: Session = None) -> List[Dict]:
         """Check if any users should be notified about price change"""
-        db = next(get_db())
-
-        # Find users who have this game in wishlist with threshold
-        alerts = (
-            db.query(UserWishlist, User)
-            .join(User, UserWishlist.user_id == User.id)
-            .filter(
-                UserWishlist.game_id == game.id,
-                UserWishlist.desired_price_cents.isnot(None),
-                UserWishlist.desired_price_cents >= current_price,
-                UserWishlist.last_notified_price_cents.is_(None) | (UserWishlist.last_notified_price_cents > current_price)
+        with session_scope(db) as db:
+            # Find users who have this game in wishlist with threshold
+            alerts = (
+                db.query(UserWishlist, User)
+                .join(User, UserWishlist.user_id == User.id)
+                .filter(
+                    UserWishlist.game_id == game.id,
+                    UserWishlist.desired_price_cents.isnot(None),
+                    UserWishlist.desired_price_cents >= current_price,
+                    UserWishlist.last_notified_price_cents.is_(None) | (UserWishlist.last_notified_price_cents > current_price)
+                )
+                .all()
             )
-            .all()
-        )
 
-        result = []
-        for wishlist_item, user in alerts:
-            result.append({
-                "user": user,
-                "wishlist_item": wishlist_item,
-                "threshold_price": wishlist_item.desired_price_cents,
-                "current_price": current_price
-            })
+            result = []
+            for wishlist_item, user in alerts:
+                result.append({
+                    "user": user,
+                    "wishlist_item": wishlist_item,
+                    "threshold_price": wishlist_item.desired_price_cents,
+                    "current_price": current_price
+                })
 
-        return result
+            return result
 
-    async def process_price_alerts(self, game: Game, current_price: int) -> int:
+    async def process_price_alerts(self, game: Game, current_price: int, db: Session = None) -> int:
         """Process and send price alerts for a game"""
-        alerts = self.check_price_alerts(game, current_price)
-        sent_count = 0
-
-        for alert in alerts:
-            user = alert["user"]
-            wishlist_item = alert["wishlist_item"]
-
-            # Send notification
-            success = await self.send_price_alert(
-                user.id,
-                game,
-                wishlist_item.last_notified_price_cents or game.last_price_cents,
-                current_price
-            )
-
-            if success:
-                # Update last notified price
-                db = next(get_db())
-                wishlist_item.last_notified_price_cents = current_price
-                db.commit()
-                sent_count += 1
-
-        return sent_count
+        with session_scope(db) as db:
+            alerts = self.check_price_alerts(game, current_price, db)
+            sent_count = 0
+
+            for alert in alerts:
+                user = alert["user"]
+                wishlist_item = alert["wishlist_item"]
+
+                # Send notification
+                success = await self.send_price_alert(
+                    user.id,
+                    game,
+                    wishlist_item.last_notified_price_cents or game.last_price_cents,
+                    current_price,
+                    db
+                )
+
+                if success:
+                    # Update last notified price
+                    wishlist_item.last_notified_price_cents = current_price
+                    db.commit()
+                    sent_count += 1
+
+            return sent_count
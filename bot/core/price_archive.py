@@ -0,0 +1,219 @@
+import logging
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete
+
+from bot.core.price_history import latest_prices
+from models.models import PriceHistory
+
+logger = logging.getLogger(__name__)
+
+PRICE_ARCHIVE_DIR = os.getenv('PRICE_ARCHIVE_DIR', './price_archive')
+PRICE_ARCHIVE_AFTER_DAYS = int(os.getenv('PRICE_ARCHIVE_AFTER_DAYS', 90))  # 0 disables archiving
+
+MAGIC = b'PHA1'
+EPOCH = datetime(1970, 1, 1)
+ARCHIVE_CHUNK_SIZE = 200  # games per transaction
+DELETE_CHUNK_SIZE = 500  # row ids per DELETE, below SQLite's bound parameter limit
+
+
+def _to_seconds(when: datetime) -> int:
+    return int((when - EPOCH).total_seconds())
+
+
+def _from_seconds(seconds: int) -> datetime:
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def _deltas(values: List[int]) -> List[int]:
+    return [value - previous for previous, value in zip([0] + values[:-1], values)]
+
+
+def _undeltas(deltas) -> List[int]:
+    values, total = [], 0
+    for delta in deltas:
+        total += delta
+        values.append(total)
+    return values
+
+
+def _pack(typecode: str, values) -> bytes:
+    data = array(typecode, values)
+    if sys.byteorder == 'big':
+        data.byteswap()  # files are always little-endian
+    return data.tobytes()
+
+
+def _unpack(typecode: str, buffer: bytes, offset: int, count: int):
+    data = array(typecode)
+    size = data.itemsize * count
+    data.frombytes(buffer[offset:offset + size])
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data, offset + size
+
+
+def encode_rows(rows: List[Dict]) -> bytes:
+    """Encode history rows (sorted by recorded_at) as zlib-compressed delta-encoded columns.
+
+    Layout: count, currency table, then one column each for recorded_at
+    (int64 second deltas), price_cents (int32 deltas), last_seen_at (int32
+    seconds after recorded_at, -1 = unknown) and currency (uint8 index).
+    Timestamps are stored with one-second resolution.
+    """
+    currencies = sorted({row['currency'] for row in rows})
+    currency_index = {currency: i for i, currency in enumerate(currencies)}
+    recorded = [_to_seconds(row['recorded_at']) for row in rows]
+    seen = [_to_seconds(row['last_seen_at']) - start if row['last_seen_at'] else -1
+            for row, start in zip(rows, recorded)]
+    table = ','.join(currencies).encode()
+
+    payload = b''.join([
+        struct.pack('<IH', len(rows), len(table)), table,
+        _pack('q', _deltas(recorded)),
+        _pack('i', _deltas([row['price_cents'] for row in rows])),
+        _pack('i', seen),
+        _pack('B', [currency_index[row['currency']] for row in rows])
+    ])
+    return MAGIC + zlib.compress(payload, 9)
+
+
+def decode_rows(data: bytes) -> List[Dict]:
+    """Inverse of encode_rows"""
+    if data[:4] != MAGIC:
+        raise ValueError("Not a price archive file")
+    payload = zlib.decompress(data[4:])
+    count, table_length = struct.unpack_from('<IH', payload)
+    offset = struct.calcsize('<IH')
+    currencies = payload[offset:offset + table_length].decode().split(',')
+    offset += table_length
+
+    recorded, offset = _unpack('q', payload, offset, count)
+    prices, offset = _unpack('i', payload, offset, count)
+    seen, offset = _unpack('i', payload, offset, count)
+    currency_codes, offset = _unpack('B', payload, offset, count)
+
+    rows = []
+    for start, price_cents, seen_after, code in zip(_undeltas(recorded), _undeltas(prices), seen, currency_codes):
+        rows.append({
+            'price_cents': price_cents,
+            'currency': currencies[code],
+            'recorded_at': _from_seconds(start),
+            'last_seen_at': _from_seconds(start + seen_after) if seen_after >= 0 else None
+        })
+    return rows
+
+
+class PriceArchive:
+    """Per-game archive files for old price_history rows, kept outside the hot database"""
+
+    def __init__(self, directory: str = PRICE_ARCHIVE_DIR):
+        self.directory = directory
+
+    def path(self, game_id: int) -> str:
+        return os.path.join(self.directory, f"{game_id}.pha")
+
+    def read(self, game_id: int) -> List[Dict]:
+        """Archived rows of a game, oldest first ([] if nothing was archived)"""
+        try:
+            with open(self.path(game_id), 'rb') as f:
+                return decode_rows(f.read())
+        except FileNotFoundError:
+            return []
+
+    def append(self, game_id: int, rows: List[Dict]):
+        """Merge rows into a game's archive file, replacing it atomically"""
+        merged = {}
+        for row in self.read(game_id) + rows:
+            row = dict(row, recorded_at=row['recorded_at'].replace(microsecond=0))
+            # Re-archiving after an interrupted run must not duplicate rows
+            merged[(row['recorded_at'], row['price_cents'], row['currency'])] = row
+        ordered = [merged[key] for key in sorted(merged, key=lambda key: key[0])]
+
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.path(game_id) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encode_rows(ordered))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path(game_id))
+
+    def merge(self, game_id: int, into_id: int) -> int:
+        """Fold a merged duplicate's archive file into the kept game's; returns rows moved.
+
+        The kept file is written before the duplicate's is removed, so a
+        repeated merge finds the rows already there and adds nothing.
+        """
+        rows = self.read(game_id)
+        if rows:
+            self.append(into_id, rows)
+        try:
+            os.remove(self.path(game_id))
+        except FileNotFoundError:
+            pass
+        return len(rows)
+
+    def archive_old_rows(self, db, older_than_days: int = PRICE_ARCHIVE_AFTER_DAYS,
+                         now: Optional[datetime] = None) -> Dict:
+        """Move price_history rows older than the cutoff into archive files.
+
+        The newest row of every game stays in the database, since change-only
+        history keeps extending it. Files are written before rows are deleted,
+        so an interrupted run is simply repeated.
+        """
+        cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+        game_ids = [game_id for (game_id,) in (
+            db.query(PriceHistory.game_id).filter(PriceHistory.recorded_at < cutoff).distinct().all()
+        )]
+
+        games_archived = 0
+        rows_archived = 0
+        # One chunk of games at a time keeps memory and lock time bounded
+        for start in range(0, len(game_ids), ARCHIVE_CHUNK_SIZE):
+            chunk = game_ids[start:start + ARCHIVE_CHUNK_SIZE]
+            keep_ids = {row_id for row_id, _, _ in latest_prices(db, chunk).values()}
+            rows = (
+                db.query(PriceHistory.id, PriceHistory.game_id, PriceHistory.price_cents, PriceHistory.currency,
+                         PriceHistory.recorded_at, PriceHistory.last_seen_at)
+                .filter(PriceHistory.game_id.in_(chunk), PriceHistory.recorded_at < cutoff)
+                .order_by(PriceHistory.game_id, PriceHistory.recorded_at, PriceHistory.id)
+                .all()
+            )
+
+            by_game = defaultdict(list)
+            for row_id, game_id, price_cents, currency, recorded_at, last_seen_at in rows:
+                if row_id in keep_ids:
+                    continue
+                by_game[game_id].append((row_id, {
+                    'price_cents': price_cents,
+                    'currency': currency,
+                    'recorded_at': recorded_at,
+                    'last_seen_at': last_seen_at
+                }))
+
+            archived_ids = []
+            for game_id, game_rows in by_game.items():
+                self.append(game_id, [row for _, row in game_rows])
+                archived_ids.extend(row_id for row_id, _ in game_rows)
+            for offset in range(0, len(archived_ids), DELETE_CHUNK_SIZE):
+                batch = archived_ids[offset:offset + DELETE_CHUNK_SIZE]
+                db.execute(delete(PriceHistory).where(PriceHistory.id.in_(batch)))
+            db.commit()
+
+            games_archived += len(by_game)
+            rows_archived += len(archived_ids)
+
+        summary = {'games': games_archived, 'rows': rows_archived, 'cutoff': cutoff}
+        logger.info(f"Archived {summary['rows']} price history rows of {summary['games']} games older than {cutoff}")
+        return summary
+
+
+# Global instance
+price_archive = PriceArchive()
@@ -0,0 +1,117 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+
+from models.models import PriceHistory
+
+logger = logging.getLogger(__name__)
+
+# changes: one row per price change, extended while the price holds; all: one row per check (legacy)
+PRICE_HISTORY_MODE = os.getenv('PRICE_HISTORY_MODE', 'changes')
+
+
+def latest_prices(db, game_ids: List[int]) -> Dict[int, Tuple[int, int, str]]:
+    """Newest history row per game as {game_id: (row_id, price_cents, currency)}"""
+    if not game_ids:
+        return {}
+    newest_ids = (
+        select(func.max(PriceHistory.id))
+        .where(PriceHistory.game_id.in_(game_ids))
+        .group_by(PriceHistory.game_id)
+    )
+    rows = (
+        db.query(PriceHistory.id, PriceHistory.game_id, PriceHistory.price_cents, PriceHistory.currency)
+        .filter(PriceHistory.id.in_(newest_ids))
+        .all()
+    )
+    return {game_id: (row_id, price_cents, currency) for row_id, game_id, price_cents, currency in rows}
+
+
+def record_prices(db, rows: List[Dict], mode: str = PRICE_HISTORY_MODE) -> Tuple[int, int]:
+    """Store observed prices ({game_id, price_cents, currency, recorded_at} dicts).
+
+    In "changes" mode a row is only inserted when the price or currency
+    differs from the game's newest row; otherwise that row's last_seen_at is
+    moved forward. Returns (inserted, extended). The caller commits.
+    """
+    if not rows:
+        return 0, 0
+
+    inserts = []
+    extends = []
+    latest = latest_prices(db, [row['game_id'] for row in rows]) if mode == 'changes' else {}
+    for row in rows:
+        row.setdefault('recorded_at', datetime.utcnow())
+        current = latest.get(row['game_id'])
+        if current and current[1:] == (row['price_cents'], row['currency']):
+            extends.append({'id': current[0], 'last_seen_at': row['recorded_at']})
+        else:
+            inserts.append(dict(row, last_seen_at=row['recorded_at']))
+
+    if extends:
+        db.execute(update(PriceHistory), extends)
+    if inserts:
+        db.execute(insert(PriceHistory), inserts)
+    return len(inserts), len(extends)
+
+
+def get_price_intervals(db, game_id: int, since: Optional[datetime] = None,
+                        until: Optional[datetime] = None, archive=None) -> List[Dict]:
+    """Price history of a game as validity intervals, from the archive files and the live table.
+
+    Each interval runs from the row's recorded_at to the next row's recorded_at;
+    the newest one ends at its last_seen_at. Rows written before change-only
+    storage simply become short intervals, so old and new history mix freely.
+    """
+    if archive is None:
+        from bot.core.price_archive import price_archive as archive
+
+    query = db.query(PriceHistory.price_cents, PriceHistory.currency,
+                     PriceHistory.recorded_at, PriceHistory.last_seen_at).filter(PriceHistory.game_id == game_id)
+    if until is not None:
+        query = query.filter(PriceHistory.recorded_at <= until)
+    rows = [
+        (row['price_cents'], row['currency'], row['recorded_at'], row['last_seen_at'])
+        for row in archive.read(game_id)
+        if until is None or row['recorded_at'] <= until
+    ]
+    rows += query.order_by(PriceHistory.recorded_at, PriceHistory.id).all()
+    # Archived rows are older than the game's own live ones, but not always than those of a merged duplicate
+    rows.sort(key=lambda row: row[2])
+
+    intervals = []
+    for i, (price_cents, currency, recorded_at, last_seen_at) in enumerate(rows):
+        if i + 1 < len(rows):
+            valid_to = rows[i + 1][2]
+        else:
+            valid_to = last_seen_at or recorded_at
+        if since is not None and valid_to < since:
+            continue
+        if intervals and intervals[-1]['price_cents'] == price_cents and intervals[-1]['currency'] == currency:
+            intervals[-1]['valid_to'] = valid_to  # merge legacy duplicate rows
+            continue
+        intervals.append({
+            'price_cents': price_cents,
+            'currency': currency,
+            'valid_from': recorded_at,
+            'valid_to': valid_to
+        })
+    return intervals
+
+
+def expand_intervals(intervals: List[Dict], step: timedelta) -> Iterator[Tuple[datetime, int, str]]:
+    """Sample (timestamp, price_cents, currency) every `step` across the intervals"""
+    if not intervals:
+        return
+    when = intervals[0]['valid_from']
+    end = intervals[-1]['valid_to']
+    index = 0
+    while when <= end:
+        while index + 1 < len(intervals) and intervals[index + 1]['valid_from'] <= when:
+            index += 1
+        interval = intervals[index]
+        yield when, interval['price_cents'], interval['currency']
+        when += step
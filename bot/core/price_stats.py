@@ -0,0 +1,204 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from models.models import PriceStats
+
+logger = logging.getLogger(__name__)
+
+ROLLING_DAYS = 90
+# A price this far below the regular price counts as a sale
+SALE_MIN_DEPTH_PERCENT = 5
+STATS_CHUNK_SIZE = 500
+
+
+def weighted_median(price_seconds: Dict[int, float]) -> Optional[int]:
+    """Median price weighted by how long each price was seen"""
+    total = sum(price_seconds.values())
+    if not total:
+        return min(price_seconds) if price_seconds else None
+    running = 0.0
+    for price in sorted(price_seconds):
+        running += price_seconds[price]
+        if running >= total / 2:
+            return price
+    return None
+
+
+def weighted_average(price_seconds: Dict[int, float]) -> Optional[int]:
+    """Mean price weighted by how long each price was seen"""
+    total = sum(price_seconds.values())
+    if not total:
+        return min(price_seconds) if price_seconds else None
+    return round(sum(price * seconds for price, seconds in price_seconds.items()) / total)
+
+
+class PriceStatsService:
+    """Per-game price aggregates, updated as each price is observed and read with one primary-key lookup.
+
+    Rolling lows come from a bounded map of daily lows, the median and average
+    from a histogram of time spent at each price and sale counters from the
+    transitions into and out of a discount, so an update never scans history.
+    """
+
+    def apply(self, stats: PriceStats, price_cents: int, currency: str, observed_at: datetime,
+              original_price_cents: Optional[int] = None):
+        """Fold one observation into a stats row"""
+        if stats.currency != currency or stats.last_price_cents is None:
+            # First observation, or a region switch that makes old prices incomparable
+            self._reset(stats, currency)
+
+        daily_lows = json.loads(stats.daily_lows or '{}')
+        price_seconds = {int(k): v for k, v in json.loads(stats.price_seconds or '{}').items()}
+
+        # Time since the last check is credited to the price that held during it
+        if stats.last_observed_at is not None and stats.last_price_cents is not None:
+            elapsed = max((observed_at - stats.last_observed_at).total_seconds(), 0.0)
+            price_seconds[stats.last_price_cents] = price_seconds.get(stats.last_price_cents, 0.0) + elapsed
+        price_seconds.setdefault(price_cents, 0.0)
+
+        if stats.all_time_low_cents is None or price_cents < stats.all_time_low_cents:
+            stats.all_time_low_cents = price_cents
+            stats.all_time_low_at = observed_at
+
+        day = observed_at.date()
+        key = day.isoformat()
+        daily_lows[key] = min(daily_lows.get(key, price_cents), price_cents)
+        oldest = (day - timedelta(days=ROLLING_DAYS - 1)).isoformat()
+        daily_lows = {d: low for d, low in daily_lows.items() if d >= oldest}
+        since_30d = (day - timedelta(days=29)).isoformat()
+        stats.low_30d_cents = min(low for d, low in daily_lows.items() if d >= since_30d)
+        stats.low_90d_cents = min(daily_lows.values())
+
+        stats.regular_price_cents = max(stats.regular_price_cents or 0, price_cents, original_price_cents or 0)
+        self._track_sale(stats, price_cents)
+
+        stats.median_cents = weighted_median(price_seconds)
+        stats.average_cents = weighted_average(price_seconds)
+        stats.daily_lows = json.dumps(daily_lows, separators=(',', ':'))
+        stats.price_seconds = json.dumps(price_seconds, separators=(',', ':'))
+        stats.last_price_cents = price_cents
+        stats.last_observed_at = observed_at
+        stats.updated_at = datetime.utcnow()
+
+    def _reset(self, stats: PriceStats, currency: str):
+        stats.currency = currency
+        stats.last_price_cents = None
+        stats.last_observed_at = None
+        stats.all_time_low_cents = None
+        stats.all_time_low_at = None
+        stats.regular_price_cents = None
+        stats.sale_count = 0
+        stats.sale_depth_sum = 0.0
+        stats.avg_sale_depth_percent = None
+        stats.current_sale_depth_percent = None
+        stats.daily_lows = None
+        stats.price_seconds = None
+
+    def _track_sale(self, stats: PriceStats, price_cents: int):
+        """Count sales and keep their deepest discount"""
+        regular = stats.regular_price_cents
+        depth = (regular - price_cents) * 100 / regular if regular else 0.0
+        if depth >= SALE_MIN_DEPTH_PERCENT:
+            if stats.current_sale_depth_percent is None:
+                stats.sale_count = (stats.sale_count or 0) + 1
+                stats.sale_depth_sum = (stats.sale_depth_sum or 0.0) + depth
+                stats.current_sale_depth_percent = depth
+            elif depth > stats.current_sale_depth_percent:
+                stats.sale_depth_sum += depth - stats.current_sale_depth_percent
+                stats.current_sale_depth_percent = depth
+        else:
+            stats.current_sale_depth_percent = None
+        stats.avg_sale_depth_percent = stats.sale_depth_sum / stats.sale_count if stats.sale_count else None
+
+    def update_many(self, db, observations: List[Dict]):
+        """Apply {game_id, price_cents, currency, observed_at, original_price_cents} observations; the caller commits"""
+        for start in range(0, len(observations), STATS_CHUNK_SIZE):
+            chunk = observations[start:start + STATS_CHUNK_SIZE]
+            existing = {
+                stats.game_id: stats
+                for stats in db.query(PriceStats).filter(PriceStats.game_id.in_([o['game_id'] for o in chunk]))
+            }
+            for observation in chunk:
+                stats = existing.get(observation['game_id'])
+                if stats is None:
+                    stats = PriceStats(game_id=observation['game_id'], currency=observation['currency'])
+                    existing[observation['game_id']] = stats
+                    db.add(stats)
+                self.apply(stats, observation['price_cents'], observation['currency'],
+                           observation['observed_at'], observation.get('original_price_cents'))
+            db.flush()
+            # Don't let the identity map grow with the sweep
+            for stats in existing.values():
+                db.expunge(stats)
+
+    def get(self, db, game_id: int) -> Optional[Dict]:
+        """Aggregates for one game, or None if it was never priced"""
+        stats = db.get(PriceStats, game_id)
+        return self.as_dict(stats) if stats else None
+
+    def get_many(self, db, game_ids: List[int]) -> Dict[int, Dict]:
+        if not game_ids:
+            return {}
+        rows = db.query(PriceStats).filter(PriceStats.game_id.in_(game_ids)).all()
+        return {stats.game_id: self.as_dict(stats) for stats in rows}
+
+    @staticmethod
+    def as_dict(stats: PriceStats) -> Dict:
+        return {
+            'currency': stats.currency,
+            'all_time_low_cents': stats.all_time_low_cents,
+            'all_time_low_at': stats.all_time_low_at,
+            'low_30d_cents': stats.low_30d_cents,
+            'low_90d_cents': stats.low_90d_cents,
+            'median_cents': stats.median_cents,
+            'average_cents': stats.average_cents,
+            'regular_price_cents': stats.regular_price_cents,
+            'sale_count': stats.sale_count or 0,
+            'avg_sale_depth_percent': stats.avg_sale_depth_percent,
+            'on_sale': stats.current_sale_depth_percent is not None
+        }
+
+    def rebuild(self, db, game_id: int, intervals: List[Dict]):
+        """Recompute a game's stats from its history intervals (one-off backfill for existing data)"""
+        stats = db.get(PriceStats, game_id)
+        if stats is not None:
+            db.delete(stats)
+            db.flush()
+        observations = []
+        for interval in intervals:
+            observations.append({'game_id': game_id, 'price_cents': interval['price_cents'],
+                                 'currency': interval['currency'], 'observed_at': interval['valid_from']})
+            if interval['valid_to'] > interval['valid_from']:
+                observations.append({'game_id': game_id, 'price_cents': interval['price_cents'],
+                                     'currency': interval['currency'], 'observed_at': interval['valid_to']})
+        self.update_many(db, observations)
+
+    def backfill_batch(self, db, after: int = 0, batch_size: int = 100) -> Optional[int]:
+        """Build stats for the next games (by id, after `after`) that have history but no stats.
+
+        Commits once per batch and returns the last game id handled, or None when done.
+        """
+        from bot.core.price_history import get_price_intervals
+        from models.models import PriceHistory
+
+        game_ids = [game_id for (game_id,) in (
+            db.query(PriceHistory.game_id)
+            .outerjoin(PriceStats, PriceStats.game_id == PriceHistory.game_id)
+            .filter(PriceHistory.game_id > after, PriceStats.game_id.is_(None))
+            .distinct()
+            .order_by(PriceHistory.game_id)
+            .limit(batch_size)
+            .all()
+        )]
+        if not game_ids:
+            return None
+        for game_id in game_ids:
+            self.rebuild(db, game_id, get_price_intervals(db, game_id))
+        db.commit()
+        return game_ids[-1]
+
+
+# Global instance
+price_stats = PriceStatsService()
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from bot.utils.rate_limiter import HostRateLimiter
+from providers.base_provider import AsyncPriceProvider
+
+logger = logging.getLogger(__name__)
+
+# Sweep tuning (can be overridden from environment)
+SWEEP_CONCURRENCY = int(os.getenv('SWEEP_CONCURRENCY', 8))
+SWEEP_RATE_PER_HOST = float(os.getenv('SWEEP_RATE_PER_HOST', 4))
+SWEEP_BATCH_SIZE = int(os.getenv('SWEEP_BATCH_SIZE', 200))
+
+
+class PriceSweeper:
+    """Fetches game info for many games concurrently without blocking the event loop.
+
+    Async providers are asked for whole batches through get_game_infos and
+    enforce their own connection and rate limits; blocking providers are
+    fanned out over a thread pool with the sweeper's limits.
+    """
+
+    def __init__(self, price_provider, concurrency: int = SWEEP_CONCURRENCY,
+                 rate_per_host: float = SWEEP_RATE_PER_HOST, batch_size: int = SWEEP_BATCH_SIZE):
+        self.price_provider = price_provider
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.rate_limiter = HostRateLimiter(rate_per_host)
+        self.host = getattr(price_provider, 'BASE_URL', 'default')
+        self._executor = None
+        if not isinstance(price_provider, AsyncPriceProvider):
+            # Blocking providers run in a dedicated pool sized to the concurrency
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='price-sweep')
+
+    async def fetch(self, source_id: str, region: str) -> Optional[Dict]:
+        """Fetch info for one game, respecting the per-host rate limit"""
+        await self.rate_limiter.acquire(self.host)
+        try:
+            if self._executor is None:
+                return await self.price_provider.get_game_info(source_id, region)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, self.price_provider.get_game_info, source_id, region
+            )
+        except Exception as e:
+            logger.error(f"Error fetching game {source_id}: {e}")
+            return None
+
+    async def sweep(self, targets: Iterable[Tuple[object, str, str]]) -> AsyncIterator[Tuple[object, Optional[Dict]]]:
+        """Fetch (key, source_id, region) targets concurrently, yielding (key, game_info) as they complete"""
+        if self._executor is None:
+            async for result in self._sweep_batches(targets):
+                yield result
+            return
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_one(key, source_id, region):
+            async with semaphore:
+                return key, await self.fetch(source_id, region)
+
+        tasks = [asyncio.create_task(fetch_one(*target)) for target in targets]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Don't leave fetches running if the consumer stops early
+            for task in tasks:
+                task.cancel()
+
+    async def _sweep_batches(self, targets):
+        """Fetch targets through the provider's batch API, one region chunk at a time"""
+        by_region = defaultdict(list)
+        for key, source_id, region in targets:
+            by_region[region].append((key, source_id))
+
+        for region, items in by_region.items():
+            for start in range(0, len(items), self.batch_size):
+                chunk = items[start:start + self.batch_size]
+                try:
+                    infos = await self.price_provider.get_game_infos([source_id for _, source_id in chunk], region)
+                except Exception as e:
+                    logger.error(f"Error fetching batch of {len(chunk)} games in region {region}: {e}")
+                    infos = {}
+                for key, source_id in chunk:
+                    yield key, infos.get(source_id)
+
+    def shutdown(self):
+        """Release the worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+class SweepReport:
+    """Collects counters for one sweep and formats the summary"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.fetched = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    def record(self, success: bool):
+        if success:
+            self.fetched += 1
+        else:
+            self.failed += 1
+
+    def finish(self) -> Dict:
+        """Stop the clock and return the sweep summary"""
+        self.finished_at = time.monotonic()
+        return self.as_dict()
+
+    def as_dict(self) -> Dict:
+        duration = (self.finished_at or time.monotonic()) - self.started_at
+        processed = self.fetched + self.failed
+        return {
+            "total": self.total,
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "duration_seconds": duration,
+            "games_per_second": processed / duration if duration > 0 else 0.0
+        }
@@ -0,0 +1,117 @@
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import update
+
+from bot.core.price_history import record_prices, PRICE_HISTORY_MODE
+from bot.core.price_stats import price_stats
+from models.models import Game
+
+logger = logging.getLogger(__name__)
+
+SWEEP_WRITE_CHUNK = int(os.getenv('SWEEP_WRITE_CHUNK', 500))  # games written per transaction
+
+
+class GameRef(NamedTuple):
+    """The few Game columns a sweep needs, loaded as plain tuples instead of tracked ORM objects"""
+    id: int
+    source_id: str
+    title: str
+    currency: Optional[str]
+
+
+GAME_REF_COLUMNS = (Game.id, Game.source_id, Game.title, Game.currency)
+
+
+def load_game_refs(query) -> List[GameRef]:
+    """Run a query over GAME_REF_COLUMNS and wrap the rows"""
+    return [GameRef(*row) for row in query.all()]
+
+
+def to_cents(price: Optional[float]) -> Optional[int]:
+    return round(price * 100) if price else None
+
+
+class PriceWriter:
+    """Buffers sweep results and writes them in bounded chunks.
+
+    Every chunk is one executemany UPDATE of games plus executemany writes
+    to price_history (see record_prices) and price_stats, followed by a commit, so memory stays
+    flat and the write lock is held only briefly regardless of the sweep size.
+    """
+
+    def __init__(self, db, chunk_size: int = SWEEP_WRITE_CHUNK, history_mode: str = PRICE_HISTORY_MODE):
+        self.db = db
+        self.chunk_size = max(1, chunk_size)
+        self.history_mode = history_mode
+        self._game_updates: List[Dict] = []
+        self._history_rows: List[Dict] = []
+        self._observations: List[Dict] = []
+        self.games_written = 0
+        self.history_written = 0
+        self.history_extended = 0
+        self.chunks = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self._game_updates) >= self.chunk_size
+
+    def add(self, game_id: int, game_info: Dict, checked_at: Optional[datetime] = None):
+        """Queue the fetched info of one game, flushing when the chunk is full"""
+        self.queue(game_id, game_info, checked_at)
+        if self.full:
+            self.flush()
+
+    def queue(self, game_id: int, game_info: Dict, checked_at: Optional[datetime] = None):
+        """Queue the fetched info of one game without writing; the caller flushes once `full`"""
+        current_price_cents = to_cents(game_info['current_price'])
+        checked_at = checked_at or datetime.utcnow()
+        self._game_updates.append({
+            'id': game_id,
+            'last_price_cents': current_price_cents,
+            'original_price_cents': to_cents(game_info['original_price']),
+            'discount_percent': game_info['discount_percent'],
+            'currency': game_info['currency'],
+            'last_checked': checked_at
+        })
+        if current_price_cents:
+            self._history_rows.append({
+                'game_id': game_id,
+                'price_cents': current_price_cents,
+                'currency': game_info['currency'],
+                'recorded_at': checked_at
+            })
+            self._observations.append({
+                'game_id': game_id,
+                'price_cents': current_price_cents,
+                'currency': game_info['currency'],
+                'observed_at': checked_at,
+                'original_price_cents': to_cents(game_info['original_price'])
+            })
+
+    def flush(self):
+        """Write and commit everything queued so far"""
+        if not self._game_updates:
+            return
+        try:
+            self.db.execute(update(Game), self._game_updates)
+            inserted, extended = record_prices(self.db, self._history_rows, self.history_mode)
+            price_stats.update_many(self.db, self._observations)
+            self.db.commit()
+        except Exception as e:
+            # Drop the chunk: keeping it would make every later chunk of the sweep fail on the same rows
+            logger.error(f"Dropped a chunk of {len(self._game_updates)} games that could not be written: {e}")
+            self.db.rollback()
+            raise
+        else:
+            self.games_written += len(self._game_updates)
+            self.history_written += inserted
+            self.history_extended += extended
+            self.chunks += 1
+            logger.debug(f"Wrote chunk of {len(self._game_updates)} games")
+        finally:
+            self._game_updates = []
+            self._history_rows = []
+            self._observations = []
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+STATE_STORAGE = os.getenv('STATE_STORAGE', 'memory')  # memory | sqlite | redis
+STATE_TTL_SECONDS = int(os.getenv('STATE_TTL_SECONDS', 3600))  # idle conversations are forgotten after this
+STATE_MAX_ENTRIES = int(os.getenv('STATE_MAX_ENTRIES', 10000))  # users whose state is kept at once
+STATE_MAX_BYTES = int(os.getenv('STATE_MAX_BYTES', 16 * 1024 * 1024))  # JSON size of all data kept in memory
+STATE_STORAGE_PATH = os.getenv('STATE_STORAGE_PATH', './fsm_state.db')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
+
+# How often expired entries are swept out instead of waiting to be looked up again
+PURGE_INTERVAL = 60
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """In-process FSM storage with a TTL per user and an LRU ceiling on entries and data size"""
+
+    def __init__(self, ttl: float = STATE_TTL_SECONDS, max_entries: int = STATE_MAX_ENTRIES,
+                 max_bytes: int = STATE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # key -> (expires_at, state, data, size of data in bytes)
+        self._entries: "OrderedDict[StorageKey, Tuple[float, Optional[str], Dict[str, Any], int]]" = OrderedDict()
+        self._bytes = 0
+        self._next_purge = time.monotonic() + PURGE_INTERVAL
+        self.expired = 0
+        self.evictions = 0
+
+    def _get(self, key: StorageKey):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _drop(self, key: StorageKey):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[3]
+
+    def _put(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]):
+        if key in self._entries:
+            self._drop(key)
+        if state is None and not data:
+            return
+        size = len(json.dumps(data)) if data else 0
+        self._entries[key] = (time.monotonic() + self.ttl, state, data, size)
+        self._bytes += size
+        self._purge_expired()
+        # Never evict the entry just written, even if it alone is over the byte budget
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + PURGE_INTERVAL
+        for key in [key for key, entry in self._entries.items() if entry[0] <= now]:
+            self._drop(key)
+            self.expired += 1
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = self._get(key)
+        self._put(key, _state_name(state), entry[2] if entry else {})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = self._get(key)
+        return entry[1] if entry else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        entry = self._get(key)
+        self._put(key, entry[1] if entry else None, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = self._get(key)
+        return dict(entry[2]) if entry else {}
+
+    async def close(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Size and eviction counters for monitoring"""
+        return {
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage in a local SQLite file, so conversations survive a restart; entries expire after the TTL"""
+
+    def __init__(self, path: str = STATE_STORAGE_PATH, ttl: float = STATE_TTL_SECONDS,
+                 max_entries: int = STATE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.key_builder = DefaultKeyBuilder(with_destiny=True)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._next_purge = 0.0
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the state file on first use"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fsm_state ("
+                "key TEXT PRIMARY KEY, state TEXT, data TEXT, expires_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_fsm_state_expires_at ON fsm_state (expires_at)")
+            self._conn.commit()
+        return self._conn
+
+    def _read(self, key: StorageKey) -> Tuple[Optional[str], Dict[str, Any]]:
+        with self._lock:
+            row = self._get_conn().execute(
+                "SELECT state, data FROM fsm_state WHERE key = ? AND expires_at > ?",
+                (self.key_builder.build(key), time.time())
+            ).fetchone()
+        if row is None:
+            return None, {}
+        return row[0], json.loads(row[1]) if row[1] else {}
+
+    def _write(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            conn = self._get_conn()
+            if state is None and not data:
+                conn.execute("DELETE FROM fsm_state WHERE key = ?", (self.key_builder.build(key),))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO fsm_state (key, state, data, expires_at) VALUES (?, ?, ?, ?)",
+                    (self.key_builder.build(key), state, json.dumps(data) if data else None, now + self.ttl)
+                )
+            if now >= self._next_purge:
+                self._next_purge = now + PURGE_INTERVAL
+                conn.execute("DELETE FROM fsm_state WHERE expires_at <= ?", (now,))
+                # Entries are refreshed on every write, so the earliest expiry is the least recently used
+                conn.execute(
+                    "DELETE FROM fsm_state WHERE key IN (SELECT key FROM fsm_state ORDER BY expires_at DESC "
+                    "LIMIT -1 OFFSET ?)", (self.max_entries,)
+                )
+            conn.commit()
+
+    def _set_state(self, key: StorageKey, state: Optional[str]):
+        _, data = self._read(key)
+        self._write(key, state, data)
+
+    def _set_data(self, key: StorageKey, data: Dict[str, Any]):
+        state, _ = self._read(key)
+        self._write(key, state, data)
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # The file can be shared by several webhook workers, so waits on its lock happen in a thread, not on the loop
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await asyncio.to_thread(self._set_state, key, _state_name(state))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await asyncio.to_thread(self._read, key))[0]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await asyncio.to_thread(self._set_data, key, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await asyncio.to_thread(self._read, key))[1]
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._close)
+
+
+def make_state_storage(backend: str = STATE_STORAGE) -> BaseStorage:
+    """FSM storage for the dispatcher, chosen by STATE_STORAGE"""
+    if backend == 'sqlite':
+        return SQLiteStorage()
+    if backend == 'redis':
+        # Optional dependency, only needed for this backend (pip install redis)
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(REDIS_URL, state_ttl=STATE_TTL_SECONDS, data_ttl=STATE_TTL_SECONDS)
+    if backend != 'memory':
+        logger.warning(f"Unknown STATE_STORAGE '{backend}', using memory")
+    return BoundedMemoryStorage()
@@ -0,0 +1,78 @@
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bot.core.price_writer import GameRef, GAME_REF_COLUMNS, load_game_refs
+from models.models import Game, UserWishlist, SweepProgress
+
+logger = logging.getLogger(__name__)
+
+# Time-sliced sweep tuning (can be overridden from environment)
+SWEEP_WINDOW_SECONDS = int(os.getenv('SWEEP_WINDOW_SECONDS', 12 * 3600))  # target time to check every game once
+SWEEP_SLICE_SECONDS = int(os.getenv('SWEEP_SLICE_SECONDS', 300))  # one shard is checked per slice
+SWEEP_JITTER_SECONDS = int(os.getenv('SWEEP_JITTER_SECONDS', 30))  # random delay added to every slice
+
+
+class SweepSlicer:
+    """Splits the full price sweep into shards spread evenly over a completion window.
+
+    Games are assigned to shards by id, so a shard is stable across restarts
+    and new games simply join their shard. Progress is stored in sweep_progress:
+    after a restart the sweep resumes with the first shard that was not finished.
+    """
+
+    def __init__(self, window_seconds: int = SWEEP_WINDOW_SECONDS, slice_seconds: int = SWEEP_SLICE_SECONDS,
+                 name: str = 'price_sweep'):
+        self.window_seconds = max(1, window_seconds)
+        self.slice_seconds = max(1, min(slice_seconds, self.window_seconds))
+        self.shard_count = max(1, self.window_seconds // self.slice_seconds)
+        self.name = name
+
+    def _start_cycle(self, progress: SweepProgress, now: datetime):
+        progress.cycle_started_at = now
+        progress.shard_count = self.shard_count
+        progress.next_shard = 0
+        progress.updated_at = now
+
+    def next_shard(self, db, now: Optional[datetime] = None) -> Optional[int]:
+        """The shard to check now, or None if the current cycle is done or the next shard isn't due yet"""
+        now = now or datetime.utcnow()
+        progress = db.get(SweepProgress, self.name)
+        if progress is None:
+            progress = SweepProgress(name=self.name)
+            self._start_cycle(progress, now)
+            db.add(progress)
+        elif progress.shard_count != self.shard_count:
+            logger.info(f"Sweep shard count changed ({progress.shard_count} -> {self.shard_count}), starting a new cycle")
+            self._start_cycle(progress, now)
+        elif progress.next_shard >= progress.shard_count:
+            if now < progress.cycle_started_at + timedelta(seconds=self.window_seconds):
+                return None
+            self._start_cycle(progress, now)
+
+        due_at = progress.cycle_started_at + timedelta(seconds=progress.next_shard * self.slice_seconds)
+        if now < due_at:
+            return None
+        return progress.next_shard
+
+    def shard_games(self, db, shard: int) -> List[GameRef]:
+        """Wishlisted games that belong to a shard"""
+        return load_game_refs(
+            db.query(*GAME_REF_COLUMNS)
+            .join(UserWishlist, UserWishlist.game_id == Game.id)
+            .filter(Game.id % self.shard_count == shard)
+            .distinct()
+        )
+
+    def complete_shard(self, db, shard: int, now: Optional[datetime] = None):
+        """Record a finished shard so a restart continues with the next one"""
+        progress = db.get(SweepProgress, self.name)
+        if progress is None or progress.next_shard != shard:
+            return
+        progress.next_shard = shard + 1
+        progress.updated_at = now or datetime.utcnow()
+        if progress.next_shard >= progress.shard_count:
+            elapsed = (progress.updated_at - progress.cycle_started_at).total_seconds()
+            logger.info(f"Sweep cycle finished: {progress.shard_count} shards in {elapsed:.0f}s "
+                        f"(target {self.window_seconds}s)")
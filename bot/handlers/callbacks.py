@@ -1,29 +1,29 @@
+import asyncio
 import logging
+from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy.orm import Session
 
-from models.database import get_db
-from models.models import User, Game, UserWishlist
-from providers.deku_deals_provider import DekuDealsProvider
 from bot.core.user_manager import UserManager
-from bot.utils.helpers import get_currency_symbol
+from bot.utils.helpers import get_currency_symbol, format_price_stats
+from bot.core.price_stats import PriceStatsService
 from .keyboards import get_main_menu_keyboard
-from .commands import search_results, user_states, price_provider
+from .queries import find_user, wishlist_games, add_to_wishlist, remove_from_wishlist, set_region
 
 logger = logging.getLogger(__name__)
 
 
-async def process_add_game(callback_query: CallbackQuery):
+async def process_add_game(callback_query: CallbackQuery, db: Session, state: FSMContext):
     """Handle add game menu button"""
     user_id = callback_query.from_user.id
-    db = next(get_db())
 
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await callback_query.answer("❌ User not found")
         return
 
     # Check wishlist limit
-    limits = UserManager.check_user_limits(user.id)
+    limits = await asyncio.to_thread(UserManager.check_user_limits, user.id, db)
     if not limits["can_add_more"]:
         await callback_query.message.edit_text(
             f"❌ Wishlist limit reached ({limits['current_games']} / {limits['max_games']}).\n\n"
@@ -47,28 +47,22 @@ async def process_add_game(callback_query: CallbackQuery):
     )
 
     # Set user state for game search
-    user_states[user_id] = {'action': 'search_game'}
+    await state.set_state('search_game')
 
     await callback_query.answer()
 
 
-async def process_wishlist(callback_query: CallbackQuery):
+async def process_wishlist(callback_query: CallbackQuery, db: Session):
     """Handle wishlist menu button"""
     user_id = callback_query.from_user.id
-    db = next(get_db())
 
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await callback_query.answer("❌ User not found")
         return
 
     # Get user's wishlist with game info
-    wishlist_items = (
-        db.query(UserWishlist, Game)
-        .join(Game, UserWishlist.game_id == Game.id)
-        .filter(UserWishlist.user_id == user.id)
-        .all()
-    )
+    wishlist_items = await asyncio.to_thread(wishlist_games, db, user.id, True)
 
     if not wishlist_items:
         empty_keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -85,13 +79,13 @@ async def process_wishlist(callback_query: CallbackQuery):
         return
 
     # Get user limits
-    limits = UserManager.check_user_limits(user.id)
+    limits = await asyncio.to_thread(UserManager.check_user_limits, user.id, db)
 
     # Create wishlist with buttons
     response = f"📋 <b>Your Wishlist:</b> {limits['current_games']} / {limits['max_games']} games\n\n"
     keyboard_buttons = []
 
-    for i, (wishlist_item, game) in enumerate(wishlist_items, 1):
+    for i, (wishlist_item, game, stats) in enumerate(wishlist_items, 1):
         # Format price display with current price, crossed out original price, and discount
         currency_symbol = get_currency_symbol(user.region)
 
@@ -107,7 +101,9 @@ async def process_wishlist(callback_query: CallbackQuery):
             price_display = "Price not checked"
 
         threshold_text = f" (desired: {currency_symbol}{wishlist_item.desired_price_cents/100:.2f})" if wishlist_item.desired_price_cents else ""
-        response += f"{i}. {game.title}\n   💰 {price_display}{threshold_text}\n\n"
+        stats_text = format_price_stats(PriceStatsService.as_dict(stats) if stats else None, currency_symbol)
+        stats_line = f"\n   {stats_text}" if stats_text else ""
+        response += f"{i}. {game.title}\n   💰 {price_display}{threshold_text}{stats_line}\n\n"
 
         # Add buttons for each game
         keyboard_buttons.append([
@@ -124,12 +120,11 @@ async def process_wishlist(callback_query: CallbackQuery):
     await callback_query.answer()
 
 
-async def process_settings(callback_query: CallbackQuery):
+async def process_settings(callback_query: CallbackQuery, db: Session):
     """Handle settings menu button"""
     user_id = callback_query.from_user.id
-    db = next(get_db())
 
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await callback_query.answer("❌ User not found")
         return
@@ -209,24 +204,18 @@ async def process_back_to_menu(callback_query: CallbackQuery):
     await callback_query.answer()
 
 
-async def process_wishlist_confirm_remove(callback_query: CallbackQuery):
+async def process_wishlist_confirm_remove(callback_query: CallbackQuery, db: Session):
     """Handle remove game confirmation from wishlist"""
     user_id = callback_query.from_user.id
     game_index = int(callback_query.data.split("_")[-1])
 
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await callback_query.answer("❌ User not found")
         return
 
     # Get user's wishlist with game info
-    wishlist_items = (
-        db.query(UserWishlist, Game)
-        .join(Game, UserWishlist.game_id == Game.id)
-        .filter(UserWishlist.user_id == user.id)
-        .all()
-    )
+    wishlist_items = await asyncio.to_thread(wishlist_games, db, user.id)
 
     if game_index < 0 or game_index >= len(wishlist_items):
         await callback_query.answer("❌ Invalid game number")
@@ -253,44 +242,32 @@ async def process_wishlist_confirm_remove(callback_query: CallbackQuery):
     await callback_query.answer()
 
 
-async def process_wishlist_do_remove(callback_query: CallbackQuery):
+async def process_wishlist_do_remove(callback_query: CallbackQuery, db: Session):
     """Handle actual game removal from wishlist"""
     user_id = callback_query.from_user.id
     game_index = int(callback_query.data.split("_")[-1])
 
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await callback_query.answer("❌ User not found")
         return
 
-    # Get user's wishlist with game info for logging
-    wishlist_items = (
-        db.query(UserWishlist, Game)
-        .join(Game, UserWishlist.game_id == Game.id)
-        .filter(UserWishlist.user_id == user.id)
-        .all()
-    )
-
-    if game_index < 0 or game_index >= len(wishlist_items):
+    # Remove the game
+    removed = await asyncio.to_thread(remove_from_wishlist, db, user.id, game_index)
+    if removed is None:
         await callback_query.answer("❌ Invalid game number")
         return
 
-    wishlist_item, game = wishlist_items[game_index]
-
-    logger.info(f"User {user_id} confirmed removal of game '{game.title}' (ID: {game.id}) from wishlist")
-
-    # Remove the game
-    db.delete(wishlist_item)
-    db.commit()
+    game_id, title = removed
+    logger.info(f"User {user_id} confirmed removal of game '{title}' (ID: {game_id}) from wishlist")
 
     await callback_query.answer("✅ Game removed from wishlist!")
 
     # Refresh wishlist view
-    await process_wishlist(callback_query)
+    await process_wishlist(callback_query, db)
 
 
-async def process_wishlist_cancel_remove(callback_query: CallbackQuery):
+async def process_wishlist_cancel_remove(callback_query: CallbackQuery, db: Session):
     """Handle cancel game removal"""
     user_id = callback_query.from_user.id
     game_index = int(callback_query.data.split("_")[-1])
@@ -300,27 +277,21 @@ async def process_wishlist_cancel_remove(callback_query: CallbackQuery):
     await callback_query.answer("❌ Removal cancelled")
 
     # Refresh wishlist view
-    await process_wishlist(callback_query)
+    await process_wishlist(callback_query, db)
 
 
-async def process_wishlist_threshold(callback_query: CallbackQuery):
+async def process_wishlist_threshold(callback_query: CallbackQuery, db: Session, state: FSMContext):
     """Handle set threshold for game"""
     user_id = callback_query.from_user.id
     game_index = int(callback_query.data.split("_")[-1])
 
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await callback_query.answer("❌ User not found")
         return
 
     # Get user's wishlist
-    wishlist_items = (
-        db.query(UserWishlist, Game)
-        .join(Game, UserWishlist.game_id == Game.id)
-        .filter(UserWishlist.user_id == user.id)
-        .all()
-    )
+    wishlist_items = await asyncio.to_thread(wishlist_games, db, user.id)
 
     if game_index < 0 or game_index >= len(wishlist_items):
         await callback_query.answer("❌ Invalid game number")
@@ -345,15 +316,15 @@ async def process_wishlist_threshold(callback_query: CallbackQuery):
     await callback_query.answer()
 
     # Store user state for threshold setting
-    user_states[user_id] = {'action': 'set_threshold_inline', 'game_index': game_index}
+    await state.set_state('set_threshold_inline')
+    await state.update_data(game_index=game_index)
 
 
-async def process_settings_region(callback_query: CallbackQuery):
+async def process_settings_region(callback_query: CallbackQuery, db: Session):
     """Handle region settings"""
     user_id = callback_query.from_user.id
-    db = next(get_db())
 
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await callback_query.answer("❌ User not found")
         return
@@ -378,23 +349,17 @@ async def process_settings_region(callback_query: CallbackQuery):
     await callback_query.answer()
 
 
-async def process_settings_threshold(callback_query: CallbackQuery):
+async def process_settings_threshold(callback_query: CallbackQuery, db: Session):
     """Handle threshold settings"""
     user_id = callback_query.from_user.id
-    db = next(get_db())
 
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await callback_query.answer("❌ User not found")
         return
 
     # Get user's wishlist
-    wishlist_items = (
-        db.query(UserWishlist, Game)
-        .join(Game, UserWishlist.game_id == Game.id)
-        .filter(UserWishlist.user_id == user.id)
-        .all()
-    )
+    wishlist_items = await asyncio.to_thread(wishlist_games, db, user.id)
 
     if not wishlist_items:
         threshold_text = (
@@ -427,24 +392,19 @@ async def process_settings_threshold(callback_query: CallbackQuery):
     await callback_query.answer()
 
 
-async def process_region_change(callback_query: CallbackQuery):
+async def process_region_change(callback_query: CallbackQuery, db: Session):
     """Handle region change"""
     user_id = callback_query.from_user.id
     region = callback_query.data.split("_")[-1]
 
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == user_id).first()
-    if not user:
+    if not await asyncio.to_thread(set_region, db, user_id, region):
         await callback_query.answer("❌ User not found")
         return
 
-    user.region = region
-    db.commit()
-
     await callback_query.answer(f"✅ Region changed to {region.upper()}")
 
     # Refresh settings view
-    await process_settings(callback_query)
+    await process_settings(callback_query, db)
 
 
 
@@ -465,19 +425,18 @@ async def process_donate_stars(callback_query: CallbackQuery):
     await callback_query.answer()
 
 
-async def process_add_game_selection(callback_query: CallbackQuery):
+async def process_add_game_selection(callback_query: CallbackQuery, db: Session, state: FSMContext):
     """Handle game selection from search results"""
     user_id = callback_query.from_user.id
     game_index = int(callback_query.data.split("_")[-1])
 
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await callback_query.answer("❌ User not found")
         return
 
     # Check wishlist limit before adding
-    limits = UserManager.check_user_limits(user.id)
+    limits = await asyncio.to_thread(UserManager.check_user_limits, user.id, db)
     if not limits["can_add_more"]:
         await callback_query.message.edit_text(
             f"❌ Wishlist limit reached ({limits['current_games']} / {limits['max_games']}).\n\n"
@@ -489,59 +448,30 @@ async def process_add_game_selection(callback_query: CallbackQuery):
         return
 
     # Get search results
-    if user_id not in search_results:
+    games = (await state.get_data()).get('search_results')
+    if games is None:
         await callback_query.answer("❌ Search results expired")
         return
 
-    games = search_results[user_id]
     if game_index < 0 or game_index >= len(games):
         await callback_query.answer("❌ Invalid game number")
         return
 
     selected_game = games[game_index]
 
-    # Check if game already in wishlist
-    existing_game = db.query(Game).filter(Game.source_id == selected_game['id']).first()
-    if existing_game:
-        # Check if already in user's wishlist
-        existing_wishlist = db.query(UserWishlist).filter(
-            UserWishlist.user_id == user.id,
-            UserWishlist.game_id == existing_game.id
-        ).first()
-        if existing_wishlist:
-            await callback_query.message.edit_text(
-                "❌ This game is already in your wishlist!",
-                reply_markup=get_main_menu_keyboard(),
-                parse_mode="HTML"
-            )
-            await callback_query.answer()
-            return
-        game = existing_game
-    else:
-        # Create new game entry
-        game = Game(
-            source_id=selected_game['id'],
-            title=selected_game['title'],
-            platform=selected_game['platform'],
-            last_price_cents=int(selected_game['current_price'] * 100) if selected_game['current_price'] else None,
-            original_price_cents=int(selected_game['original_price'] * 100) if selected_game['original_price'] else None,
-            discount_percent=selected_game['discount_percent'],
-            currency='USD'
+    # Add to wishlist unless it is already there
+    if not await asyncio.to_thread(add_to_wishlist, db, user.id, selected_game,
+                                   selected_game.get('currency', 'USD')):
+        await callback_query.message.edit_text(
+            "❌ This game is already in your wishlist!",
+            reply_markup=get_main_menu_keyboard(),
+            parse_mode="HTML"
         )
-        db.add(game)
-        db.commit()
-        db.refresh(game)
-
-    # Add to wishlist
-    wishlist_item = UserWishlist(
-        user_id=user.id,
-        game_id=game.id
-    )
-    db.add(wishlist_item)
-    db.commit()
+        await callback_query.answer()
+        return
 
     # Keep search state active for continuous searching
-    # Don't clean up user_states and search_results
+    # Don't clear the FSM state and search results
 
     success_text = (
         f"✅ <b>{selected_game['title']}</b> added to your wishlist!\n\n"
@@ -572,7 +502,7 @@ async def process_add_game_selection(callback_query: CallbackQuery):
 def register_callbacks(dp):
     """Register all callback query handlers"""
     dp.callback_query.register(process_add_game, lambda c: c.data == "menu_add_game")
-    dp.callback_query.register(process_wishlist, lambda c: c.data == "menu_wishlist")
+    dp.callback_query.register(process_wishlist, lambda c: c.data == "menu_wishlist", flags={"read_only": True})
     dp.callback_query.register(process_settings, lambda c: c.data == "menu_settings")
     dp.callback_query.register(process_help, lambda c: c.data == "menu_help")
     dp.callback_query.register(process_donate, lambda c: c.data == "menu_donate")
@@ -1,36 +1,32 @@
+import asyncio
 import logging
-from aiogram import Bot
 from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy.orm import Session
 
-from models.database import get_db
-from models.models import User, Game, UserWishlist
-from providers.deku_deals_provider import DekuDealsProvider
+from providers.base_provider import currency_for_region
+from providers.deku_deals_provider import AsyncDekuDealsProvider
+from providers.search_cache import SearchCache
 from bot.core.user_manager import UserManager
-from bot.utils.helpers import get_currency_symbol
+from bot.utils.helpers import get_currency_symbol, format_price_stats
+from bot.core.price_stats import PriceStatsService
+from bot.core.deal_ranker import deal_ranker
 from .keyboards import get_main_menu_keyboard
+from .queries import find_user, wishlist_games, remove_from_wishlist, set_region
 
 logger = logging.getLogger(__name__)
 
-# Global variables (will be moved to proper storage later)
-search_results = {}
-user_states = {}
-price_provider = DekuDealsProvider()
+price_provider = AsyncDekuDealsProvider(search_cache=SearchCache())
 
 
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, db: Session):
     """Handle /start command"""
     user_id = message.from_user.id
     username = message.from_user.username
 
     # Create or get user
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == user_id).first()
-    if not user:
-        user = User(telegram_id=user_id, telegram_username=username)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    await asyncio.to_thread(UserManager.create_or_get_user, user_id, username, db)
 
     welcome_text = (
         "🎮 <b>Welcome to Nintendo Deals Bot!</b>\n\n"
@@ -55,6 +51,7 @@ async def cmd_help(message: Message):
         "/start - start using the bot\n"
         "/add <game name> - add game to wishlist\n"
         "/list - show tracked games list\n"
+        "/deals - best current deals in your region\n"
         "/remove <number> - remove game from wishlist\n"
         "/setthreshold <price> - set desired price\n"
         "/region <region> - change region (us/eu/jp)\n"
@@ -69,7 +66,7 @@ async def cmd_help(message: Message):
     await message.reply(help_text, parse_mode="HTML")
 
 
-async def cmd_region(message: Message):
+async def cmd_region(message: Message, db: Session):
     """Handle /region command"""
     args = message.text.split()[1:] if len(message.text.split()) > 1 else []
     user_id = message.from_user.id
@@ -83,11 +80,7 @@ async def cmd_region(message: Message):
         await message.reply("Invalid region. Available: us, eu, jp")
         return
 
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == user_id).first()
-    if user:
-        user.region = region
-        db.commit()
+    if await asyncio.to_thread(set_region, db, user_id, region):
         await message.reply(f"✅ Region changed to: {region.upper()}")
     else:
         await message.reply("❌ User not found")
@@ -111,7 +104,7 @@ async def cmd_donate(message: Message):
     await message.reply(donate_text, parse_mode="HTML")
 
 
-async def cmd_add(message: Message):
+async def cmd_add(message: Message, db: Session, state: FSMContext):
     """Handle /add command - add game to wishlist"""
     args = message.text.split()[1:] if len(message.text.split()) > 1 else []
     user_id = message.from_user.id
@@ -121,16 +114,15 @@ async def cmd_add(message: Message):
         return
 
     query = " ".join(args)
-    db = next(get_db())
 
     # Get user
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await message.reply("❌ User not found. Use /start")
         return
 
     # Check wishlist limit
-    limits = UserManager.check_user_limits(user.id)
+    limits = await asyncio.to_thread(UserManager.check_user_limits, user.id, db)
     if not limits["can_add_more"]:
         await message.reply(
             f"❌ Wishlist limit reached ({limits['current_games']} / {limits['max_games']}).\n"
@@ -141,7 +133,7 @@ async def cmd_add(message: Message):
     # Search for games
     await message.answer("🔍 Searching for games...")
     logger.info(f"User {user_id} searching for games with query: '{query}' in region: {user.region}")
-    games = price_provider.search_games(query, user.region)
+    games = await price_provider.search_games(query, user.region)
     logger.info(f"Search returned {len(games)} games for query '{query}'")
 
     if not games:
@@ -161,28 +153,22 @@ async def cmd_add(message: Message):
     response += "Reply with number (1-5) or 'cancel' to cancel."
 
     # Store search results and user state
-    search_results[user_id] = games[:5]
-    user_states[user_id] = {'action': 'select_game'}
+    await state.set_state('select_game')
+    await state.update_data(search_results=games[:5])
     await message.answer(response)
 
 
-async def cmd_list(message: Message):
+async def cmd_list(message: Message, db: Session):
     """Handle /list command - show user's wishlist with buttons"""
     user_id = message.from_user.id
-    db = next(get_db())
 
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await message.reply("❌ User not found. Use /start")
         return
 
     # Get user's wishlist with game info
-    wishlist_items = (
-        db.query(UserWishlist, Game)
-        .join(Game, UserWishlist.game_id == Game.id)
-        .filter(UserWishlist.user_id == user.id)
-        .all()
-    )
+    wishlist_items = await asyncio.to_thread(wishlist_games, db, user.id, True)
 
     if not wishlist_items:
         await message.reply(
@@ -192,13 +178,13 @@ async def cmd_list(message: Message):
         return
 
     # Get user limits
-    limits = UserManager.check_user_limits(user.id)
+    limits = await asyncio.to_thread(UserManager.check_user_limits, user.id, db)
 
     # Create wishlist with buttons
     response = f"📋 <b>Your Wishlist:</b> {limits['current_games']} / {limits['max_games']} games\n\n"
     keyboard_buttons = []
 
-    for i, (wishlist_item, game) in enumerate(wishlist_items, 1):
+    for i, (wishlist_item, game, stats) in enumerate(wishlist_items, 1):
         # Format price display with current price, crossed out original price, and discount
         # Use game's currency instead of user's region
         currency_symbol = get_currency_symbol(game.currency.lower() if game.currency else 'usd')
@@ -215,7 +201,9 @@ async def cmd_list(message: Message):
             price_display = "Price not checked"
 
         threshold_text = f" (desired: {currency_symbol}{wishlist_item.desired_price_cents/100:.2f})" if wishlist_item.desired_price_cents else ""
-        response += f"{i}. {game.title}\n   💰 {price_display}{threshold_text}\n\n"
+        stats_text = format_price_stats(PriceStatsService.as_dict(stats) if stats else None, currency_symbol)
+        stats_line = f"\n   {stats_text}" if stats_text else ""
+        response += f"{i}. {game.title}\n   💰 {price_display}{threshold_text}{stats_line}\n\n"
 
         # Add buttons for each game
         keyboard_buttons.append([
@@ -231,7 +219,32 @@ async def cmd_list(message: Message):
     await message.reply(response, reply_markup=wishlist_keyboard, parse_mode="HTML")
 
 
-async def cmd_remove(message: Message):
+async def cmd_deals(message: Message, db: Session):
+    """Handle /deals command - show the best ranked deals for the user's region"""
+    user_id = message.from_user.id
+
+    user = await asyncio.to_thread(find_user, db, user_id)
+    region = user.region if user and user.region else 'us'
+    currency = currency_for_region(region)
+
+    deals = await asyncio.to_thread(deal_ranker.top, db, currency, 10)
+    if not deals:
+        await message.reply("🔍 No deals ranked yet. Try again after the next price check.")
+        return
+
+    currency_symbol = get_currency_symbol(region)
+    response = "🔥 <b>Top Deals:</b>\n\n"
+    for ranking, game in deals:
+        price_text = f"<b>{currency_symbol}{ranking.price_cents/100:.2f}</b>"
+        if ranking.regular_price_cents and ranking.regular_price_cents != ranking.price_cents:
+            price_text += f" <s>{currency_symbol}{ranking.regular_price_cents/100:.2f}</s>"
+        low_text = " 📉 lowest ever" if ranking.all_time_low_cents and ranking.price_cents <= ranking.all_time_low_cents else ""
+        response += f"{ranking.rank}. {game.title}\n   💰 {price_text} <i>(-{ranking.discount_percent}%)</i>{low_text}\n\n"
+
+    await message.reply(response, parse_mode="HTML")
+
+
+async def cmd_remove(message: Message, db: Session):
     """Handle /remove command - remove game from wishlist"""
     args = message.text.split()[1:] if len(message.text.split()) > 1 else []
     user_id = message.from_user.id
@@ -246,32 +259,21 @@ async def cmd_remove(message: Message):
         await message.reply("❌ Invalid number. Specify a number.")
         return
 
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await message.reply("❌ User not found. Use /start")
         return
 
-    # Get user's wishlist
-    wishlist_items = (
-        db.query(UserWishlist)
-        .filter(UserWishlist.user_id == user.id)
-        .all()
-    )
-
-    if game_number < 0 or game_number >= len(wishlist_items):
+    # Remove the game
+    removed = await asyncio.to_thread(remove_from_wishlist, db, user.id, game_number, False)
+    if removed is None:
         await message.reply("❌ Invalid game number.")
         return
 
-    # Remove the game
-    item_to_remove = wishlist_items[game_number]
-    db.delete(item_to_remove)
-    db.commit()
-
     await message.reply("✅ Game removed from wishlist!")
 
 
-async def cmd_setthreshold(message: Message):
+async def cmd_setthreshold(message: Message, db: Session, state: FSMContext):
     """Handle /setthreshold command - set price threshold for notifications"""
     args = message.text.split()[1:] if len(message.text.split()) > 1 else []
     user_id = message.from_user.id
@@ -288,19 +290,13 @@ async def cmd_setthreshold(message: Message):
         await message.reply("❌ Invalid price. Specify a positive number.")
         return
 
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         await message.reply("❌ User not found. Use /start")
         return
 
     # Get user's wishlist
-    wishlist_items = (
-        db.query(UserWishlist, Game)
-        .join(Game, UserWishlist.game_id == Game.id)
-        .filter(UserWishlist.user_id == user.id)
-        .all()
-    )
+    wishlist_items = await asyncio.to_thread(wishlist_games, db, user.id)
 
     if not wishlist_items:
         await message.reply("📝 Your wishlist is empty.\n\nAdd games first using /add command")
@@ -318,7 +314,8 @@ async def cmd_setthreshold(message: Message):
     response += "Reply with game number or 'cancel'."
 
     # Store user state
-    user_states[user_id] = {'action': 'set_threshold', 'price': price}
+    await state.set_state('set_threshold')
+    await state.update_data(price=price)
     await message.reply(response, parse_mode="HTML")
 
 
@@ -330,6 +327,7 @@ def register_commands(dp):
     dp.message.register(cmd_region, Command("region"))
     dp.message.register(cmd_donate, Command("donate"))
     dp.message.register(cmd_add, Command("add"))
-    dp.message.register(cmd_list, Command("list"))
+    dp.message.register(cmd_list, Command("list"), flags={"read_only": True})
+    dp.message.register(cmd_deals, Command("deals"), flags={"read_only": True})
     dp.message.register(cmd_remove, Command("remove"))
     dp.message.register(cmd_setthreshold, Command("setthreshold"))
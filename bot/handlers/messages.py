@@ -1,36 +1,37 @@
 import logging
 import time
 import asyncio
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy.orm import Session
 
-from models.database import get_db
-from models.models import User, Game, UserWishlist
-from providers.deku_deals_provider import DekuDealsProvider
+from bot.core.user_manager import UserManager
 from .keyboards import get_main_menu_keyboard
-from .commands import search_results, user_states, price_provider
+from .commands import price_provider
 from bot.utils.helpers import get_currency_symbol
+from .queries import find_user, add_to_wishlist, set_threshold
 
 logger = logging.getLogger(__name__)
 
-# Global storage for search timestamps (user_id -> last_search_time)
-last_search_times = {}
 SEARCH_TIMEOUT = 5  # seconds
 
 
-async def handle_text_messages(message: Message):
+async def handle_text_messages(message: Message, db: Session, state: FSMContext):
     """Handle text messages for game selection and other interactions"""
     user_id = message.from_user.id
     text = message.text.strip().lower()
 
-    db = next(get_db())
-    user = db.query(User).filter(User.telegram_id == user_id).first()
+    user = await asyncio.to_thread(find_user, db, user_id)
     if not user:
         return
 
+    current_state = await state.get_state()
+    state_data = await state.get_data()
+
     # Handle game selection from search results
-    if user_id in user_states and user_states[user_id].get('action') == 'select_game':
+    if current_state == 'select_game':
         if text == 'cancel':
-            del user_states[user_id]
+            await state.set_state(None)
             await message.reply("❌ Game addition cancelled.")
             return
 
@@ -43,56 +44,27 @@ async def handle_text_messages(message: Message):
             return
 
         # Get search results
-        if user_id not in search_results:
+        games = state_data.get('search_results')
+        if games is None:
             await message.reply("❌ Search results expired. Try searching again.")
             return
 
-        games = search_results[user_id]
         if choice > len(games):
             await message.reply("❌ Invalid game number.")
             return
 
         selected_game = games[choice - 1]
 
-        # Check if game already in wishlist
-        existing_game = db.query(Game).filter(Game.source_id == selected_game['id']).first()
-        if existing_game:
-            # Check if already in user's wishlist
-            existing_wishlist = db.query(UserWishlist).filter(
-                UserWishlist.user_id == user.id,
-                UserWishlist.game_id == existing_game.id
-            ).first()
-            if existing_wishlist:
-                await message.reply("❌ This game is already in your wishlist!")
-                del user_states[user_id]
-                del search_results[user_id]
-                return
-            game = existing_game
-        else:
-            # Create new game entry
-            game = Game(
-                source_id=selected_game['id'],
-                title=selected_game['title'],
-                platform=selected_game['platform'],
-                last_price_cents=int(selected_game['current_price'] * 100) if selected_game['current_price'] else None,
-                original_price_cents=int(selected_game['original_price'] * 100) if selected_game['original_price'] else None,
-                discount_percent=selected_game['discount_percent'],
-                currency=selected_game.get('currency', 'USD')
-            )
-            db.add(game)
-            db.commit()
-            db.refresh(game)
-
-        # Add to wishlist
-        wishlist_item = UserWishlist(
-            user_id=user.id,
-            game_id=game.id
-        )
-        db.add(wishlist_item)
-        db.commit()
+        # Add to wishlist unless it is already there
+        added = await asyncio.to_thread(add_to_wishlist, db, user.id, selected_game,
+                                        selected_game.get('currency', 'USD'))
+        if not added:
+            await message.reply("❌ This game is already in your wishlist!")
+            await state.clear()
+            return
 
         # Keep search state active for continuous searching
-        # Don't clean up user_states and search_results
+        # Don't clear the FSM state and search results
 
         await message.reply(
             f"✅ <b>{selected_game['title']}</b> added to your wishlist!\n\n"
@@ -102,9 +74,9 @@ async def handle_text_messages(message: Message):
         return
 
     # Handle threshold setting
-    elif user_id in user_states and user_states[user_id].get('action') == 'set_threshold':
+    elif current_state == 'set_threshold':
         if text == 'cancel':
-            del user_states[user_id]
+            await state.set_state(None)
             await message.reply("❌ Threshold setting cancelled.")
             return
 
@@ -116,38 +88,28 @@ async def handle_text_messages(message: Message):
             await message.reply("❌ Specify game number or 'cancel'.")
             return
 
-        # Get wishlist items
-        wishlist_items = (
-            db.query(UserWishlist, Game)
-            .join(Game, UserWishlist.game_id == Game.id)
-            .filter(UserWishlist.user_id == user.id)
-            .all()
-        )
+        threshold_price = state_data['price']
 
-        if choice > len(wishlist_items):
+        # Update threshold
+        updated = await asyncio.to_thread(set_threshold, db, user.id, choice - 1, threshold_price)
+        if updated is None:
             await message.reply("❌ Invalid game number.")
             return
+        title, currency = updated
 
-        wishlist_item, game = wishlist_items[choice - 1]
-        threshold_price = user_states[user_id]['price']
-
-        # Update threshold
-        wishlist_item.desired_price_cents = int(threshold_price * 100)
-        db.commit()
-
-        del user_states[user_id]
+        await state.set_state(None)
 
         # Use game's currency for confirmation
-        currency_symbol = get_currency_symbol(game.currency.lower() if game.currency else 'usd')
+        currency_symbol = get_currency_symbol(currency.lower() if currency else 'usd')
         await message.reply(
-            f"✅ Price threshold for <b>{game.title}</b> set: {currency_symbol}{threshold_price:.2f}\n\n"
+            f"✅ Price threshold for <b>{title}</b> set: {currency_symbol}{threshold_price:.2f}\n\n"
             "You'll receive notification when price drops below this value!",
             parse_mode="HTML"
         )
         return
 
     # Handle inline threshold setting (from menu)
-    elif user_id in user_states and user_states[user_id].get('action') == 'set_threshold_inline':
+    elif current_state == 'set_threshold_inline':
         try:
             price = float(text)
             if price <= 0:
@@ -156,46 +118,33 @@ async def handle_text_messages(message: Message):
             await message.reply("❌ Invalid price. Please enter a positive number.")
             return
 
-        game_index = user_states[user_id]['game_index']
-
-        # Get wishlist items
-        wishlist_items = (
-            db.query(UserWishlist, Game)
-            .join(Game, UserWishlist.game_id == Game.id)
-            .filter(UserWishlist.user_id == user.id)
-            .all()
-        )
+        game_index = state_data['game_index']
 
-        if game_index >= len(wishlist_items):
+        # Update threshold
+        updated = await asyncio.to_thread(set_threshold, db, user.id, game_index, price)
+        if updated is None:
             await message.reply("❌ Game not found.")
             return
+        title, currency = updated
 
-        wishlist_item, game = wishlist_items[game_index]
-
-        # Update threshold
-        wishlist_item.desired_price_cents = int(price * 100)
-        db.commit()
-
-        del user_states[user_id]
+        await state.set_state(None)
 
         # Use game's currency for confirmation
-        currency_symbol = get_currency_symbol(game.currency.lower() if game.currency else 'usd')
+        currency_symbol = get_currency_symbol(currency.lower() if currency else 'usd')
         await message.reply(
-            f"✅ Price threshold for <b>{game.title}</b> set: {currency_symbol}{price:.2f}\n\n"
+            f"✅ Price threshold for <b>{title}</b> set: {currency_symbol}{price:.2f}\n\n"
             "You'll receive notification when price drops below this value!",
             reply_markup=get_main_menu_keyboard()
         )
         return
 
     # Handle game search from menu
-    elif user_id in user_states and user_states[user_id].get('action') == 'search_game':
+    elif current_state == 'search_game':
         query = text.strip()
 
         # Handle stop command
         if query in ['stop', 'cancel', 'exit']:
-            del user_states[user_id]
-            if user_id in search_results:
-                del search_results[user_id]
+            await state.clear()
             await message.reply("❌ Search mode stopped. Use menu to continue.", reply_markup=get_main_menu_keyboard())
             return
 
@@ -205,8 +154,10 @@ async def handle_text_messages(message: Message):
 
         # Check search timeout
         current_time = time.time()
-        if user_id in last_search_times:
-            time_diff = current_time - last_search_times[user_id]
+        # Kept in the FSM data so the throttle holds across webhook workers
+        last_search_at = state_data.get('last_search_at')
+        if last_search_at:
+            time_diff = current_time - last_search_at
             if time_diff < SEARCH_TIMEOUT:
                 remaining_time = SEARCH_TIMEOUT - time_diff
                 await message.answer(f"⏳ Waiting {remaining_time:.1f} seconds before next searching...")
@@ -214,8 +165,7 @@ async def handle_text_messages(message: Message):
                 await asyncio.sleep(remaining_time)
 
         # Check wishlist limit
-        from bot.core.user_manager import UserManager
-        limits = UserManager.check_user_limits(user.id)
+        limits = await asyncio.to_thread(UserManager.check_user_limits, user.id, db)
         if not limits["can_add_more"]:
             await message.reply(
                 f"❌ Wishlist limit reached ({limits['current_games']} / {limits['max_games']}).\n"
@@ -225,12 +175,12 @@ async def handle_text_messages(message: Message):
             return
 
         # Update last search time
-        last_search_times[user_id] = current_time
+        await state.update_data(last_search_at=current_time)
 
         # Search for games
         await message.answer("🔍 Searching for games...")
         logger.info(f"User {user_id} searching for games with query: '{query}' in region: {user.region}")
-        games = price_provider.search_games(query, user.region)
+        games = await price_provider.search_games(query, user.region)
         logger.info(f"Search returned {len(games)} games for query '{query}'")
 
         if not games:
@@ -268,9 +218,9 @@ async def handle_text_messages(message: Message):
         search_keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
 
         # Store search results and keep search state active
-        search_results[user_id] = games[:5]
+        await state.update_data(search_results=games[:5])
         # Keep the search_game state active for continuous searching
-        user_states[user_id] = {'action': 'search_game'}
+        await state.set_state('search_game')
 
         await message.answer(response, reply_markup=search_keyboard, parse_mode="HTML")
         return
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject
+
+from models.database import SessionLocal, ReadSessionLocal, session_stats, DB_SESSION_LEAK_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """Opens one database session per update, passes it to the handler as `db` and always closes it.
+
+    Handlers registered with flags={"read_only": True} get a session from the
+    read-only pool. Anything the handler did not commit is rolled back on close.
+    The session is blocking: handlers run its queries through asyncio.to_thread
+    (see bot/handlers/queries.py), and the close happens in a worker thread too.
+    """
+
+    def __init__(self, session_factory=SessionLocal, read_session_factory=ReadSessionLocal):
+        self.session_factory = session_factory
+        self.read_session_factory = read_session_factory
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        factory = self.read_session_factory if get_flag(data, "read_only") else self.session_factory
+        db = factory()
+        data["db"] = db
+        try:
+            return await handler(event, data)
+        finally:
+            await asyncio.to_thread(db.close)
+            stats = session_stats()
+            if stats['open_sessions'] > DB_SESSION_LEAK_THRESHOLD:
+                logger.warning(f"{stats['open_sessions']} database sessions open, oldest "
+                               f"{stats['oldest_open_session_seconds']}s - possible session leak")
+
+
+def setup_db_middleware(dp):
+    """Give every message, callback and payment handler its own session"""
+    for observer in (dp.message, dp.callback_query, dp.pre_checkout_query):
+        observer.middleware(DbSessionMiddleware())
@@ -0,0 +1,111 @@
+"""Blocking session work shared by the handlers.
+
+Handlers call these through asyncio.to_thread, so a slow database round trip
+(Postgres over the network, a locked SQLite file) never stalls the event loop
+that serves every other update. The session is only ever used by one thread at
+a time. Anything a handler reads after a commit is returned as plain values,
+since committed ORM objects would reload lazily on the loop.
+"""
+
+from typing import Dict, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from bot.core.price_writer import to_cents
+from models.models import User, Game, UserWishlist, PriceStats
+
+
+def find_user(db, telegram_id: int) -> Optional[User]:
+    return db.query(User).filter(User.telegram_id == telegram_id).first()
+
+
+def wishlist_games(db, user_id: int, with_stats: bool = False) -> list:
+    """(UserWishlist, Game) rows of a user's wishlist, plus PriceStats (or None) when with_stats is set"""
+    columns = (UserWishlist, Game, PriceStats) if with_stats else (UserWishlist, Game)
+    query = db.query(*columns).join(Game, UserWishlist.game_id == Game.id)
+    if with_stats:
+        query = query.outerjoin(PriceStats, PriceStats.game_id == Game.id)
+    return query.filter(UserWishlist.user_id == user_id).all()
+
+
+def _find_game(db, source_id: str, currency: str) -> Optional[Game]:
+    return db.query(Game).filter(Game.source_id == source_id, Game.currency == currency).first()
+
+
+def _is_wishlisted(db, user_id: int, game_id: int) -> bool:
+    return db.query(UserWishlist.id).filter(
+        UserWishlist.user_id == user_id,
+        UserWishlist.game_id == game_id
+    ).first() is not None
+
+
+def _add_to_wishlist(db, user_id: int, selected_game: Dict, currency: str) -> bool:
+    game = _find_game(db, selected_game['id'], currency)
+    if game:
+        if _is_wishlisted(db, user_id, game.id):
+            return False
+    else:
+        # Create new game entry
+        game = Game(
+            source_id=selected_game['id'],
+            title=selected_game['title'],
+            platform=selected_game['platform'],
+            last_price_cents=to_cents(selected_game['current_price']),
+            original_price_cents=to_cents(selected_game['original_price']),
+            discount_percent=selected_game['discount_percent'],
+            currency=currency
+        )
+        db.add(game)
+        db.flush()
+
+    db.add(UserWishlist(user_id=user_id, game_id=game.id))
+    db.commit()
+    return True
+
+
+def add_to_wishlist(db, user_id: int, selected_game: Dict, currency: str) -> bool:
+    """Add a search result to the wishlist, creating the game if needed; False if it is already there"""
+    # Updates are handled concurrently: a double-tapped button or two users adding the same new game
+    # can pass the checks together, and the loser hits a unique index. Retry once against the winner's row.
+    for _ in range(2):
+        try:
+            return _add_to_wishlist(db, user_id, selected_game, currency)
+        except IntegrityError:
+            db.rollback()
+    return False
+
+
+def set_threshold(db, user_id: int, game_index: int, price: float) -> Optional[tuple]:
+    """Set the desired price of the n-th wishlist game; returns its (title, currency) or None if out of range"""
+    wishlist_items = wishlist_games(db, user_id)
+    if game_index < 0 or game_index >= len(wishlist_items):
+        return None
+    wishlist_item, game = wishlist_items[game_index]
+    title, currency = game.title, game.currency
+    wishlist_item.desired_price_cents = to_cents(price)
+    db.commit()
+    return title, currency
+
+
+def remove_from_wishlist(db, user_id: int, game_index: int, with_game: bool = True) -> Optional[tuple]:
+    """Remove the n-th wishlist game; returns its (id, title) or None if out of range"""
+    if with_game:
+        wishlist_items = wishlist_games(db, user_id)
+    else:
+        wishlist_items = [(item, None) for item in db.query(UserWishlist).filter(UserWishlist.user_id == user_id).all()]
+    if game_index < 0 or game_index >= len(wishlist_items):
+        return None
+    wishlist_item, game = wishlist_items[game_index]
+    removed = (game.id, game.title) if game else (wishlist_item.game_id, None)
+    db.delete(wishlist_item)
+    db.commit()
+    return removed
+
+
+def set_region(db, telegram_id: int, region: str) -> bool:
+    user = find_user(db, telegram_id)
+    if not user:
+        return False
+    user.region = region
+    db.commit()
+    return True
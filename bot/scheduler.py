@@ -1,47 +1,177 @@
+import asyncio
 import logging
-from datetime import datetime
+import os
+from datetime import datetime, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from sqlalchemy import insert, update
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 
-from models.database import get_db, SessionLocal
-from models.models import User, Game, UserWishlist, PriceHistory, Notification
-from providers.deku_deals_provider import DekuDealsProvider
+from models.database import SessionLocal
+from models.models import Game, UserWishlist, Notification, PriceEvent
+from providers.base_provider import CURRENCY_BY_REGION
+from providers.deku_deals_provider import AsyncDekuDealsProvider
+from providers.http_cache import HttpValidatorCache, HTTP_CACHE_MAX_AGE_DAYS
+from bot.core.price_sweeper import PriceSweeper, SweepReport, SWEEP_CONCURRENCY, SWEEP_RATE_PER_HOST
+from bot.core.check_planner import CheckPlanner, PRICE_CHECK_MODE, PRICE_CHECK_TICK_SECONDS
+from bot.core.sweep_slicer import SweepSlicer, SWEEP_JITTER_SECONDS
+from bot.core.price_writer import PriceWriter, GameRef, GAME_REF_COLUMNS, load_game_refs, to_cents
+from bot.core.alert_matcher import AlertMatcher
+from bot.core.price_archive import price_archive, PRICE_ARCHIVE_AFTER_DAYS
+from bot.core.deal_ranker import deal_ranker
+from bot.core.notification_dispatcher import notification_dispatcher, enqueue_notifications, NOTIFY_POLL_SECONDS
+from bot.utils.rate_limiter import HostRateLimiter
 from bot.utils.helpers import get_currency_symbol
 
 logger = logging.getLogger(__name__)
 
+# inline: the bot process sweeps and notifies | fetcher: fetcher.py sweeps, the bot only sends alerts
+PRICE_PIPELINE = os.getenv('PRICE_PIPELINE', 'inline')
+PRICE_EVENT_POLL_SECONDS = int(os.getenv('PRICE_EVENT_POLL_SECONDS', 10))  # how often the bot picks up new events
+PRICE_EVENT_BATCH_SIZE = int(os.getenv('PRICE_EVENT_BATCH_SIZE', 500))
+PRICE_EVENT_RETENTION_DAYS = int(os.getenv('PRICE_EVENT_RETENTION_DAYS', 7))  # processed events kept this long
+
 class PriceChecker:
     """Service for checking game prices and sending notifications"""
 
+    # Reverse lookup of region from game's currency
+    REGION_BY_CURRENCY = {currency: region for region, currency in CURRENCY_BY_REGION.items()}
+
     def __init__(self):
-        self.price_provider = DekuDealsProvider()
+        self.price_provider = AsyncDekuDealsProvider(
+            pool_size=SWEEP_CONCURRENCY,
+            rate_limiter=HostRateLimiter(SWEEP_RATE_PER_HOST),
+            http_cache=HttpValidatorCache()
+        )
+        self.sweeper = PriceSweeper(self.price_provider)
+        self.planner = CheckPlanner()
+        self.slicer = SweepSlicer()
+        self.alert_matcher = AlertMatcher()
+        self.mode = PRICE_CHECK_MODE
         self.scheduler = AsyncIOScheduler()
+        self.role = None  # all | fetcher | notifier, set by start()
         self.bot = None  # Will be set later to avoid circular imports
 
     def set_bot(self, bot):
         """Set the bot instance for sending notifications"""
         self.bot = bot
 
-    def start(self):
-        """Start the price checking scheduler"""
-        # Check prices twice a day at 9:00 and 21:00 UTC
-        self.scheduler.add_job(
-            self.check_all_prices,
-            trigger=CronTrigger(hour=[9, 21]),
-            id='price_checker',
-            name='Check game prices twice daily',
-            replace_existing=True
-        )
+    def start(self, role: str = None):
+        """Start the price checking scheduler.
+
+        role "all" sweeps and notifies, "fetcher" only sweeps and writes price events,
+        "notifier" only sends alerts for those events. Defaults from PRICE_PIPELINE.
+        """
+        self.role = role or ('all' if PRICE_PIPELINE == 'inline' else 'notifier')
+        if self.role != 'fetcher':
+            # Alerts are delivered from the outbox on their own schedule, so Telegram rate limits never stall a sweep
+            self.scheduler.add_job(
+                self.dispatch_notifications,
+                trigger=IntervalTrigger(seconds=NOTIFY_POLL_SECONDS),
+                id='notification_dispatcher',
+                name='Deliver queued notifications',
+                next_run_time=datetime.now(),
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+
+        if self.role == 'notifier':
+            self.scheduler.add_job(
+                self.consume_price_events,
+                trigger=IntervalTrigger(seconds=PRICE_EVENT_POLL_SECONDS),
+                id='price_events',
+                name='Queue alerts for new price events',
+                next_run_time=datetime.now(),
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+            self.scheduler.start()
+            logger.info("Price checker scheduler started (notifier, sweeps run in the fetcher process)")
+            return
+
+        if self.mode == 'fixed':
+            # Check prices twice a day at 9:00 and 21:00 UTC
+            self.scheduler.add_job(
+                self.check_all_prices,
+                trigger=CronTrigger(hour=[9, 21]),
+                id='price_checker',
+                name='Check game prices twice daily',
+                replace_existing=True
+            )
+        elif self.mode == 'sliced':
+            # Check one shard of all games per slice, finishing every game within the sweep window
+            self.scheduler.add_job(
+                self.check_price_slice,
+                trigger=IntervalTrigger(seconds=self.slicer.slice_seconds, jitter=SWEEP_JITTER_SECONDS),
+                id='price_checker',
+                name='Check one slice of game prices',
+                next_run_time=datetime.now(),
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+        else:
+            # Check whichever games are due, continuously through the day
+            self.scheduler.add_job(
+                self.check_due_prices,
+                trigger=IntervalTrigger(seconds=PRICE_CHECK_TICK_SECONDS),
+                id='price_checker',
+                name='Check due game prices',
+                next_run_time=datetime.now(),
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
+
+        if PRICE_ARCHIVE_AFTER_DAYS > 0:
+            # Move old price history out of the hot database once a day
+            self.scheduler.add_job(
+                self.archive_price_history,
+                trigger=CronTrigger(hour=4, minute=30),
+                id='price_archive',
+                name='Archive old price history',
+                replace_existing=True
+            )
+
+        if HTTP_CACHE_MAX_AGE_DAYS > 0:
+            # Forget pages no sweep has fetched for a while, so the cache doesn't grow with every URL ever seen
+            self.scheduler.add_job(
+                self.purge_http_cache,
+                trigger=CronTrigger(hour=4, minute=45),
+                id='http_cache_purge',
+                name='Purge stale HTTP cache entries',
+                replace_existing=True
+            )
 
         self.scheduler.start()
-        logger.info("Price checker scheduler started")
+        logger.info(f"Price checker scheduler started ({self.mode} mode, {self.role})")
+
+    def pause(self):
+        """Stop picking up jobs on this worker, e.g. after another worker became the leader"""
+        if self.scheduler.running:
+            self.scheduler.pause()
+            logger.info("Price checker scheduler paused")
+
+    def resume(self, role: str = None):
+        """Run the jobs on this worker again, starting the scheduler on first use"""
+        if self.scheduler.running:
+            self.scheduler.resume()
+            logger.info("Price checker scheduler resumed")
+        else:
+            self.start(role)
 
     def stop(self):
         """Stop the scheduler"""
         if self.scheduler.running:
             self.scheduler.shutdown()
             logger.info("Price checker scheduler stopped")
+        self.sweeper.shutdown()
+
+    def _region_for_game(self, game: Game) -> str:
+        """Determine region from game's currency"""
+        return self.REGION_BY_CURRENCY.get(game.currency, 'us')
 
     async def check_all_prices(self):
         """Check prices for all games in all users' wishlists"""
@@ -51,140 +181,298 @@ class PriceChecker:
 
         try:
             # Get all unique games that are in users' wishlists
-            games_to_check = (
-                db.query(Game)
+            games_to_check = await asyncio.to_thread(load_game_refs, (
+                db.query(*GAME_REF_COLUMNS)
                 .join(UserWishlist, UserWishlist.game_id == Game.id)
                 .distinct()
-                .all()
-            )
+            ))
 
             logger.info(f"Found {len(games_to_check)} games to check")
 
-            for game in games_to_check:
-                await self.check_game_price(db, game)
-
-            db.commit()
+            summary = await self._check_games(db, games_to_check)
+            await asyncio.to_thread(db.commit)
+            await self.refresh_deal_rankings()
+            return summary
 
         except Exception as e:
             logger.error(f"Error during price check: {e}")
-            db.rollback()
+            await asyncio.to_thread(db.rollback)
         finally:
-            db.close()
+            await asyncio.to_thread(db.close)
+
+    async def check_due_prices(self):
+        """Check the games whose adaptive next-check time has come"""
+        db = SessionLocal()
 
-    async def check_game_price(self, db, game: Game):
-        """Check price for a specific game and send notifications if needed"""
         try:
-            # Determine region from game's currency (reverse lookup)
-            region_map = {'USD': 'us', 'EUR': 'eu', 'JPY': 'jp'}
-            region = region_map.get(game.currency, 'us')
+            now = datetime.utcnow()
+            if self.planner.needs_replan(now):
+                await asyncio.to_thread(self.planner.plan, db, now)
 
-            # Get full game info from provider
-            game_info = self.price_provider.get_game_info(game.source_id, region)
+            games_to_check = await asyncio.to_thread(self.planner.due_games, db, now, self.planner.tick_limit())
+            if not games_to_check:
+                return None
 
-            if game_info is None:
-                logger.warning(f"Could not get info for game {game.title} (ID: {game.source_id})")
-                return
-
-            current_price_cents = int(game_info['current_price'] * 100) if game_info['current_price'] else None
-            original_price_cents = int(game_info['original_price'] * 100) if game_info['original_price'] else None
-
-            # Update game info
-            game.last_price_cents = current_price_cents
-            game.original_price_cents = original_price_cents
-            game.discount_percent = game_info['discount_percent']
-            game.currency = game_info['currency']
-            game.last_checked = datetime.utcnow()
-
-            # Add to price history
-            if current_price_cents:
-                price_history = PriceHistory(
-                    game_id=game.id,
-                    price_cents=current_price_cents,
-                    currency=game_info['currency']
-                )
-                db.add(price_history)
+            logger.info(f"{len(games_to_check)} games due for a price check")
 
-            # Check if price changed and send notifications
-            if current_price_cents:
-                await self.check_price_alerts(db, game, current_price_cents)
+            summary = await self._check_games(db, games_to_check)
 
-        except Exception as e:
-            logger.error(f"Error checking price for game {game.title}: {e}")
-
-    async def check_price_alerts(self, db, game: Game, current_price_cents: int):
-        """Check if any users should be notified about price changes"""
-        # Get all wishlist items for this game
-        wishlist_items = (
-            db.query(UserWishlist)
-            .filter(UserWishlist.game_id == game.id)
-            .all()
-        )
+            def finish():
+                self.planner.mark_checked(db, [game.id for game in games_to_check], datetime.utcnow())
+                db.commit()
 
-        for wishlist_item in wishlist_items:
-            user = db.query(User).filter(User.id == wishlist_item.user_id).first()
-            if not user:
-                continue
+            await asyncio.to_thread(finish)
+            await self.refresh_deal_rankings()
+            return summary
 
-            should_notify = False
-            notification_reason = ""
+        except Exception as e:
+            logger.error(f"Error during due price check: {e}")
+            await asyncio.to_thread(db.rollback)
+        finally:
+            await asyncio.to_thread(db.close)
 
-            # Check desired price threshold
-            if (wishlist_item.desired_price_cents and
-                current_price_cents <= wishlist_item.desired_price_cents and
-                (wishlist_item.last_notified_price_cents is None or
-                 current_price_cents < wishlist_item.last_notified_price_cents)):
+    async def check_price_slice(self):
+        """Check the next shard of the time-sliced sweep"""
+        db = SessionLocal()
 
-                should_notify = True
-                currency_symbol = get_currency_symbol(game.currency.lower() if game.currency else 'usd')
-                notification_reason = f"Price dropped to {currency_symbol}{current_price_cents/100:.2f} (desired: {currency_symbol}{wishlist_item.desired_price_cents/100:.2f})"
+        def start():
+            shard = self.slicer.next_shard(db, datetime.utcnow())
+            if shard is None:
+                db.commit()
+                return None, []
+            return shard, self.slicer.shard_games(db, shard)
 
-            # Check minimum discount (if implemented)
-            # This could be added later based on game history
+        def finish(shard):
+            self.slicer.complete_shard(db, shard, datetime.utcnow())
+            db.commit()
 
-            if should_notify:
-                await self.send_notification(user, game, current_price_cents, notification_reason)
+        try:
+            shard, games_to_check = await asyncio.to_thread(start)
+            if shard is None:
+                return None
+            logger.info(f"Sweep shard {shard + 1}/{self.slicer.shard_count}: {len(games_to_check)} games")
 
-                # Update last notified price
-                wishlist_item.last_notified_price_cents = current_price_cents
+            summary = await self._check_games(db, games_to_check) if games_to_check else None
+            await asyncio.to_thread(finish, shard)
+            if summary:
+                await self.refresh_deal_rankings()
+            return summary
 
-                # Log notification
-                notification = Notification(
-                    user_id=user.id,
-                    game_id=game.id,
-                    price_cents=current_price_cents,
-                    rule=notification_reason
-                )
-                db.add(notification)
+        except Exception as e:
+            logger.error(f"Error during sliced price check: {e}")
+            await asyncio.to_thread(db.rollback)
+        finally:
+            await asyncio.to_thread(db.close)
+
+    async def refresh_deal_rankings(self, force: bool = False):
+        """Re-rank the catalog after a sweep (at most every DEAL_RANKING_MIN_INTERVAL seconds)"""
+        if not force and not deal_ranker.refresh_due():
+            return None
+
+        def run():
+            db = SessionLocal()
+            try:
+                return deal_ranker.refresh(db)
+            except Exception as e:
+                logger.error(f"Error ranking deals: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+        return await asyncio.to_thread(run)
+
+    async def archive_price_history(self):
+        """Roll old price_history rows into the archive files without blocking the event loop"""
+        def run():
+            db = SessionLocal()
+            try:
+                return price_archive.archive_old_rows(db, PRICE_ARCHIVE_AFTER_DAYS)
+            except Exception as e:
+                logger.error(f"Error archiving price history: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+        return await asyncio.to_thread(run)
+
+    async def purge_http_cache(self):
+        """Drop cached pages older than HTTP_CACHE_MAX_AGE_DAYS without blocking the event loop"""
+        try:
+            removed = await asyncio.to_thread(self.price_provider.http_cache.purge, HTTP_CACHE_MAX_AGE_DAYS * 86400)
+            logger.info(f"Purged {removed} stale HTTP cache entries")
+            return removed
+        except Exception as e:
+            logger.error(f"Error purging the HTTP cache: {e}")
+
+    async def _check_games(self, db, games):
+        """Fetch and store prices for the given games (GameRef rows), returning the sweep summary"""
+        # End the transaction that loaded the games, so the session holds no pooled connection while
+        # pages are fetched (a SQLite write engine has only one)
+        await asyncio.to_thread(db.commit)
+        report = SweepReport(len(games))
+        writer = PriceWriter(db)
+        priced_game_ids = []
+        game_infos = {}
+        targets = [(game, game.source_id, self._region_for_game(game)) for game in games]
+        async for game, game_info in self.sweeper.sweep(targets):
+            report.record(game_info is not None)
+            if game_info is None:
+                logger.warning(f"Could not get info for game {game.title} (ID: {game.source_id})")
+                continue
 
-    async def send_notification(self, user: User, game: Game, price_cents: int, reason: str):
-        """Send notification to user about price change"""
-        if not self.bot:
-            logger.error("Bot not set for price checker")
+            # Results are written in bulk chunks in a worker thread; the sweep waits for each
+            # chunk, so the session is never used by two threads at once
+            writer.queue(game.id, game_info)
+            if writer.full:
+                await asyncio.to_thread(writer.flush)
+            if game_info['current_price']:
+                priced_game_ids.append(game.id)
+                game_infos[game.id] = game_info
+        await asyncio.to_thread(writer.flush)
+
+        if self.role == 'fetcher':
+            # The bot process matches and queues the alerts; it sees the events once the caller commits
+            await asyncio.to_thread(self.publish_price_events, db, game_infos)
+            alerts_sent = 0
+        else:
+            # Match alerts for the whole sweep at once against the prices just written
+            try:
+                alerts_sent = await asyncio.to_thread(self.match_and_queue_alerts, db, priced_game_ids)
+            except Exception as e:
+                logger.error(f"Error checking price alerts: {e}")
+                await asyncio.to_thread(db.rollback)
+                alerts_sent = 0
+
+        summary = report.finish()
+        summary['chunks_written'] = writer.chunks
+        summary['alerts'] = alerts_sent
+        logger.info(
+            f"Price check finished: {summary['total']} games in {summary['duration_seconds']:.1f}s "
+            f"({summary['games_per_second']:.2f} games/s), {summary['failed']} failed, "
+            f"{writer.chunks} write chunks, {alerts_sent} alerts"
+        )
+        return summary
+
+    def publish_price_events(self, db, game_infos: dict):
+        """Record one event per priced game for the notifier; matching is done there against the stored price"""
+        if not game_infos:
             return
+        now = datetime.utcnow()
+        db.execute(insert(PriceEvent), [{
+            'game_id': game_id,
+            'price_cents': to_cents(info['current_price']),
+            'currency': info['currency'],
+            'created_at': now
+        } for game_id, info in game_infos.items()])
+
+    async def consume_price_events(self) -> int:
+        """Queue the alerts for price events written by the fetcher process, oldest first"""
+        return await asyncio.to_thread(self._consume_price_events)
+
+    def _consume_price_events(self) -> int:
+        db = SessionLocal()
+        alerts_sent = 0
 
         try:
-            # Use game's currency for price display
-            from bot.utils.helpers import get_currency_symbol
-            currency_symbol = get_currency_symbol(game.currency.lower() if game.currency else 'usd')
-
-            message_text = (
-                f"🎉 <b>Game discount!</b>\n\n"
-                f"🎮 <b>{game.title}</b>\n"
-                f"💰 New price: {currency_symbol}{price_cents/100:.2f}\n"
-                f"📊 {reason}\n\n"
-                f"🔗 Check on DekuDeals: https://www.dekudeals.com/items/{game.source_id}"
-            )
+            while True:
+                events = (
+                    db.query(PriceEvent.id, PriceEvent.game_id)
+                    .filter(PriceEvent.processed_at.is_(None))
+                    .order_by(PriceEvent.id)
+                    .limit(PRICE_EVENT_BATCH_SIZE)
+                    .all()
+                )
+                if not events:
+                    break
+
+                # Alerts, wishlist updates and the processed mark are committed together
+                alerts_sent += self.match_and_queue_alerts(db, [e.game_id for e in events])
+                now = datetime.utcnow()
+                db.execute(
+                    update(PriceEvent)
+                    .where(PriceEvent.id.in_([e.id for e in events]))
+                    .values(processed_at=now)
+                )
+                db.commit()
+                if len(events) < PRICE_EVENT_BATCH_SIZE:
+                    break
 
-            await self.bot.send_message(
-                chat_id=user.telegram_id,
-                text=message_text,
-                parse_mode='HTML'
-            )
+            cutoff = datetime.utcnow() - timedelta(days=PRICE_EVENT_RETENTION_DAYS)
+            db.query(PriceEvent).filter(PriceEvent.processed_at < cutoff).delete(synchronize_session=False)
+            db.commit()
+            if alerts_sent:
+                logger.info(f"Queued {alerts_sent} alerts for new price events")
+            return alerts_sent
 
-            logger.info(f"Notification sent to user {user.telegram_id} for game {game.title}")
+        except Exception as e:
+            logger.error(f"Error processing price events: {e}")
+            db.rollback()
+            return alerts_sent
+        finally:
+            db.close()
 
+    def match_and_queue_alerts(self, db, game_ids) -> int:
+        """Match the wishlists of the given games against their stored prices and queue the alerts"""
+        return self.queue_alerts(db, self.alert_matcher.match(db, game_ids))
+
+    def queue_alerts(self, db, matches) -> int:
+        """Queue matched alerts in the notification outbox and record them with bulk writes; the caller commits.
+
+        Nothing is sent here: the dispatcher delivers the outbox once this transaction is committed.
+        """
+        if not matches:
+            return 0
+
+        wishlist_updates = []
+        notifications = []
+        outbox = []
+        for match in matches:
+            currency_symbol = get_currency_symbol(match.currency.lower() if match.currency else 'usd')
+            notification_reason = f"Price dropped to {currency_symbol}{match.price_cents/100:.2f} (desired: {currency_symbol}{match.desired_price_cents/100:.2f})"
+            if match.all_time_low_cents is not None and match.price_cents <= match.all_time_low_cents:
+                notification_reason += " - lowest price ever!"
+
+            game = GameRef(match.game_id, match.source_id, match.title, match.currency)
+            outbox.append({
+                'user_id': match.user_id,
+                'game_id': match.game_id,
+                'telegram_id': match.telegram_id,
+                'text': self.format_notification(game, match.price_cents, notification_reason),
+                'dedupe_key': f"price:{match.wishlist_id}:{match.price_cents}"
+            })
+
+            wishlist_updates.append({'id': match.wishlist_id, 'last_notified_price_cents': match.price_cents})
+            notifications.append({
+                'user_id': match.user_id,
+                'game_id': match.game_id,
+                'price_cents': match.price_cents,
+                'rule': notification_reason
+            })
+
+        db.execute(update(UserWishlist), wishlist_updates)
+        db.execute(insert(Notification), notifications)
+        enqueue_notifications(db, outbox)
+        return len(matches)
+
+    def format_notification(self, game, price_cents: int, reason: str) -> str:
+        """Alert message text for a game (anything with title, currency and source_id)"""
+        # Use game's currency for price display
+        currency_symbol = get_currency_symbol(game.currency.lower() if game.currency else 'usd')
+        return (
+            f"🎉 <b>Game discount!</b>\n\n"
+            f"🎮 <b>{game.title}</b>\n"
+            f"💰 New price: {currency_symbol}{price_cents/100:.2f}\n"
+            f"📊 {reason}\n\n"
+            f"🔗 Check on DekuDeals: https://www.dekudeals.com/items/{game.source_id}"
+        )
+
+    async def dispatch_notifications(self) -> int:
+        """Deliver the notification outbox"""
+        try:
+            return await notification_dispatcher.drain(self.bot)
         except Exception as e:
-            logger.error(f"Error sending notification to user {user.telegram_id}: {e}")
+            logger.error(f"Error dispatching notifications: {e}")
+            return 0
 
 # Global instance
 price_checker = PriceChecker()
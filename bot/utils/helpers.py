@@ -93,3 +93,17 @@ def get_currency_symbol(region: str) -> str:
         'jp': '¥'
     }
     return currency_symbols.get(region.lower(), '$')
+
+
+def format_price_stats(stats: Optional[dict], currency_symbol: str) -> str:
+    """One-line price history summary from PriceStatsService.as_dict() output"""
+    if not stats or stats['all_time_low_cents'] is None:
+        return ""
+
+    text = f"📉 Lowest ever: {currency_symbol}{stats['all_time_low_cents']/100:.2f}"
+    if stats['low_90d_cents'] is not None and stats['low_90d_cents'] != stats['all_time_low_cents']:
+        text += f", 90 days: {currency_symbol}{stats['low_90d_cents']/100:.2f}"
+    if stats['sale_count']:
+        sales = "sale" if stats['sale_count'] == 1 else "sales"
+        text += f" · {stats['sale_count']} {sales}, typically -{stats['avg_sale_depth_percent']:.0f}%"
+    return text
@@ -0,0 +1,48 @@
+"""Async rate limiting utilities"""
+
+import asyncio
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+
+class RateLimiter:
+    """Spaces out calls so that at most `rate` calls per second are started"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_allowed = 0.0
+
+    @property
+    def idle(self) -> bool:
+        """True when the next call would not wait, i.e. the limiter is as good as a new one"""
+        return self._next_allowed <= time.monotonic()
+
+    async def acquire(self):
+        """Wait until the next call slot is available"""
+        if not self.interval:
+            return
+
+        # Reserve a slot before sleeping so concurrent callers queue up behind each other
+        now = time.monotonic()
+        slot = max(now, self._next_allowed)
+        self._next_allowed = slot + self.interval
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class HostRateLimiter:
+    """Keeps a separate RateLimiter for every host"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._limiters: Dict[str, RateLimiter] = {}
+
+    async def acquire(self, url: str):
+        """Wait for a call slot for the host of the given URL (or bare host name)"""
+        host = urlparse(url).netloc or url
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = self._limiters[host] = RateLimiter(self.rate)
+        await limiter.acquire()
@@ -0,0 +1,39 @@
+"""
+Shared test fixtures: a session on a fresh in-memory database with every table created
+"""
+
+import inspect
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.models import Base
+
+
+def make_session():
+    # One shared connection, so code that queries from worker threads sees the same database
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+@pytest.fixture
+def db():
+    session = make_session()
+    yield session
+    engine = session.get_bind()
+    session.close()
+    engine.dispose()
+
+
+def run(test):
+    """Call a test from a file's __main__ runner, passing a fresh session to tests that take `db`"""
+    if "db" not in inspect.signature(test).parameters:
+        return test()
+    session = make_session()
+    try:
+        return test(session)
+    finally:
+        session.close()
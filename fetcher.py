@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Nintendo Deals Bot - standalone price fetcher
+
+Runs the price sweeps in their own process, away from the bot's event loop.
+Prices, history and one price event per checked game go to the database; the
+bot (started with PRICE_PIPELINE=fetcher) only turns those events into alerts.
+Several fetchers can be deployed for failover: one holds the "fetcher" lease
+and sweeps, the others wait to take over.
+"""
+
+import asyncio
+import logging
+import signal
+
+from bot.core.leader_election import LeaderElection
+from bot.scheduler import price_checker
+from models.database import engine, SessionLocal
+from models.migrations import migrate, pending_backfills, run_backfills
+
+logger = logging.getLogger(__name__)
+
+
+async def on_elected():
+    """Bring the schema up to date and start sweeping"""
+    await asyncio.to_thread(migrate, engine)
+    if await asyncio.to_thread(pending_backfills, engine):
+        asyncio.get_running_loop().run_in_executor(None, run_backfills, SessionLocal)
+    price_checker.resume(role='fetcher')
+
+
+async def on_deposed():
+    price_checker.pause()
+
+
+async def run_fetcher():
+    """Campaign for the fetcher lease until SIGINT/SIGTERM"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    election = LeaderElection('fetcher')
+    campaign = asyncio.create_task(election.run(on_elected, on_deposed))
+
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, campaign.cancel)
+
+    logger.info("Price fetcher started")
+    try:
+        await campaign
+    except asyncio.CancelledError:
+        logger.info("Received shutdown signal, stopping fetcher...")
+    finally:
+        price_checker.stop()
+        await asyncio.to_thread(election.release)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_fetcher())
@@ -3,13 +3,20 @@
 Database initialization script for Nintendo Deals Bot
 """
 
-from models.database import engine
-from models.models import Base
+from models.database import engine, SessionLocal
+from models.migrations import migrate, run_backfills
 
 def init_database():
-    """Create all database tables"""
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    """Create or upgrade the database schema"""
+    print("Applying database migrations...")
+    applied = migrate(engine)
+    if applied:
+        print(f"🗂 Applied {applied} migrations")
+
+    # Finish data backfills (price stats, legacy history columns) up front
+    batches = run_backfills(SessionLocal)
+    if batches:
+        print(f"📈 Ran {batches} backfill batches")
     print("✅ Database initialized successfully!")
 
 if __name__ == "__main__":
@@ -4,22 +4,115 @@ Nintendo Deals Bot - Main entry point
 """
 
 import asyncio
+import hmac
 import logging
 import os
 import signal
 import sys
+from contextlib import asynccontextmanager
+
 import uvicorn
-from fastapi import FastAPI
-from bot.bot import main
+from fastapi import FastAPI, HTTPException, Request
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from bot.bot import main, BOT_MODE, WEBHOOK_PATH, WEBHOOK_SECRET
+from bot.core.leader_election import LeaderElection
 from bot.scheduler import price_checker
+from models.database import engine, read_engine, session_stats
+from models.migrations import is_current, migrate
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))  # uvicorn worker processes in webhook mode
+
+leader_election = LeaderElection('scheduler')
+
+
+async def on_elected():
+    """This worker runs the migrations, owns the webhook registration and sweeps prices"""
+    from bot.bot import migrate_database, set_webhook
+    await migrate_database()
+    await set_webhook()
+    price_checker.resume()
+
+
+async def on_deposed():
+    price_checker.pause()
+
+
+async def wait_for_schema(engine, poll: float = 1.0):
+    """Hold a worker back until every migration is applied, so no update is handled against an old schema"""
+    while True:
+        try:
+            if await asyncio.to_thread(is_current, engine):
+                return
+        except SQLAlchemyError as e:
+            logging.getLogger(__name__).error(f"Could not read the schema version: {e}")
+        await asyncio.sleep(poll)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """In webhook mode every uvicorn worker serves updates; only the elected leader runs the scheduler"""
+    if BOT_MODE != "webhook":
+        yield
+        return
+
+    from bot.bot import bot, dp
+    from bot.core.state_storage import BoundedMemoryStorage
+    if isinstance(dp.storage, BoundedMemoryStorage) and WEB_CONCURRENCY > 1:
+        logging.getLogger(__name__).warning("STATE_STORAGE=memory is per worker; use sqlite or redis "
+                                            "so conversations work across webhook workers")
+    price_checker.set_bot(bot)
+    campaign = asyncio.create_task(leader_election.run(on_elected, on_deposed))
+    try:
+        # The leader migrates in on_elected; the other workers start serving once it is done
+        await wait_for_schema(engine)
+        yield
+    finally:
+        campaign.cancel()
+        price_checker.stop()
+        await asyncio.to_thread(leader_election.release)
+        await bot.session.close()
+
 
-# Create FastAPI app for health checks
-app = FastAPI(title="Nintendo Deals Bot", version="1.0.0")
+# Create FastAPI app for health checks and the Telegram webhook
+app = FastAPI(title="Nintendo Deals Bot", version="1.0.0", lifespan=lifespan)
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Render"""
-    return {"status": "healthy", "service": "nintendo-deals-bot"}
+    return {"status": "healthy", "service": "nintendo-deals-bot", "database": await check_database()}
+
+@app.get("/metrics")
+async def metrics():
+    """Open database sessions and pool usage; a steadily growing open_sessions means a leak"""
+    return session_stats()
+
+@app.post(WEBHOOK_PATH)
+async def telegram_webhook(request: Request):
+    """Telegram update ingestion in webhook mode; any worker can handle any update"""
+    if BOT_MODE != "webhook":
+        raise HTTPException(status_code=404)
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not hmac.compare_digest(token, WEBHOOK_SECRET):
+        raise HTTPException(status_code=403)
+
+    from bot.bot import feed_webhook_update
+    # Answered after the handler finishes, so Telegram redelivers the update if this worker dies
+    await feed_webhook_update(await request.json())
+    return {"ok": True}
+
+async def check_database() -> str:
+    """Ping the database from a worker thread, through the read pool so a sweep holding the writer can't delay it"""
+    def ping():
+        with read_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.to_thread(ping)
+        return "ok"
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Database health check failed: {e}")
+        return "unavailable"
 
 async def run_web_server():
     """Run FastAPI web server for health checks"""
@@ -39,11 +132,14 @@ async def main_with_scheduler():
     logger = logging.getLogger(__name__)
 
     # Import bot here to avoid circular imports
-    from bot.bot import bot
+    from bot.bot import bot, migrate_database
 
     # Set bot for price checker
     price_checker.set_bot(bot)
 
+    # The scheduler jobs fire right away, so the schema must be current first
+    await migrate_database()
+
     # Start price checker scheduler
     price_checker.start()
     logger.info("Price checker scheduler started")
@@ -62,8 +158,8 @@ async def main_with_scheduler():
         port = int(os.getenv("PORT", 10000))
         logger.info(f"Starting web server on port {port}...")
         await asyncio.gather(
-            main(),          # Bot polling
-            run_web_server() # Health check server
+            main(migrate=False),  # Bot polling
+            run_web_server()      # Health check server
         )
     except Exception as e:
         logger.error(f"Error running services: {e}")
@@ -71,5 +167,15 @@ async def main_with_scheduler():
         # Stop scheduler on exit
         price_checker.stop()
 
+def run_webhook_workers():
+    """Serve the webhook from WEB_CONCURRENCY processes; each one runs the lifespan above"""
+    # Migrate once before the workers fork, so none of them waits on the leader
+    migrate(engine)
+    port = int(os.getenv("PORT", 10000))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=WEB_CONCURRENCY, log_level="info")
+
 if __name__ == "__main__":
-    asyncio.run(main_with_scheduler())
+    if BOT_MODE == "webhook":
+        run_webhook_workers()
+    else:
+        asyncio.run(main_with_scheduler())
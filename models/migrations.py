@@ -0,0 +1,208 @@
+"""Versioned schema migrations, applied once per database instead of create_all on every boot.
+
+Each migration has an `upgrade(conn)` DDL step, applied in its own transaction
+and recorded in schema_migrations, and optionally a `backfill(db, after, batch_size)`
+data step. Backfills run in small committed batches after startup and keep a
+cursor, so they can work through large tables online and resume after a restart.
+Upgrades are idempotent: a database that already has a table, column or index
+(from the baseline or an older create_all) just gets the version recorded.
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.orm import sessionmaker
+
+from .database import Base
+from .models import (SchemaMigration, User, UserPremiumPurchase, Game, UserWishlist, PriceHistory, Notification,
+                     GameCheckSchedule, SweepProgress, PriceStats, DealRanking, ServiceLease,
+                     PriceEvent, NotificationOutbox)
+from .schema import add_missing_column, ensure_indexes, widen_to_bigint
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', 1000))  # rows per backfill transaction
+MIGRATION_LOCK_SECONDS = int(os.getenv('MIGRATION_LOCK_SECONDS', 600))  # a crashed migrator's lock expires after this
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable
+    backfill: Optional[Callable] = None
+
+
+def _create_tables(*models):
+    def upgrade(conn):
+        Base.metadata.create_all(conn, tables=[model.__table__ for model in models])
+    return upgrade
+
+
+def _add_last_seen_at(conn):
+    add_missing_column(conn, PriceHistory.__table__, PriceHistory.__table__.c.last_seen_at)
+
+
+def _widen_telegram_id(conn):
+    widen_to_bigint(conn, User.__table__, User.__table__.c.telegram_id)
+
+
+def _backfill_last_seen_at(db, after: int, batch_size: int) -> Optional[int]:
+    """Legacy rows were only seen at recorded_at; walk the table by id so every batch is an index range"""
+    last = db.execute(
+        select(PriceHistory.id).where(PriceHistory.id > after).order_by(PriceHistory.id)
+        .offset(batch_size - 1).limit(1)
+    ).scalar()
+    upper = last if last is not None else db.execute(select(PriceHistory.id).order_by(PriceHistory.id.desc())).scalar()
+    if upper is None or upper <= after:
+        return None
+    db.execute(
+        text("UPDATE price_history SET last_seen_at = recorded_at "
+             "WHERE id > :after AND id <= :upper AND last_seen_at IS NULL"),
+        {"after": after, "upper": upper}
+    )
+    return upper
+
+
+def _backfill_price_stats(db, after: int, batch_size: int) -> Optional[int]:
+    from bot.core.price_stats import price_stats
+    return price_stats.backfill_batch(db, after, max(1, batch_size // 10))
+
+
+def _add_average_cents(conn):
+    add_missing_column(conn, PriceStats.__table__, PriceStats.__table__.c.average_cents)
+
+
+def _backfill_average_cents(db, after: int, batch_size: int) -> Optional[int]:
+    """Existing stats rows already hold the time spent at each price; derive the average from it"""
+    from bot.core.price_stats import weighted_average
+    rows = (db.query(PriceStats).filter(PriceStats.game_id > after)
+            .order_by(PriceStats.game_id).limit(batch_size).all())
+    if not rows:
+        return None
+    for stats in rows:
+        if stats.average_cents is None and stats.price_seconds:
+            stats.average_cents = weighted_average(
+                {int(price): seconds for price, seconds in json.loads(stats.price_seconds).items()}
+            )
+    return rows[-1].game_id
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", _create_tables(User, UserPremiumPurchase, Game, UserWishlist, PriceHistory,
+                                            Notification)),
+    Migration(2, "price check scheduling", _create_tables(GameCheckSchedule, SweepProgress)),
+    Migration(3, "price_history.last_seen_at", _add_last_seen_at, _backfill_last_seen_at),
+    Migration(4, "price stats", _create_tables(PriceStats), _backfill_price_stats),
+    Migration(5, "deal rankings", _create_tables(DealRanking)),
+    Migration(6, "hot query indexes", ensure_indexes),
+    Migration(7, "64-bit telegram ids", _widen_telegram_id),
+    Migration(8, "service leases", _create_tables(ServiceLease)),
+    Migration(9, "price events", _create_tables(PriceEvent)),
+    Migration(10, "notification outbox", _create_tables(NotificationOutbox)),
+    Migration(11, "price_stats.average_cents", _add_average_cents, _backfill_average_cents),
+]
+
+def _state(conn):
+    """{version: backfilled_at} of applied migrations, or None before the first migration"""
+    if not inspect(conn).has_table(SchemaMigration.__tablename__):
+        return None
+    return dict(conn.execute(select(SchemaMigration.version, SchemaMigration.backfilled_at)).all())
+
+
+def _is_current(applied, migrations: List[Migration]) -> bool:
+    return applied is not None and all(m.version in applied for m in migrations)
+
+
+def is_current(engine, migrations: List[Migration] = MIGRATIONS) -> bool:
+    """Whether every migration has been applied; workers that don't migrate wait for this"""
+    with engine.connect() as conn:
+        return _is_current(_state(conn), migrations)
+
+
+def migrate(engine, migrations: List[Migration] = MIGRATIONS, lock_poll: float = 1.0) -> int:
+    """Apply pending migrations; returns how many ran. A current schema costs one query and no DDL."""
+    with engine.connect() as conn:
+        if _is_current(_state(conn), migrations):
+            return 0
+
+    # The bot's leader and the fetcher can start together; a lease row lets only one of them migrate
+    from bot.core.leader_election import LeaderElection
+    lock = LeaderElection('migrations', session_factory=sessionmaker(bind=engine), ttl=MIGRATION_LOCK_SECONDS)
+    while not lock.try_acquire():
+        time.sleep(lock_poll)
+    try:
+        return _apply(engine, migrations)
+    finally:
+        lock.release()
+
+
+def _apply(engine, migrations: List[Migration]) -> int:
+    # Read again under the lock: whoever held it before may have applied everything
+    with engine.connect() as conn:
+        applied = _state(conn)
+    if _is_current(applied, migrations):
+        return 0
+
+    if applied is None:
+        with engine.begin() as conn:
+            SchemaMigration.__table__.create(conn, checkfirst=True)
+        applied = {}
+
+    count = 0
+    for migration in migrations:
+        if migration.version in applied:
+            continue
+        started = datetime.utcnow()
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(
+                version=migration.version, name=migration.name, applied_at=started,
+                backfill_cursor=0 if migration.backfill else None,
+                backfilled_at=None if migration.backfill else started
+            ))
+        count += 1
+        logger.info(f"Applied migration {migration.version} ({migration.name}) "
+                    f"in {(datetime.utcnow() - started).total_seconds():.2f}s")
+    return count
+
+
+def pending_backfills(engine, migrations: List[Migration] = MIGRATIONS) -> List[Migration]:
+    with engine.connect() as conn:
+        applied = _state(conn) or {}
+    return [m for m in migrations if m.backfill and m.version in applied and applied[m.version] is None]
+
+
+def run_backfills(session_factory, migrations: List[Migration] = MIGRATIONS,
+                  batch_size: int = MIGRATION_BATCH_SIZE) -> int:
+    """Work through unfinished backfills batch by batch; safe to interrupt and rerun"""
+    db = session_factory()
+    batches = 0
+    try:
+        for migration in pending_backfills(db.get_bind(), migrations):
+            record = db.get(SchemaMigration, migration.version)
+            cursor = record.backfill_cursor or 0
+            try:
+                while True:
+                    cursor = migration.backfill(db, cursor, batch_size)
+                    record = db.get(SchemaMigration, migration.version)
+                    if cursor is None:
+                        record.backfilled_at = datetime.utcnow()
+                        db.commit()
+                        logger.info(f"Backfill for migration {migration.version} ({migration.name}) finished")
+                        break
+                    record.backfill_cursor = cursor
+                    db.commit()
+                    batches += 1
+            except Exception as e:
+                # Progress so far is committed; the next start resumes from the cursor
+                logger.error(f"Backfill for migration {migration.version} ({migration.name}) failed: {e}")
+                db.rollback()
+                break
+    finally:
+        db.close()
+    return batches
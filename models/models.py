@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, TIMESTAMP, Text, Float, Index
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -6,13 +6,16 @@ class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
-    telegram_id = Column(Integer, unique=True, nullable=False)
+    telegram_id = Column(BigInteger, unique=True, index=True, nullable=False)  # ids exceed 32 bits
     telegram_username = Column(String)
     region = Column(String, default="us")
     created_at = Column(TIMESTAMP, server_default=func.now())
 
 class UserPremiumPurchase(Base):
     __tablename__ = "user_premium_purchases"
+    __table_args__ = (
+        Index("ix_user_premium_purchases_user_expires", "user_id", "expires_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -22,6 +25,10 @@ class UserPremiumPurchase(Base):
 
 class Game(Base):
     __tablename__ = "games"
+    __table_args__ = (
+        # Also serves lookups by source_id alone
+        Index("uq_games_source_currency", "source_id", "currency", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     source_id = Column(String, nullable=False)  # id from DekuDeals or other system
@@ -35,6 +42,11 @@ class Game(Base):
 
 class UserWishlist(Base):
     __tablename__ = "user_wishlist"
+    __table_args__ = (
+        # Also serves "wishlist of this user" lookups
+        Index("uq_user_wishlist_user_game", "user_id", "game_id", unique=True),
+        Index("ix_user_wishlist_game_id", "game_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -46,15 +58,23 @@ class UserWishlist(Base):
 
 class PriceHistory(Base):
     __tablename__ = "price_history"
+    __table_args__ = (
+        Index("ix_price_history_game_recorded", "game_id", "recorded_at"),
+        Index("ix_price_history_recorded_at", "recorded_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
     price_cents = Column(Integer, nullable=False)
     currency = Column(String, nullable=False)
-    recorded_at = Column(TIMESTAMP, server_default=func.now())
+    recorded_at = Column(TIMESTAMP, server_default=func.now())  # First time this price was seen
+    last_seen_at = Column(TIMESTAMP)  # Last check that still saw this price (NULL for legacy rows)
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_sent", "user_id", "sent_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -62,3 +82,110 @@ class Notification(Base):
     price_cents = Column(Integer, nullable=False)
     sent_at = Column(TIMESTAMP, server_default=func.now())
     rule = Column(Text)
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    game_id = Column(Integer, ForeignKey("games.id"))
+    telegram_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    dedupe_key = Column(String, unique=True, nullable=False)  # the same alert is never queued twice
+    status = Column(String, nullable=False, default="pending")  # pending | sending | sent | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(TIMESTAMP, nullable=False)
+    claimed_at = Column(TIMESTAMP)  # when a dispatcher took it; stale claims are retried
+    sent_at = Column(TIMESTAMP)
+    last_error = Column(Text)
+    created_at = Column(TIMESTAMP, nullable=False)
+
+class GameCheckSchedule(Base):
+    __tablename__ = "game_check_schedule"
+
+    game_id = Column(Integer, ForeignKey("games.id"), primary_key=True)
+    priority = Column(Float, nullable=False, default=1.0)  # Higher = checked more often
+    interval_seconds = Column(Integer, nullable=False)
+    next_check_at = Column(TIMESTAMP, nullable=False, index=True)
+    planned_at = Column(TIMESTAMP)
+
+class SweepProgress(Base):
+    __tablename__ = "sweep_progress"
+
+    name = Column(String, primary_key=True)
+    cycle_started_at = Column(TIMESTAMP, nullable=False)
+    shard_count = Column(Integer, nullable=False)
+    next_shard = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP)
+
+class PriceStats(Base):
+    __tablename__ = "price_stats"
+
+    game_id = Column(Integer, ForeignKey("games.id"), primary_key=True)
+    currency = Column(String, nullable=False)
+    last_price_cents = Column(Integer)
+    last_observed_at = Column(TIMESTAMP)
+    all_time_low_cents = Column(Integer)
+    all_time_low_at = Column(TIMESTAMP)
+    low_30d_cents = Column(Integer)
+    low_90d_cents = Column(Integer)
+    median_cents = Column(Integer)  # Time-weighted median price
+    average_cents = Column(Integer)  # Time-weighted mean price
+    regular_price_cents = Column(Integer)  # Highest price seen, the non-sale price
+    sale_count = Column(Integer, default=0)
+    avg_sale_depth_percent = Column(Float)
+    sale_depth_sum = Column(Float, default=0.0)
+    current_sale_depth_percent = Column(Float)  # NULL when not on sale
+    daily_lows = Column(Text)  # JSON {"YYYY-MM-DD": cents} for the last 90 days
+    price_seconds = Column(Text)  # JSON {cents: seconds observed at that price}
+    updated_at = Column(TIMESTAMP)
+
+class DealRanking(Base):
+    __tablename__ = "deal_rankings"
+    __table_args__ = (
+        Index("ix_deal_rankings_currency_rank", "currency", "rank"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
+    currency = Column(String, nullable=False)
+    rank = Column(Integer, nullable=False)  # 1 = best deal in this currency
+    score = Column(Float, nullable=False)
+    price_cents = Column(Integer, nullable=False)
+    regular_price_cents = Column(Integer)
+    discount_percent = Column(Integer)
+    all_time_low_cents = Column(Integer)
+    wishlist_count = Column(Integer, default=0)
+    computed_at = Column(TIMESTAMP)
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    applied_at = Column(TIMESTAMP, nullable=False)
+    backfill_cursor = Column(Integer)  # Last key processed by the migration's batched backfill
+    backfilled_at = Column(TIMESTAMP)  # NULL while the backfill is still running
+
+class ServiceLease(Base):
+    __tablename__ = "service_leases"
+
+    name = Column(String, primary_key=True)  # e.g. "scheduler"
+    holder = Column(String, nullable=False)  # host:pid:nonce of the worker holding the lease
+    expires_at = Column(TIMESTAMP, nullable=False)
+
+class PriceEvent(Base):
+    __tablename__ = "price_events"
+    __table_args__ = (
+        Index("ix_price_events_processed_id", "processed_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    game_id = Column(Integer, ForeignKey("games.id"), nullable=False)
+    price_cents = Column(Integer, nullable=False)
+    currency = Column(String)
+    created_at = Column(TIMESTAMP, nullable=False)
+    processed_at = Column(TIMESTAMP)  # NULL until the bot has matched and sent the alerts
@@ -0,0 +1,99 @@
+"""DDL helpers used by the migrations to bring databases created by older versions up to the models"""
+
+import logging
+
+from sqlalchemy import inspect, text
+
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+# Tables that reference games.id and can simply be repointed at the kept row
+GAME_REFERENCES = ("user_wishlist", "price_history", "notifications")
+# Derived per-game rows; dropped for merged duplicates and rebuilt by the sweep
+GAME_DERIVED = ("price_stats", "game_check_schedule", "deal_rankings")
+
+
+def merge_duplicate_games(conn, archive=None) -> int:
+    """Fold games sharing (source_id, currency) into the lowest id so the unique index can be built.
+
+    Archived price history moves along with the live rows, so the kept game's
+    intervals still cover the duplicate's older prices.
+    """
+    if archive is None:
+        from bot.core.price_archive import price_archive as archive
+
+    duplicates = conn.execute(text(
+        "SELECT g.id, k.keep_id FROM games g "
+        "JOIN (SELECT source_id, currency, MIN(id) AS keep_id FROM games "
+        "      GROUP BY source_id, currency HAVING COUNT(*) > 1) k "
+        "ON g.source_id = k.source_id AND g.id != k.keep_id "
+        "AND (g.currency = k.currency OR (g.currency IS NULL AND k.currency IS NULL))"
+    )).all()
+    existing = set(inspect(conn).get_table_names())
+    for game_id, keep_id in duplicates:
+        for table in GAME_REFERENCES:
+            if table in existing:
+                conn.execute(text(f"UPDATE {table} SET game_id = :keep WHERE game_id = :game"),
+                             {"keep": keep_id, "game": game_id})
+        for table in GAME_DERIVED:
+            if table in existing:
+                conn.execute(text(f"DELETE FROM {table} WHERE game_id = :game"), {"game": game_id})
+        archive.merge(game_id, keep_id)
+        conn.execute(text("DELETE FROM games WHERE id = :game"), {"game": game_id})
+    return len(duplicates)
+
+
+def remove_duplicate_wishlist_entries(conn) -> int:
+    """Keep the oldest wishlist row per (user_id, game_id)"""
+    result = conn.execute(text(
+        "DELETE FROM user_wishlist WHERE id NOT IN "
+        "(SELECT MIN(id) FROM user_wishlist GROUP BY user_id, game_id)"
+    ))
+    return result.rowcount
+
+
+def widen_to_bigint(conn, table, column) -> bool:
+    """Postgres INTEGER is 32-bit; SQLite integers are 64-bit already"""
+    if conn.dialect.name != "postgresql":
+        return False
+    conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE BIGINT"))
+    logger.info(f"Widened {table.name}.{column.name} to BIGINT")
+    return True
+
+
+def add_missing_column(conn, table, column) -> bool:
+    """ALTER TABLE ... ADD COLUMN for a model column the existing table lacks"""
+    present = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    if column.name in present:
+        return False
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+    logger.info(f"Added column {table.name}.{column.name}")
+    return True
+
+
+def ensure_indexes(conn) -> int:
+    """Create any model index missing from an existing database; returns how many were created"""
+    created = 0
+    inspector = inspect(conn)
+    tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        present = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in present:
+                continue
+            if index.unique and table.name == "games":
+                merged = merge_duplicate_games(conn)
+                if merged:
+                    logger.warning(f"Merged {merged} duplicate games before adding {index.name}")
+            if index.unique and table.name == "user_wishlist":
+                removed = remove_duplicate_wishlist_entries(conn)
+                if removed:
+                    logger.warning(f"Removed {removed} duplicate wishlist entries before adding {index.name}")
+            index.create(conn)
+            created += 1
+            logger.info(f"Created index {index.name}")
+    return created
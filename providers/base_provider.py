@@ -1,5 +1,16 @@
+import asyncio
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
+
+# Currency each supported region is priced in
+CURRENCY_BY_REGION = {'us': 'USD', 'eu': 'EUR', 'jp': 'JPY'}
+
+
+def currency_for_region(region: Optional[str]) -> str:
+    """Currency code for a region, USD for unknown regions"""
+    return CURRENCY_BY_REGION.get((region or 'us').lower(), 'USD')
+
 
 class PriceProvider(ABC):
     """Abstract base class for price providers"""
@@ -18,3 +29,81 @@ class PriceProvider(ABC):
     def search_games(self, query: str, region: str = "us") -> List[Dict]:
         """Search for games by title"""
         pass
+
+    def get_game_infos(self, game_ids: Iterable[str], region: str = "us") -> Dict[str, Optional[Dict]]:
+        """Get game information for many games at once, keyed by game id"""
+        return {game_id: self.get_game_info(game_id, region) for game_id in dict.fromkeys(game_ids)}
+
+
+class AsyncPriceProvider(ABC):
+    """Abstract base class for asyncio price providers"""
+
+    @abstractmethod
+    async def get_game_info(self, game_id: str, region: str = "us") -> Optional[Dict]:
+        """Get game information including title, platform, current price, discount"""
+        pass
+
+    @abstractmethod
+    async def search_games(self, query: str, region: str = "us") -> List[Dict]:
+        """Search for games by title"""
+        pass
+
+    async def get_game_infos(self, game_ids: Iterable[str], region: str = "us") -> Dict[str, Optional[Dict]]:
+        """Get game information for many games at once, keyed by game id"""
+        unique_ids = list(dict.fromkeys(game_ids))
+        infos = await asyncio.gather(*(self.get_game_info(game_id, region) for game_id in unique_ids))
+        return dict(zip(unique_ids, infos))
+
+    async def get_price(self, game_id: str) -> Optional[float]:
+        """Get current price for a game"""
+        info = await self.get_game_info(game_id)
+        return info['current_price'] if info else None
+
+    async def close(self):
+        """Release network resources held by the provider"""
+        pass
+
+
+class SyncProviderAdapter(PriceProvider):
+    """Exposes an AsyncPriceProvider through the blocking PriceProvider interface.
+
+    Coroutines run on a private event loop thread, so the wrapped provider
+    must not be shared with another event loop.
+    """
+
+    def __init__(self, provider: AsyncPriceProvider):
+        self.provider = provider
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _run(self, coro):
+        """Run a coroutine on the adapter's loop and wait for the result"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name=f"{type(self.provider).__name__}-loop",
+                    daemon=True
+                ).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def get_game_info(self, game_id: str, region: str = "us") -> Optional[Dict]:
+        return self._run(self.provider.get_game_info(game_id, region))
+
+    def get_price(self, game_id: str) -> Optional[float]:
+        return self._run(self.provider.get_price(game_id))
+
+    def search_games(self, query: str, region: str = "us") -> List[Dict]:
+        return self._run(self.provider.search_games(query, region))
+
+    def get_game_infos(self, game_ids: Iterable[str], region: str = "us") -> Dict[str, Optional[Dict]]:
+        return self._run(self.provider.get_game_infos(list(game_ids), region))
+
+    def close(self):
+        """Close the wrapped provider and stop the loop thread"""
+        if self._loop is None:
+            return
+        self._run(self.provider.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
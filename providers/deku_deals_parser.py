@@ -0,0 +1,206 @@
+import logging
+import os
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import Dict, List, Optional
+
+try:
+    import lxml  # noqa: F401 - only needed as a BeautifulSoup backend
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# "auto" picks lxml when it is installed, otherwise the stdlib html.parser
+HTML_PARSER_BACKEND = os.getenv('HTML_PARSER_BACKEND', 'auto')
+# Build the tree only for the elements we read instead of the whole page
+HTML_PARSER_SELECTIVE = os.getenv('HTML_PARSER_SELECTIVE', 'true').lower() == 'true'
+
+
+def _is_game_container_style(style: Optional[str]) -> bool:
+    return style is not None and 'gap: 0.2rem' in style
+
+
+# Listing pages: only the game cards; item pages: only the title and the price block
+LISTING_STRAINER = SoupStrainer('div', style=_is_game_container_style)
+GAME_PAGE_STRAINER = SoupStrainer(class_=['item-title', 'price-container'])
+
+
+def resolve_backend(backend: str) -> str:
+    """Map a backend setting to a BeautifulSoup feature name"""
+    if backend == 'auto':
+        return 'lxml' if LXML_AVAILABLE else 'html.parser'
+    if backend == 'lxml' and not LXML_AVAILABLE:
+        logger.warning("lxml is not installed, falling back to html.parser")
+        return 'html.parser'
+    return backend
+
+
+class DekuDealsParser:
+    """Turns DekuDeals HTML pages into game info dicts"""
+
+    # Part of the HTTP cache key; bump it when a change alters what a page parses to
+    VERSION = 1
+
+    def __init__(self, base_url: str = "https://www.dekudeals.com", backend: str = HTML_PARSER_BACKEND,
+                 selective: bool = HTML_PARSER_SELECTIVE):
+        self.base_url = base_url
+        self.backend = resolve_backend(backend)
+        self.selective = selective
+
+    def _make_soup(self, content: bytes, strainer: SoupStrainer) -> BeautifulSoup:
+        """Parse content with the configured backend, restricted to the strainer in selective mode"""
+        return BeautifulSoup(content, self.backend, parse_only=strainer if self.selective else None)
+
+    def parse_listing(self, content: bytes, currency: str, query: str = "", limit: Optional[int] = None,
+                      max_containers: Optional[int] = None) -> List[Dict]:
+        """Parse a page listing many games (search results, deals) into game info dicts"""
+        soup = self._make_soup(content, LISTING_STRAINER)
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        # Parse search results - updated selectors for new site structure
+        game_containers = soup.find_all('div', class_='d-flex flex-column', style=_is_game_container_style)
+        logger.info(f"Found {len(game_containers)} game containers on the page")
+
+        # Debug: print some HTML content to see structure
+        if len(game_containers) == 0:
+            logger.warning("No game containers found. Page structure might have changed.")
+            # Log first 2000 characters of response for debugging
+            logger.debug(f"Response content preview: {content[:2000]}")
+
+        games = []
+        query_lower = query.lower()
+
+        for container in game_containers[:max_containers]:
+            title_elem = container.find('a', class_='main-link')
+            if not title_elem:
+                continue
+
+            title = title_elem.text.strip()
+            game_url = title_elem['href']
+            game_id = game_url.split('/')[-1]
+
+            # Check if game title matches the search query
+            if query_lower not in title.lower():
+                continue
+
+            # Get price info - look for price elements directly in container
+            current_price = None
+            original_price = None
+            discount = None
+
+            # Find current price (strong tag)
+            price_strong = container.find('strong')
+            if price_strong:
+                current_price = self._parse_price(price_strong.text.strip())
+
+            # Find original price (s tag with text-muted class)
+            original_price_elem = container.find('s', class_='text-muted')
+            if original_price_elem:
+                original_price = self._parse_price(original_price_elem.text.strip())
+
+            # Find discount percentage (badge-danger)
+            discount_elem = container.find('span', class_='badge-danger')
+            if discount_elem:
+                discount = int(discount_elem.text.strip().replace('%', '').replace('-', ''))
+
+            # Serializing the container is expensive, so only do it when debug logging is on
+            if debug:
+                logger.debug(
+                    f"Found matching game: {title} (ID: {game_id}), prices: {current_price} / "
+                    f"{original_price} / {discount}%, container: {str(container)[:500]}"
+                )
+
+            games.append({
+                'id': game_id,
+                'title': title,
+                'current_price': current_price,
+                'original_price': original_price,
+                'discount_percent': discount,
+                'currency': currency,
+                'url': f"{self.base_url}{game_url}",
+                'platform': 'switch'  # Assuming Nintendo Switch for MVP
+            })
+
+            if limit is not None and len(games) >= limit:
+                break
+
+        return games
+
+    def parse_search_results(self, content: bytes, query: str, currency: str, limit: int = 10) -> List[Dict]:
+        """Parse a search page and return games whose title matches the query"""
+        # Filter games by query since search redirects to main page; check more games to find matches
+        return self.parse_listing(content, currency, query=query, limit=limit, max_containers=50)
+
+    def parse_game_page(self, content: bytes, game_id: str, currency: str, url: str) -> Dict:
+        """Parse a game page into a game info dict"""
+        soup = self._make_soup(content, GAME_PAGE_STRAINER)
+
+        # Extract title
+        title_elem = soup.find('h1', class_='item-title')
+        title = title_elem.text.strip() if title_elem else "Unknown"
+
+        # Extract prices
+        price_info = self._extract_price_info(soup)
+
+        return {
+            'id': game_id,
+            'title': title,
+            'platform': 'switch',
+            'current_price': price_info['current'],
+            'original_price': price_info['original'],
+            'discount_percent': price_info['discount'],
+            'currency': currency,
+            'url': url
+        }
+
+    def _parse_price(self, price_text: str) -> Optional[float]:
+        """Parse price string to float"""
+        try:
+            # Keep only digits and separators (drops $, €, £, ¥ and spaces)
+            cleaned = ''.join(ch for ch in price_text if ch.isdigit() or ch in ',.')
+            if ',' in cleaned and '.' in cleaned:
+                # The right-most separator is the decimal one: 1,299.99 or 1.299,99
+                if cleaned.rfind(',') > cleaned.rfind('.'):
+                    cleaned = cleaned.replace('.', '').replace(',', '.')
+                else:
+                    cleaned = cleaned.replace(',', '')
+            elif ',' in cleaned:
+                # Handle European decimal format (comma instead of dot), but not thousands groups like ¥1,980
+                whole, _, fraction = cleaned.rpartition(',')
+                if len(fraction) == 3:
+                    cleaned = cleaned.replace(',', '')
+                else:
+                    cleaned = f"{whole.replace(',', '')}.{fraction}"
+            return float(cleaned)
+        except (ValueError, TypeError):
+            logger.debug(f"Failed to parse price: '{price_text}'")
+            return None
+
+    def _extract_price_info(self, soup: BeautifulSoup) -> Dict:
+        """Extract price information from game page"""
+        current_price = None
+        original_price = None
+        discount = None
+
+        # Look for price elements
+        price_container = soup.find('div', class_='price-container')
+        if price_container:
+            current_elem = price_container.find('span', class_='price-current')
+            if current_elem:
+                current_price = self._parse_price(current_elem.text.strip())
+
+            original_elem = price_container.find('span', class_='price-original')
+            if original_elem:
+                original_price = self._parse_price(original_elem.text.strip())
+
+            discount_elem = price_container.find('span', class_='price-discount')
+            if discount_elem:
+                discount_text = discount_elem.text.strip()
+                discount = int(discount_text.replace('%', '').replace('-', ''))
+
+        return {
+            'current': current_price,
+            'original': original_price,
+            'discount': discount
+        }
@@ -1,229 +1,268 @@
-import requests
+import asyncio
+import os
+import time
+import aiohttp
 import logging
-from bs4 import BeautifulSoup
-from typing import Dict, List, Optional
-from .base_provider import PriceProvider
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from .base_provider import AsyncPriceProvider, SyncProviderAdapter, currency_for_region
+from .deku_deals_parser import DekuDealsParser
+from .http_cache import HttpValidatorCache, content_hash
+from .parse_pool import ParsePool, parse_pool as default_parse_pool
+from .search_cache import SearchCache, normalize_query
 
 logger = logging.getLogger(__name__)
 
-class DekuDealsProvider(PriceProvider):
-    """Price provider implementation for DekuDeals"""
+# HTTP connection pool tuning (can be overridden from environment)
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv('HTTP_KEEPALIVE_SECONDS', 30))
+HTTP_TIMEOUT_SECONDS = float(os.getenv('HTTP_TIMEOUT_SECONDS', 15))
+
+# A listing page is only worth fetching when it covers at least this many requested games
+LISTING_MIN_HITS = int(os.getenv('LISTING_MIN_HITS', 2))
+# Seconds a listing page's game ids are trusted before the page is probed again
+LISTING_COVERAGE_TTL = float(os.getenv('LISTING_COVERAGE_TTL', 3600))
+
+
+class AsyncDekuDealsProvider(AsyncPriceProvider):
+    """Asyncio price provider for DekuDeals backed by one keep-alive connection pool"""
 
     BASE_URL = "https://www.dekudeals.com"
     SEARCH_URL = f"{BASE_URL}/search"
     GAME_URL = f"{BASE_URL}/items"
 
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-
-    def _get_currency_for_region(self, region: str) -> str:
-        """Get currency code for region"""
-        currency_map = {
-            'us': 'USD',
-            'eu': 'EUR',
-            'jp': 'JPY'
-        }
-        return currency_map.get(region.lower(), 'USD')
-
-    def search_games(self, query: str, region: str = "us") -> List[Dict]:
+    # Pages that list many games with prices; used to cover batches before falling back to item pages
+    LISTING_PATHS = ("/deals", "/recent-drops")
+
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, rate_limiter=None,
+                 http_cache: Optional[HttpValidatorCache] = None,
+                 search_cache: Optional[SearchCache] = None, base_url: Optional[str] = None,
+                 parse_pool: Optional[ParsePool] = default_parse_pool,
+                 listing_coverage_ttl: float = LISTING_COVERAGE_TTL):
+        if base_url:
+            # Point at another host, e.g. the local fixture server used by tests and benchmarks
+            self.BASE_URL = base_url.rstrip('/')
+            self.SEARCH_URL = f"{self.BASE_URL}/search"
+            self.GAME_URL = f"{self.BASE_URL}/items"
+        self.pool_size = pool_size
+        # Optional limiter with an async acquire(url) method, awaited before every request
+        self.rate_limiter = rate_limiter
+        # Optional validator cache for conditional requests on item and listing pages
+        self.http_cache = http_cache
+        self.cache_stats = {'not_modified': 0, 'unchanged': 0, 'parsed': 0}
+        # Optional in-process cache for search results
+        self.search_cache = search_cache
+        self.parser = DekuDealsParser(self.BASE_URL)
+        # Worker processes for parsing (PARSE_WORKERS); None parses in a thread of this process
+        self.parse_pool = parse_pool
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Which game ids each listing page showed the last time it was fetched, per region,
+        # with the monotonic time after which the page is probed again
+        self._listing_coverage: Dict[tuple, Tuple[float, Set[str]]] = {}
+        self.listing_coverage_ttl = listing_coverage_ttl
+        self.request_count = 0
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared client session, creating it inside the running loop on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=HTTP_KEEPALIVE_SECONDS
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.HEADERS,
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS)
+            )
+        return self._session
+
+    async def close(self):
+        """Close the connection pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _get_region_headers(self, region: str) -> Dict[str, str]:
+        """Get region-specific request headers"""
+        if region.lower() == 'eu':
+            return {'Accept-Language': 'en-GB,en;q=0.9'}
+        elif region.lower() == 'jp':
+            return {'Accept-Language': 'ja,en;q=0.9'}
+        return {}
+
+    async def _request(self, url: str, region: str, params: Optional[Dict] = None,
+                       extra_headers: Optional[Dict[str, str]] = None):
+        """Send a GET through the shared pool and return (status, headers, body)"""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(url)
+        headers = self._get_region_headers(region)
+        if extra_headers:
+            headers.update(extra_headers)
+        session = self._get_session()
+        self.request_count += 1
+        async with session.get(url, params=params, headers=headers) as response:
+            logger.debug(f"GET {response.url} -> {response.status}")
+            response.raise_for_status()
+            return response.status, response.headers, await response.read()
+
+    async def _fetch(self, url: str, region: str, params: Optional[Dict] = None) -> bytes:
+        """Download a page through the shared pool"""
+        _, _, content = await self._request(url, region, params)
+        return content
+
+    async def _parse(self, parse, content: bytes, *parse_args):
+        """Parse a page off the event loop, in the parse worker pool when there is one"""
+        if self.parse_pool is not None:
+            return await self.parse_pool.parse(self.parser, parse.__name__, content, *parse_args)
+        return await asyncio.to_thread(parse, content, *parse_args)
+
+    async def _fetch_parsed(self, url: str, region: str, parse, *parse_args):
+        """Fetch and parse a page, skipping parsing when the page is unchanged since the last fetch"""
+        if self.http_cache is None:
+            content = await self._fetch(url, region)
+            return await self._parse(parse, content, *parse_args)
+
+        # Results stored by an older parser are never reused; they age out of the cache
+        key = f"{self.parser.VERSION}:{region}:{url}"
+        entry = await asyncio.to_thread(self.http_cache.get, key)
+        status, headers, content = await self._request(
+            url, region, extra_headers=HttpValidatorCache.conditional_headers(entry)
+        )
+        etag = headers.get('ETag')
+        last_modified = headers.get('Last-Modified')
+
+        # 304 Not Modified: nothing was downloaded, reuse the stored result
+        if status == 304 and entry is not None:
+            self.cache_stats['not_modified'] += 1
+            # Still in use, so keep it from being purged
+            await asyncio.to_thread(self.http_cache.update_validators, key,
+                                    etag or entry['etag'], last_modified or entry['last_modified'])
+            return entry['parsed']
+
+        # Server ignored the validators but sent the same body
+        body_hash = content_hash(content)
+        if entry is not None and entry['content_hash'] == body_hash:
+            self.cache_stats['unchanged'] += 1
+            await asyncio.to_thread(self.http_cache.update_validators, key, etag, last_modified)
+            return entry['parsed']
+
+        self.cache_stats['parsed'] += 1
+        parsed = await self._parse(parse, content, *parse_args)
+        await asyncio.to_thread(self.http_cache.put, key, etag, last_modified, body_hash, parsed)
+        return parsed
+
+    async def _search(self, query: str, region: str) -> List[Dict]:
+        """Fetch and parse a search page"""
+        # Use correct parameter 'q' instead of 'term' and add digital filter
+        params = {'q': query, 'filter[format]': 'digital'}
+        content = await self._fetch(self.SEARCH_URL, region, params)
+
+        # Parse off the event loop so other updates keep being served
+        currency = currency_for_region(region)
+        return await self._parse(self.parser.parse_search_results, content, query, currency)
+
+    async def search_games(self, query: str, region: str = "us") -> List[Dict]:
         """Search for games on DekuDeals"""
+        query = normalize_query(query)
         logger.info(f"Searching for games with query: '{query}', region: {region}")
 
         try:
-            # Use correct parameter 'q' instead of 'term' and add digital filter
-            params = {'q': query, 'filter[format]': 'digital'}
-            url = f"{self.SEARCH_URL}?q={query}&filter[format]=digital"
-            logger.info(f"Making request to: {url}")
+            if self.search_cache is not None:
+                games = await self.search_cache.get_or_load(query, region, lambda: self._search(query, region))
+            else:
+                games = await self._search(query, region)
 
-            # Add region-specific headers
-            headers = self.session.headers.copy()
-            if region.lower() == 'eu':
-                headers['Accept-Language'] = 'en-GB,en;q=0.9'
-            elif region.lower() == 'jp':
-                headers['Accept-Language'] = 'ja,en;q=0.9'
-
-            response = self.session.get(self.SEARCH_URL, params=params, headers=headers)
-            logger.info(f"Response status code: {response.status_code}")
-
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-            games = []
-
-            # Parse search results - updated selectors for new site structure
-            game_containers = soup.find_all('div', class_='d-flex flex-column', style=lambda x: x and 'gap: 0.2rem' in x)
-            logger.info(f"Found {len(game_containers)} game containers on the page")
-
-            # Debug: print some HTML content to see structure
-            if len(game_containers) == 0:
-                logger.warning("No game containers found. Page structure might have changed.")
-                # Log first 2000 characters of response for debugging
-                logger.debug(f"Response content preview: {response.text[:2000]}")
-
-            # Filter games by query since search redirects to main page
-            filtered_games = []
-            query_lower = query.lower()
-            currency = self._get_currency_for_region(region)
-
-            for container in game_containers[:50]:  # Check more games to find matches
-                title_elem = container.find('a', class_='main-link')
-                if not title_elem:
-                    continue
-
-                title = title_elem.text.strip()
-                game_url = title_elem['href']
-                game_id = game_url.split('/')[-1]
-
-                # Check if game title matches the search query
-                if query_lower not in title.lower():
-                    continue
-
-                logger.debug(f"Found matching game: {title} (ID: {game_id})")
-
-                # Get price info - look for price elements directly in container
-                current_price = None
-                original_price = None
-                discount = None
-
-                # Debug: log container HTML for price debugging
-                logger.debug(f"Container HTML preview: {str(container)[:500]}")
-
-                # Find current price (strong tag)
-                price_strong = container.find('strong')
-                if price_strong:
-                    price_text = price_strong.text.strip()
-                    logger.debug(f"Found strong tag with text: '{price_text}'")
-                    current_price = self._parse_price(price_text)
-                    logger.debug(f"Parsed current price: {current_price}")
-                else:
-                    logger.debug("No strong tag found in container")
-
-                # Find original price (s tag with text-muted class)
-                original_price_elem = container.find('s', class_='text-muted')
-                if original_price_elem:
-                    original_text = original_price_elem.text.strip()
-                    logger.debug(f"Found s tag with text: '{original_text}'")
-                    original_price = self._parse_price(original_text)
-                    logger.debug(f"Parsed original price: {original_price}")
-                else:
-                    logger.debug("No s tag with text-muted class found in container")
-
-                # Find discount percentage (badge-danger)
-                discount_elem = container.find('span', class_='badge-danger')
-                if discount_elem:
-                    discount_text = discount_elem.text.strip()
-                    logger.debug(f"Found badge-danger with text: '{discount_text}'")
-                    discount = int(discount_text.replace('%', '').replace('-', ''))
-                    logger.debug(f"Parsed discount: {discount}%")
-                else:
-                    logger.debug("No badge-danger span found in container")
-
-                filtered_games.append({
-                    'id': game_id,
-                    'title': title,
-                    'current_price': current_price,
-                    'original_price': original_price,
-                    'discount_percent': discount,
-                    'currency': currency,
-                    'url': f"{self.BASE_URL}{game_url}",
-                    'platform': 'switch'  # Assuming Nintendo Switch for MVP
-                })
-
-                # Limit to 10 results
-                if len(filtered_games) >= 10:
-                    break
-
-            logger.info(f"Successfully found {len(filtered_games)} games matching query '{query}'")
-            return filtered_games
+            logger.info(f"Successfully found {len(games)} games matching query '{query}'")
+            return games
 
         except Exception as e:
             logger.error(f"Error searching games: {e}", exc_info=True)
             return []
 
-    def get_game_info(self, game_id: str, region: str = "us") -> Optional[Dict]:
+    async def get_game_info(self, game_id: str, region: str = "us") -> Optional[Dict]:
         """Get detailed game information"""
         try:
             url = f"{self.GAME_URL}/{game_id}"
-
-            # Add region-specific headers
-            headers = self.session.headers.copy()
-            if region.lower() == 'eu':
-                headers['Accept-Language'] = 'en-GB,en;q=0.9'
-            elif region.lower() == 'jp':
-                headers['Accept-Language'] = 'ja,en;q=0.9'
-
-            response = self.session.get(url, headers=headers)
-            response.raise_for_status()
-
-            soup = BeautifulSoup(response.content, 'html.parser')
-
-            # Extract title
-            title_elem = soup.find('h1', class_='item-title')
-            title = title_elem.text.strip() if title_elem else "Unknown"
-
-            # Extract prices
-            price_info = self._extract_price_info(soup)
-            currency = self._get_currency_for_region(region)
-
-            return {
-                'id': game_id,
-                'title': title,
-                'platform': 'switch',
-                'current_price': price_info['current'],
-                'original_price': price_info['original'],
-                'discount_percent': price_info['discount'],
-                'currency': currency,
-                'url': url
-            }
+            currency = currency_for_region(region)
+            return await self._fetch_parsed(url, region, self.parser.parse_game_page, game_id, currency, url)
 
         except Exception as e:
-            print(f"Error getting game info: {e}")
+            logger.error(f"Error getting game info for {game_id}: {e}")
             return None
 
-    def get_price(self, game_id: str) -> Optional[float]:
-        """Get current price for a game"""
-        info = self.get_game_info(game_id)
-        return info['current_price'] if info else None
-
-    def _parse_price(self, price_text: str) -> Optional[float]:
-        """Parse price string to float"""
+    async def _fetch_listing(self, url: str, region: str) -> Dict[str, Dict]:
+        """Fetch a listing page and return all games on it keyed by id"""
         try:
-            # Remove currency symbols and convert to float
-            cleaned = price_text.replace('$', '').replace('€', '').replace('£', '').strip()
-            # Handle European decimal format (comma instead of dot)
-            cleaned = cleaned.replace(',', '.')
-            return float(cleaned)
-        except (ValueError, AttributeError):
-            logger.debug(f"Failed to parse price: '{price_text}' -> '{cleaned}'")
-            return None
+            currency = currency_for_region(region)
+            games = await self._fetch_parsed(url, region, self.parser.parse_listing, currency)
+        except Exception as e:
+            # Don't record coverage: the page is probed again on the next batch
+            logger.error(f"Error fetching listing {url}: {e}")
+            return {}
+
+        infos = {game['id']: game for game in games}
+        self._listing_coverage[(url, region)] = (time.monotonic() + self.listing_coverage_ttl, set(infos))
+        return infos
+
+    def _next_listing(self, pending: Set[str], region: str, fetched: Set[str]) -> Optional[str]:
+        """Pick the listing page that covers the most pending games, if it is worth a request"""
+        best_url, best_hits = None, 0
+        for path in self.LISTING_PATHS:
+            url = f"{self.BASE_URL}{path}"
+            if url in fetched:
+                continue
+            coverage = self._listing_coverage.get((url, region))
+            if coverage is not None and coverage[0] <= time.monotonic():
+                coverage = None  # Expired: sales change what a listing shows
+            # Never-seen listings are worth one probe when the batch is big enough
+            hits = len(pending) if coverage is None else len(coverage[1] & pending)
+            if hits > best_hits:
+                best_url, best_hits = url, hits
+        return best_url if best_hits >= LISTING_MIN_HITS else None
+
+    async def get_game_infos(self, game_ids: Iterable[str], region: str = "us") -> Dict[str, Optional[Dict]]:
+        """Get info for many games, using listing pages where they cover the batch and item pages for the rest"""
+        pending = set(game_ids)
+        results: Dict[str, Optional[Dict]] = {}
+        fetched: Set[str] = set()
+        requests_before = self.request_count
+        parsed_before = self.cache_stats['parsed']
+
+        # Greedily fetch the listing pages that cover the most remaining games
+        url = self._next_listing(pending, region, fetched)
+        while url is not None:
+            fetched.add(url)
+            listing = await self._fetch_listing(url, region)
+            for game_id in pending & listing.keys():
+                results[game_id] = listing[game_id]
+            pending -= listing.keys()
+            url = self._next_listing(pending, region, fetched)
+
+        listed = len(results)
+
+        # Item pages for whatever the listings didn't cover (concurrency is bounded by the pool)
+        remaining = list(pending)
+        infos = await asyncio.gather(*(self.get_game_info(game_id, region) for game_id in remaining))
+        results.update(zip(remaining, infos))
+
+        logger.info(
+            f"Fetched {len(results)} games in region {region} with {self.request_count - requests_before} requests "
+            f"({listed} from listing pages, {len(remaining)} from item pages), "
+            f"{self.cache_stats['parsed'] - parsed_before} pages parsed"
+        )
+        return results
+
+
+class DekuDealsProvider(SyncProviderAdapter):
+    """Blocking DekuDeals provider for callers outside the event loop"""
+
+    BASE_URL = AsyncDekuDealsProvider.BASE_URL
+    SEARCH_URL = AsyncDekuDealsProvider.SEARCH_URL
+    GAME_URL = AsyncDekuDealsProvider.GAME_URL
 
-    def _extract_price_info(self, soup: BeautifulSoup) -> Dict:
-        """Extract price information from game page"""
-        current_price = None
-        original_price = None
-        discount = None
-
-        # Look for price elements
-        price_container = soup.find('div', class_='price-container')
-        if price_container:
-            current_elem = price_container.find('span', class_='price-current')
-            if current_elem:
-                current_price = self._parse_price(current_elem.text.strip())
-
-            original_elem = price_container.find('span', class_='price-original')
-            if original_elem:
-                original_price = self._parse_price(original_elem.text.strip())
-
-            discount_elem = price_container.find('span', class_='price-discount')
-            if discount_elem:
-                discount_text = discount_elem.text.strip()
-                discount = int(discount_text.replace('%', '').replace('-', ''))
-
-        return {
-            'current': current_price,
-            'original': original_price,
-            'discount': discount
-        }
+    def __init__(self):
+        super().__init__(AsyncDekuDealsProvider())
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+HTTP_CACHE_PATH = os.getenv('HTTP_CACHE_PATH', './http_cache.db')
+# Entries no sweep has fetched for this long are purged (0 keeps them forever)
+HTTP_CACHE_MAX_AGE_DAYS = float(os.getenv('HTTP_CACHE_MAX_AGE_DAYS', 30))
+
+
+def content_hash(content: bytes) -> str:
+    """Stable fingerprint of a response body"""
+    return hashlib.sha1(content).hexdigest()
+
+
+class HttpValidatorCache:
+    """Persistent store of HTTP validators (ETag, Last-Modified, body hash) and parsed results, keyed by URL.
+
+    The methods block on the cache file; async callers run them in a thread.
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """Open the cache file on first use"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL keeps the per-page commits cheap
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS http_cache ("
+                "key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                "content_hash TEXT, parsed TEXT, updated_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_http_cache_updated_at ON http_cache (updated_at)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get the cached validators and parsed result for a key"""
+        with self._lock:
+            row = self._get_conn().execute(
+                "SELECT etag, last_modified, content_hash, parsed FROM http_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'content_hash': row[2],
+            'parsed': json.loads(row[3]) if row[3] is not None else None
+        }
+
+    def put(self, key: str, etag: Optional[str], last_modified: Optional[str], body_hash: str, parsed: Any):
+        """Store validators and the parsed result for a key"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache (key, etag, last_modified, content_hash, parsed, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, etag, last_modified, body_hash, json.dumps(parsed), time.time())
+            )
+            conn.commit()
+
+    def update_validators(self, key: str, etag: Optional[str], last_modified: Optional[str]):
+        """Refresh validators for an unchanged page without rewriting the parsed result"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute(
+                "UPDATE http_cache SET etag = ?, last_modified = ?, updated_at = ? WHERE key = ?",
+                (etag, last_modified, time.time(), key)
+            )
+            conn.commit()
+
+    def purge(self, max_age_seconds: float) -> int:
+        """Delete entries not fetched within max_age_seconds, e.g. games no longer on any wishlist"""
+        with self._lock:
+            conn = self._get_conn()
+            removed = conn.execute(
+                "DELETE FROM http_cache WHERE updated_at < ?", (time.time() - max_age_seconds,)
+            ).rowcount
+            conn.commit()
+        return removed
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Build If-None-Match / If-Modified-Since headers from a cache entry"""
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
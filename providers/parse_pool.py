@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from .deku_deals_parser import DekuDealsParser
+
+logger = logging.getLogger(__name__)
+
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', 0))  # worker processes for HTML parsing; 0 = a thread in-process
+PARSE_CHUNK_SIZE = int(os.getenv('PARSE_CHUNK_SIZE', 8))  # pages sent to a worker in one task
+
+# Parsers built inside each worker, one per configuration
+_parsers: Dict[Tuple, DekuDealsParser] = {}
+
+
+def parse_chunk(jobs: List[Tuple]) -> List[Tuple[bool, Any]]:
+    """Parse (parser config, method name, content, args) jobs; runs inside a worker process.
+
+    Returns (True, result) or (False, exception) per job, so one bad page doesn't fail the chunk.
+    """
+    results = []
+    for config, method, content, args in jobs:
+        parser = _parsers.get(config)
+        if parser is None:
+            parser = _parsers[config] = DekuDealsParser(*config)
+        try:
+            results.append((True, getattr(parser, method)(content, *args)))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+
+class ParsePool:
+    """Parses downloaded pages in worker processes, so sweep parsing uses every core instead of one.
+
+    Only the raw page bytes go to the workers and only the small game info
+    dicts come back. Pages that arrive together are sent as one task of up to
+    chunk_size pages to keep the inter-process overhead low. Workers run the
+    same DekuDealsParser with the caller's settings, so results are identical
+    to parsing in-process.
+    """
+
+    def __init__(self, workers: int = PARSE_WORKERS, chunk_size: int = PARSE_CHUNK_SIZE):
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: List[Tuple[Tuple, asyncio.Future]] = []
+        self._flush_scheduled = False
+        self._tasks = set()
+        self.stats = {'pages': 0, 'chunks': 0, 'fallbacks': 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start the workers on first use"""
+        if self._executor is None:
+            # forkserver: workers don't inherit the bot's threads, sockets or locks
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('forkserver'))
+        return self._executor
+
+    async def parse(self, parser: DekuDealsParser, method: str, content: bytes, *args):
+        """Run parser.<method>(content, *args) in a worker and return its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        config = (parser.base_url, parser.backend, parser.selective)
+        self._pending.append(((config, method, content, args), future))
+        if len(self._pending) >= self.chunk_size:
+            self._flush()
+        elif not self._flush_scheduled:
+            # Collect whatever else completes in this loop iteration into the same chunk
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        jobs = [job for job, _ in batch]
+        self.stats['pages'] += len(jobs)
+        self.stats['chunks'] += 1
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._get_executor(), parse_chunk, jobs)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool next time and don't lose these pages
+            logger.error("Parse worker pool broke, parsing this chunk in-process")
+            self._executor = None
+            self.stats['fallbacks'] += 1
+            results = await asyncio.to_thread(parse_chunk, jobs)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (ok, value), (_, future) in zip(results, batch):
+            if future.done():
+                continue  # The caller was cancelled
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global instance, shared by every provider in the process (None = parse in a thread)
+parse_pool = ParsePool() if PARSE_WORKERS > 0 else None
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_TTL = float(os.getenv('SEARCH_CACHE_TTL', 600))  # seconds
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', 512))  # entries
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query so trivially different spellings share one cache entry"""
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """In-process search result cache with TTL, LRU eviction and single-flight loading"""
+
+    def __init__(self, ttl: float = SEARCH_CACHE_TTL, maxsize: int = SEARCH_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[Dict]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def _get_fresh(self, key) -> Optional[List[Dict]]:
+        """Return a cached value if present and not expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key, value: List[Dict]):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, query: str, region: str,
+                          loader: Callable[[], Awaitable[List[Dict]]]) -> List[Dict]:
+        """Return cached results for (query, region), or load them once for all concurrent callers"""
+        key = (normalize_query(query), region.lower())
+
+        value = self._get_fresh(key)
+        if value is not None:
+            self.hits += 1
+            logger.debug(f"Search cache hit for {key}")
+            return list(value)
+
+        # Someone is already fetching this query - wait for their result
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return list(await asyncio.shield(inflight))
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        # Don't warn about an unretrieved exception when nobody else was waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self._store(key, value)
+            future.set_result(value)
+        finally:
+            del self._inflight[key]
+
+        return list(value)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for set-based price alert matching (in-memory database, no network needed)
+"""
+
+from sqlalchemy import event
+
+from bot.core.alert_matcher import AlertMatcher
+from bot.scheduler import PriceChecker
+from models.models import User, Game, UserWishlist, Notification
+
+
+def seed(db):
+    """Two games, three users with different thresholds"""
+    users = [User(telegram_id=100 + i) for i in range(3)]
+    sale = Game(source_id="sale", title="On Sale", currency="USD", last_price_cents=1999)
+    full = Game(source_id="full", title="Full Price", currency="USD", last_price_cents=5999)
+    db.add_all(users + [sale, full])
+    db.flush()
+    db.add_all([
+        UserWishlist(user_id=users[0].id, game_id=sale.id, desired_price_cents=1999),  # exactly at threshold
+        UserWishlist(user_id=users[1].id, game_id=sale.id, desired_price_cents=1500),  # not low enough
+        UserWishlist(user_id=users[2].id, game_id=sale.id, desired_price_cents=2500,
+                     last_notified_price_cents=1999),  # already told about this price
+        UserWishlist(user_id=users[0].id, game_id=full.id),  # no threshold
+        UserWishlist(user_id=users[1].id, game_id=full.id, desired_price_cents=6000),
+    ])
+    db.commit()
+    return users, sale, full
+
+
+def test_only_firing_rows_are_returned(db):
+    """Thresholds and the last notified price are evaluated in SQL"""
+    users, sale, full = seed(db)
+
+    matches = AlertMatcher().match(db, [sale.id, full.id])
+    assert sorted((m.telegram_id, m.game_id) for m in matches) == sorted([
+        (users[0].telegram_id, sale.id), (users[1].telegram_id, full.id)
+    ])
+    match = next(m for m in matches if m.game_id == sale.id)
+    assert (match.price_cents, match.desired_price_cents, match.title) == (1999, 1999, "On Sale")
+
+
+def test_one_query_per_chunk(db):
+    """Matching many games runs one query per chunk, not one per wishlist row"""
+    engine = db.get_bind()
+    users, sale, full = seed(db)
+    game_ids = [sale.id, full.id]
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    AlertMatcher().match(db, game_ids)
+    assert len(statements) == 1
+
+    statements.clear()
+    AlertMatcher(chunk_size=1).match(db, game_ids)
+    assert len(statements) == 2
+
+
+def test_alerts_are_recorded_and_not_repeated(db):
+    """Queued alerts update last_notified_price_cents, so the next sweep stays quiet"""
+    users, sale, full = seed(db)
+    checker = PriceChecker()
+
+    assert checker.match_and_queue_alerts(db, [sale.id, full.id]) == 2
+    db.commit()
+    assert db.query(Notification).count() == 2
+    assert checker.alert_matcher.match(db, [sale.id, full.id]) == []
+
+
+if __name__ == "__main__":
+    from conftest import run
+
+    for test in (test_only_firing_rows_are_returned, test_one_query_per_chunk,
+                 test_alerts_are_recorded_and_not_repeated):
+        run(test)
+        print(f"✅ {test.__name__}")
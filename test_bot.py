@@ -66,12 +66,14 @@ def test_bot_token():
 
 def test_add_game():
     """Test adding a game to wishlist"""
+    sessions = None
     try:
         from models.database import get_db
         from models.models import User, Game, UserWishlist
         from providers.deku_deals_provider import DekuDealsProvider
 
-        db = next(get_db())
+        sessions = get_db()
+        db = next(sessions)
 
         # Create test user
         test_user_id = 999999999
@@ -130,14 +132,20 @@ def test_add_game():
     except Exception as e:
         print(f"❌ Add game test failed: {e}")
         return False
+    finally:
+        # Return the connection; the SQLite write engine has only one
+        if sessions is not None:
+            sessions.close()
 
 def test_remove_game():
     """Test removing a game from wishlist"""
+    sessions = None
     try:
         from models.database import get_db
         from models.models import User, Game, UserWishlist
 
-        db = next(get_db())
+        sessions = get_db()
+        db = next(sessions)
 
         # Use test user
         test_user_id = 999999999
@@ -167,6 +175,10 @@ def test_remove_game():
     except Exception as e:
         print(f"❌ Remove game test failed: {e}")
         return False
+    finally:
+        # Return the connection; the SQLite write engine has only one
+        if sessions is not None:
+            sessions.close()
 
 def main():
     """Run all tests"""
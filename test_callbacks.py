@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for the wishlist and settings callback flows, called the way aiogram injects middleware data (no network needed)
+"""
+
+import asyncio
+import threading
+
+from aiogram.dispatcher.event.handler import HandlerObject
+from sqlalchemy import event
+
+from bot.handlers import queries
+from bot.handlers.callbacks import (
+    process_wishlist_do_remove, process_wishlist_cancel_remove, process_region_change
+)
+from models.models import User, Game, UserWishlist
+
+
+class FakeMessage:
+    def __init__(self):
+        self.edits = []
+
+    async def edit_text(self, text, reply_markup=None, parse_mode=None):
+        self.edits.append(text)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeCallbackQuery:
+    def __init__(self, user_id, data):
+        self.from_user = FakeUser(user_id)
+        self.data = data
+        self.message = FakeMessage()
+        self.answers = []
+
+    async def answer(self, text=None, **kwargs):
+        self.answers.append(text)
+
+
+def seed(db):
+    user = User(telegram_id=42)
+    games = [Game(source_id="zelda", title="Zelda"), Game(source_id="mario", title="Mario")]
+    db.add(user)
+    db.add_all(games)
+    db.flush()
+    db.add_all([UserWishlist(user_id=user.id, game_id=game.id) for game in games])
+    db.commit()
+
+
+def run_callback(handler, data, db):
+    """Call the handler with the same keyword data the dispatcher and DbSessionMiddleware provide"""
+    callback_query = FakeCallbackQuery(42, data)
+    asyncio.run(HandlerObject(handler).call(callback_query, db=db, state=None, bot=None))
+    return callback_query
+
+
+def test_remove_refreshes_wishlist(db):
+    seed(db)
+    callback_query = run_callback(process_wishlist_do_remove, "wishlist_do_remove_0", db)
+    assert callback_query.answers[0] == "✅ Game removed from wishlist!"
+    assert db.query(UserWishlist).count() == 1
+    assert "Mario" in callback_query.message.edits[-1]
+    assert "Zelda" not in callback_query.message.edits[-1]
+
+
+def test_cancel_remove_refreshes_wishlist(db):
+    seed(db)
+    callback_query = run_callback(process_wishlist_cancel_remove, "wishlist_cancel_remove_0", db)
+    assert callback_query.answers[0] == "❌ Removal cancelled"
+    assert db.query(UserWishlist).count() == 2
+    assert "Zelda" in callback_query.message.edits[-1]
+
+
+def test_region_change_refreshes_settings(db):
+    seed(db)
+    callback_query = run_callback(process_region_change, "region_eu", db)
+    assert db.query(User).one().region == "eu"
+    assert "Current region: EU" in callback_query.message.edits[-1]
+
+
+def test_queries_run_off_the_event_loop(db):
+    """No handler statement runs on the loop's thread, so a slow database can't stall other updates"""
+    seed(db)
+    threads = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: threads.append(threading.get_ident()))
+    for handler, data in ((process_wishlist_do_remove, "wishlist_do_remove_0"),
+                          (process_wishlist_cancel_remove, "wishlist_cancel_remove_0"),
+                          (process_region_change, "region_jp")):
+        run_callback(handler, data, db)
+    assert threads
+    assert threading.get_ident() not in threads
+
+
+def search_result(game_id, price=19.99):
+    return {'id': game_id, 'title': game_id.title(), 'platform': 'Nintendo Switch', 'current_price': price,
+            'original_price': 39.99, 'discount_percent': 50}
+
+
+def test_add_to_wishlist_per_currency(db):
+    """Games are looked up per currency and prices are stored in exact cents"""
+    seed(db)
+    user = db.query(User).one()
+    assert queries.add_to_wishlist(db, user.id, search_result("zelda"), "EUR")
+    assert not queries.add_to_wishlist(db, user.id, search_result("zelda"), "EUR")
+    game = db.query(Game).filter(Game.source_id == "zelda", Game.currency == "EUR").one()
+    assert (game.last_price_cents, game.original_price_cents) == (1999, 3999)
+    assert db.query(UserWishlist).filter(UserWishlist.game_id == game.id).count() == 1
+
+    assert queries.set_threshold(db, user.id, 2, 19.99) == ("Zelda", "EUR")
+    assert db.query(UserWishlist).filter(UserWishlist.game_id == game.id).one().desired_price_cents == 1999
+
+
+def test_add_to_wishlist_races(db):
+    """A concurrent insert that wins the unique index is resolved instead of raising"""
+    seed(db)
+    user = db.query(User).one()
+    original_find, original_wishlisted = queries._find_game, queries._is_wishlisted
+    try:
+        # Another user created the game between our lookup and our insert
+        db.add(Game(source_id="kirby", title="Kirby", currency="USD"))
+        db.commit()
+        stale = [None]
+        queries._find_game = lambda *args: stale.pop() if stale else original_find(*args)
+        assert queries.add_to_wishlist(db, user.id, search_result("kirby"), "USD")
+        assert db.query(Game).filter(Game.source_id == "kirby").count() == 1
+
+        # A double-tapped button: both taps see no wishlist row, the second insert loses
+        queries._is_wishlisted = lambda *args: False
+        assert not queries.add_to_wishlist(db, user.id, search_result("kirby"), "USD")
+        assert db.query(UserWishlist).count() == 3
+    finally:
+        queries._find_game, queries._is_wishlisted = original_find, original_wishlisted
+
+
+if __name__ == "__main__":
+    from conftest import run
+
+    for test in (test_remove_refreshes_wishlist, test_cancel_remove_refreshes_wishlist,
+                 test_region_change_refreshes_settings, test_queries_run_off_the_event_loop,
+                 test_add_to_wishlist_per_currency, test_add_to_wishlist_races):
+        run(test)
+        print(f"✅ {test.__name__}")
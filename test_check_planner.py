@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for adaptive per-game check scheduling (in-memory database, no network needed)
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from bot.core.check_planner import (
+    CheckPlanner, allocate_intervals, in_sale_window, parse_sale_windows, priority_score, DAY_SECONDS
+)
+from models.models import User, Game, UserWishlist, PriceHistory, GameCheckSchedule
+
+
+def test_priority_score_signals():
+    """Wishlists, volatility, proximity to target and sales all raise the score"""
+    base = priority_score(1, 0, 5000, None)
+    assert priority_score(50, 0, 5000, None) > base
+    assert priority_score(1, 4, 5000, None) > base
+    assert priority_score(1, 0, 5000, 4800) > priority_score(1, 0, 5000, 1000) >= base
+    assert priority_score(1, 0, 5000, None, on_sale=True) > base
+    assert priority_score(1, 0, 5000, None, sale_window=True) > base
+
+
+def test_allocation_respects_budget_and_bounds():
+    """Intervals follow the scores, stay within bounds and spend about the same budget"""
+    scores = {1: 20.0, 2: 1.0, 3: 1.0, 4: 0.1}
+    budget = len(scores) * 2
+    intervals = allocate_intervals(scores, budget, min_interval=3600, max_interval=3 * DAY_SECONDS)
+
+    assert intervals[1] < intervals[2] == intervals[3] < intervals[4]
+    assert all(3600 <= interval <= 3 * DAY_SECONDS for interval in intervals.values())
+    spent = sum(DAY_SECONDS / interval for interval in intervals.values())
+    assert abs(spent - budget) < 0.1
+
+
+def test_sale_windows_wrap_new_year():
+    """Recurring sale windows may span the new year"""
+    windows = parse_sale_windows("11-20:11-30, 12-20:01-05, bogus")
+    assert len(windows) == 2
+    assert in_sale_window(datetime(2026, 11, 25), windows)
+    assert in_sale_window(datetime(2027, 1, 2), windows)
+    assert not in_sale_window(datetime(2026, 12, 5), windows)
+
+
+def test_plan_spreads_checks_and_prioritises_hot_games(db):
+    """Hot games get shorter intervals and overdue games are spread instead of all due at once"""
+    now = datetime(2026, 6, 1, 12, 0)
+
+    users = [User(telegram_id=i) for i in range(5)]
+    hot = Game(source_id="hot", title="Hot", last_price_cents=2000, discount_percent=50,
+               last_checked=now - timedelta(days=2))
+    dead = Game(source_id="dead", title="Dead", last_price_cents=6000, last_checked=now - timedelta(days=2))
+    fresh = Game(source_id="fresh", title="Fresh")
+    db.add_all(users + [hot, dead, fresh])
+    db.flush()
+
+    for user in users:
+        db.add(UserWishlist(user_id=user.id, game_id=hot.id, desired_price_cents=1900))
+    db.add(UserWishlist(user_id=users[0].id, game_id=dead.id))
+    db.add(UserWishlist(user_id=users[0].id, game_id=fresh.id))
+    for days, price in ((20, 4000), (10, 3000), (1, 2000)):
+        db.add(PriceHistory(game_id=hot.id, price_cents=price, currency="USD",
+                            recorded_at=now - timedelta(days=days)))
+    db.commit()
+
+    planner = CheckPlanner(checks_per_game_per_day=2, min_interval=3600, max_interval=3 * DAY_SECONDS)
+    summary = planner.plan(db, now)
+    assert summary['games'] == 3
+
+    schedule = {row.game_id: row for row in db.query(GameCheckSchedule).all()}
+    assert schedule[hot.id].interval_seconds < schedule[dead.id].interval_seconds
+    assert schedule[hot.id].next_check_at > now and schedule[dead.id].next_check_at > now
+    assert schedule[fresh.id].next_check_at == now
+
+    due = planner.due_games(db, now + timedelta(days=3))
+    assert {game.id for game in due} == {hot.id, dead.id, fresh.id}
+
+    planner.mark_checked(db, [hot.id], now)
+    db.commit()
+    assert schedule[hot.id].next_check_at == now + timedelta(seconds=schedule[hot.id].interval_seconds)
+
+    # Games removed from every wishlist drop out of the schedule
+    db.query(UserWishlist).filter(UserWishlist.game_id == dead.id).delete()
+    db.commit()
+    planner.plan(db, now)
+    assert db.query(GameCheckSchedule).filter(GameCheckSchedule.game_id == dead.id).count() == 0
+
+
+def test_id_lists_are_chunked(db):
+    """Per-game lookups use bounded IN lists however many games are wishlisted"""
+    now = datetime(2026, 6, 1, 12, 0)
+    user = User(telegram_id=1)
+    games = [Game(source_id=f"game-{i}", title=f"Game {i}", last_checked=now) for i in range(5)]
+    db.add_all([user] + games)
+    db.flush()
+    db.add_all([UserWishlist(user_id=user.id, game_id=game.id) for game in games])
+    db.commit()
+
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, sql, params, *args: statements.append((sql, params)))
+    planner = CheckPlanner(chunk_size=2)
+    assert planner.plan(db, now)['games'] == 5
+    planner.mark_checked(db, [game.id for game in games], now + timedelta(days=10))
+    db.commit()
+
+    in_lists = [params for sql, params in statements if " IN (" in sql]
+    assert len(in_lists) == 6 and all(len(params) <= 2 for params in in_lists)
+    assert all(row.next_check_at > now + timedelta(days=10) for row in db.query(GameCheckSchedule))
+
+
+if __name__ == "__main__":
+    from conftest import run
+
+    for test in (test_priority_score_signals, test_allocation_respects_budget_and_bounds,
+                 test_sale_windows_wrap_new_year, test_plan_spreads_checks_and_prioritises_hot_games,
+                 test_id_lists_are_chunked):
+        run(test)
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for NumPy deal ranking (in-memory database, no network needed)
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from bot.core.deal_ranker import DealRanker, score_deals
+from bot.core.price_stats import PriceStatsService
+from models.models import Game, User, UserWishlist, PriceHistory, DealRanking
+
+
+def add_game(db, source_id, price, original, currency="USD", discount=0):
+    game = Game(source_id=source_id, title=source_id.title(), last_price_cents=price,
+                original_price_cents=original, discount_percent=discount, currency=currency)
+    db.add(game)
+    db.commit()
+    return game.id
+
+
+def test_score_ordering():
+    """Deeper discounts, prices at the all-time low and popular games score higher"""
+    price = np.array([3000, 4500, 3000, 3000])
+    regular = np.array([6000, 6000, 6000, 6000])
+    low = np.array([3000, 3000, 1500, 3000])
+    wishlists = np.array([0, 0, 0, 10])
+    score, discount, on_sale = score_deals(price, regular, np.zeros(4), low, wishlists)
+
+    assert score[0] > score[1]  # -50% beats -25%
+    assert score[0] > score[2]  # at the all-time low beats 2x above it
+    assert score[3] > score[0]  # same deal, more wishlists
+    assert np.allclose(discount, [0.5, 0.25, 0.5, 0.5]) and on_sale.all()
+
+
+def test_rank_per_currency_and_skip_full_price(db):
+    """Each currency gets its own ranks; full-price games are left out"""
+    deep = add_game(db, "deep", 1500, 6000)
+    shallow = add_game(db, "shallow", 5000, 6000)
+    add_game(db, "full", 6000, 6000)
+    euro = add_game(db, "euro", 2000, 4000, currency="EUR")
+
+    rows = DealRanker().rank(DealRanker().load_arrays(db))
+    ranked = {(row['currency'], row['rank']): row['game_id'] for row in rows}
+    assert ranked == {('USD', 1): deep, ('USD', 2): shallow, ('EUR', 1): euro}
+
+
+def test_all_time_low_from_stats_or_history(db):
+    """The ATL comes from price_stats, or from the raw history when stats are missing"""
+    with_stats = add_game(db, "stats", 3000, 6000)
+    with_history = add_game(db, "history", 3000, 6000)
+    PriceStatsService().update_many(db, [{'game_id': with_stats, 'price_cents': 2500, 'currency': 'USD',
+                                          'observed_at': datetime(2026, 1, 1)}])
+    db.add(PriceHistory(game_id=with_history, price_cents=2000, currency='USD'))
+    db.commit()
+
+    arrays = DealRanker().load_arrays(db)
+    lows = dict(zip(arrays['game_id'].tolist(), arrays['all_time_low'].tolist()))
+    assert lows == {with_stats: 2500, with_history: 2000}
+
+
+def test_refresh_replaces_rankings_and_top(db):
+    """A refresh rewrites the table; top() reads it back in rank order"""
+    popular = add_game(db, "popular", 3000, 6000)
+    add_game(db, "other", 3000, 6000)
+    for telegram_id in (1, 2):
+        user = User(telegram_id=telegram_id)
+        db.add(user)
+        db.flush()
+        db.add(UserWishlist(user_id=user.id, game_id=popular))
+    db.commit()
+
+    ranker = DealRanker(ranking_size=1)
+    assert ranker.refresh_due()
+    assert ranker.refresh(db) == 1
+    assert ranker.refresh(db) == 1
+    assert not ranker.refresh_due()
+    assert db.query(DealRanking).count() == 1
+
+    (ranking, game), = ranker.top(db, "USD")
+    assert game.id == popular and ranking.wishlist_count == 2 and ranking.discount_percent == 50
+    assert ranker.top(db, "JPY") == []
+
+
+if __name__ == "__main__":
+    from conftest import run
+
+    for test in (test_score_ordering, test_rank_per_currency_and_skip_full_price,
+                 test_all_time_low_from_stats_or_history, test_refresh_replaces_rankings_and_top):
+        run(test)
+        print(f"✅ {test.__name__}")
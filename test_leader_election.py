@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Tests for the scheduler leader lease and the webhook endpoint (no network needed)
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault('BOT_TOKEN', '123456:test-token')
+
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from bot.core.leader_election import LeaderElection
+from models.database import make_engine
+
+
+def make_sessions(tmp):
+    engine = make_engine(f"sqlite:///{os.path.join(tmp, 'lease.db')}")
+    return sessionmaker(bind=engine)
+
+
+def test_single_leader():
+    """Only one worker holds the lease; it renews it and hands it over on release"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = make_sessions(tmp)
+        first = LeaderElection(session_factory=sessions, holder='worker-1')
+        second = LeaderElection(session_factory=sessions, holder='worker-2')
+
+        assert first.try_acquire()
+        assert not second.try_acquire()
+        assert first.try_acquire()  # renewal
+        assert not second.try_acquire()
+
+        first.release()
+        assert not first.is_leader
+        assert second.try_acquire()
+        assert not first.try_acquire()
+
+
+def test_expired_lease_taken_over():
+    """A leader that stops renewing is replaced once its lease expires"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = make_sessions(tmp)
+        crashed = LeaderElection(session_factory=sessions, ttl=0.05, holder='worker-1')
+        standby = LeaderElection(session_factory=sessions, ttl=0.05, holder='worker-2')
+
+        assert crashed.try_acquire()
+        assert not standby.try_acquire()
+        time.sleep(0.06)
+        assert standby.try_acquire()
+        assert not crashed.try_acquire()
+
+
+def test_run_reports_leadership_changes():
+    """run() calls on_elected once when the lease is won and on_deposed when it is lost"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = make_sessions(tmp)
+        election = LeaderElection(session_factory=sessions, ttl=0.03, holder='worker-1')
+        rival = LeaderElection(session_factory=sessions, ttl=10, holder='worker-2')
+        events = []
+
+        async def on_elected():
+            events.append('elected')
+
+        async def on_deposed():
+            events.append('deposed')
+
+        async def scenario():
+            task = asyncio.create_task(election.run(on_elected, on_deposed))
+            await asyncio.sleep(0.05)
+            # Simulate the lease being lost, e.g. the database was unreachable past the TTL
+            election.release()
+            assert rival.try_acquire()
+            await asyncio.sleep(0.05)
+            task.cancel()
+
+        asyncio.run(scenario())
+        assert events == ['elected', 'deposed']
+
+
+def test_workers_wait_for_the_leaders_migrations():
+    """A worker starts serving only once schema_migrations is current, whoever applies the migrations"""
+    import main
+    from models.migrations import migrate
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'schema.db')}")
+
+        async def scenario():
+            waiting = asyncio.create_task(main.wait_for_schema(engine, poll=0.01))
+            await asyncio.sleep(0.05)
+            assert not waiting.done()
+            # The leader's migration runs in a worker thread, so the waiting task keeps polling meanwhile
+            await asyncio.to_thread(migrate, engine)
+            await asyncio.wait_for(waiting, 1)
+
+        asyncio.run(scenario())
+
+
+def webhook_request(payload: dict, secret: str) -> Request:
+    body = json.dumps(payload).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    headers = [(b"content-type", b"application/json"), (b"x-telegram-bot-api-secret-token", secret.encode())]
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers}, receive)
+
+
+def test_webhook_checks_secret_and_feeds_update():
+    """Updates are only accepted with Telegram's secret header and go straight to the dispatcher"""
+    import main
+    import bot.bot
+
+    fed = []
+
+    async def feed(payload):
+        fed.append(payload)
+
+    original_mode, original_feed = main.BOT_MODE, bot.bot.feed_webhook_update
+    main.BOT_MODE, bot.bot.feed_webhook_update = "webhook", feed
+    try:
+        update = {"update_id": 1}
+        try:
+            asyncio.run(main.telegram_webhook(webhook_request(update, "wrong")))
+            assert False, "expected 403"
+        except HTTPException as e:
+            assert e.status_code == 403
+        assert fed == []
+
+        assert asyncio.run(main.telegram_webhook(webhook_request(update, main.WEBHOOK_SECRET))) == {"ok": True}
+        assert fed == [update]
+    finally:
+        main.BOT_MODE, bot.bot.feed_webhook_update = original_mode, original_feed
+
+
+if __name__ == "__main__":
+    for test in (test_single_leader, test_expired_lease_taken_over, test_run_reports_leadership_changes,
+                 test_workers_wait_for_the_leaders_migrations, test_webhook_checks_secret_and_feeds_update):
+        test()
+        print(f"✅ {test.__name__}")
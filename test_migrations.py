@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the versioned migration runner (in-memory databases, no network needed)
+"""
+
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.migrations import MIGRATIONS, Migration, is_current, migrate, pending_backfills, run_backfills
+from models.models import SchemaMigration
+
+# Schema as created by create_all before migrations existed: no last_seen_at, no extra indexes
+LEGACY_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id INTEGER NOT NULL UNIQUE, telegram_username VARCHAR,
+                    region VARCHAR, created_at TIMESTAMP);
+CREATE TABLE games (id INTEGER PRIMARY KEY, source_id VARCHAR NOT NULL, title VARCHAR NOT NULL, platform VARCHAR,
+                    last_checked TIMESTAMP, last_price_cents INTEGER, original_price_cents INTEGER,
+                    discount_percent INTEGER, currency VARCHAR);
+CREATE TABLE user_wishlist (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, game_id INTEGER NOT NULL,
+                            desired_price_cents INTEGER, min_discount_percent INTEGER,
+                            last_notified_price_cents INTEGER, created_at TIMESTAMP);
+CREATE TABLE price_history (id INTEGER PRIMARY KEY, game_id INTEGER NOT NULL, price_cents INTEGER NOT NULL,
+                            currency VARCHAR NOT NULL, recorded_at TIMESTAMP);
+"""
+
+
+def make_engine():
+    return create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+
+
+def test_fresh_database_then_no_ddl():
+    """A new database gets every migration once; later starts run no DDL"""
+    engine = make_engine()
+    assert migrate(engine) == len(MIGRATIONS)
+    tables = set(inspect(engine).get_table_names())
+    assert {"users", "games", "price_stats", "deal_rankings", "schema_migrations"} <= tables
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert migrate(engine) == 0
+    assert statements and all(sql.lstrip().upper().startswith(("SELECT", "PRAGMA")) for sql in statements)
+
+
+def test_legacy_database_upgrade_and_backfills():
+    """An old create_all database gets the new column, indexes and data, with backfills in batches"""
+    engine = make_engine()
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA.split(";"):
+            if statement.strip():
+                conn.execute(text(statement))
+        conn.execute(text("INSERT INTO games (id, source_id, title, currency) VALUES "
+                          "(1, 'zelda', 'Zelda', 'USD'), (2, 'zelda', 'Zelda', 'USD'), (3, 'mario', 'Mario', 'USD')"))
+        for i in range(5):
+            conn.execute(text("INSERT INTO price_history (game_id, price_cents, currency, recorded_at) "
+                              "VALUES (:game, :price, 'USD', :at)"),
+                         {"game": 3 if i % 2 else 2, "price": 3000 + i, "at": datetime(2026, 1, i + 1)})
+
+    assert migrate(engine) == len(MIGRATIONS)
+    columns = {c["name"] for c in inspect(engine).get_columns("price_history")}
+    assert "last_seen_at" in columns
+    assert "uq_games_source_currency" in {i["name"] for i in inspect(engine).get_indexes("games")}
+    assert len(pending_backfills(engine)) == 3
+
+    sessions = sessionmaker(bind=engine)
+    assert run_backfills(sessions, batch_size=2) >= 3
+    assert pending_backfills(engine) == []
+    assert run_backfills(sessions) == 0
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM price_history WHERE last_seen_at IS NULL")).scalar() == 0
+        assert conn.execute(text("SELECT COUNT(*) FROM games")).scalar() == 2
+        assert sorted(conn.execute(text("SELECT game_id FROM price_stats")).scalars()) == [1, 3]
+        assert conn.execute(text("SELECT COUNT(*) FROM price_stats WHERE average_cents IS NULL")).scalar() == 0
+
+
+def test_failed_backfill_resumes_from_cursor():
+    """A backfill that fails keeps its committed progress and continues on the next run"""
+    engine = make_engine()
+    seen = []
+
+    def flaky(db, after, batch_size):
+        if after == 2 and not seen.count("failed"):
+            seen.append("failed")
+            raise RuntimeError("boom")
+        seen.append(after)
+        return after + 1 if after < 4 else None
+
+    migrations = [Migration(1, "flaky", lambda conn: None, flaky)]
+    migrate(engine, migrations)
+    sessions = sessionmaker(bind=engine)
+    assert run_backfills(sessions, migrations) == 2
+    assert run_backfills(sessions, migrations) == 2
+    assert seen == [0, 1, "failed", 2, 3, 4]
+    with sessions() as db:
+        assert db.get(SchemaMigration, 1).backfilled_at is not None
+
+
+def test_one_migrator_at_a_time():
+    """migrate() waits while another process holds the migration lease, then applies what is still pending"""
+    from bot.core.leader_election import LeaderElection
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'lock.db')}")
+        holder = LeaderElection('migrations', session_factory=sessionmaker(bind=engine), holder='fetcher')
+        assert holder.try_acquire()
+
+        result = []
+        waiting = threading.Thread(target=lambda: result.append(migrate(engine, lock_poll=0.01)))
+        waiting.start()
+        time.sleep(0.1)
+        assert waiting.is_alive() and not is_current(engine)
+
+        holder.release()
+        waiting.join(5)
+        assert result == [len(MIGRATIONS)] and is_current(engine)
+
+
+if __name__ == "__main__":
+    for test in (test_fresh_database_then_no_ddl, test_legacy_database_upgrade_and_backfills,
+                 test_failed_backfill_resumes_from_cursor, test_one_migrator_at_a_time):
+        test()
+        print(f"✅ {test.__name__}")
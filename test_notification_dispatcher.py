@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Tests for the notification outbox and its rate-limited dispatcher (fake bot, no network needed)
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+from sqlalchemy.orm import sessionmaker
+
+from bot.core.notification_dispatcher import NotificationDispatcher, enqueue_notifications
+from models.database import make_engine
+from models.migrations import migrate
+from models.models import User, NotificationOutbox
+
+
+class FakeBot:
+    """Records sends; `errors` maps chat id to exceptions raised on the next sends to that chat"""
+
+    def __init__(self, delay: float = 0.0, errors=None):
+        self.delay = delay
+        self.errors = errors or {}
+        self.sent = []
+        self.times = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.errors.get(chat_id):
+                raise self.errors[chat_id].pop(0)
+            self.sent.append((chat_id, text))
+            self.times.append(time.monotonic())
+        finally:
+            self.in_flight -= 1
+
+
+def make_outbox(tmp, chats):
+    """A migrated database with one user per chat; returns the session factory"""
+    engine = make_engine(f"sqlite:///{os.path.join(tmp, 'outbox.db')}")
+    migrate(engine)
+    sessions = sessionmaker(bind=engine)
+    db = sessions()
+    users = {chat: User(telegram_id=chat) for chat in set(chats)}
+    db.add_all(users.values())
+    db.flush()
+    enqueue_notifications(db, [
+        {'user_id': users[chat].id, 'telegram_id': chat, 'text': f"alert {i}", 'dedupe_key': f"test:{i}"}
+        for i, chat in enumerate(chats)
+    ])
+    db.commit()
+    db.close()
+    return sessions
+
+
+def statuses(sessions):
+    db = sessions()
+    try:
+        return [row.status for row in db.query(NotificationOutbox).order_by(NotificationOutbox.id)]
+    finally:
+        db.close()
+
+
+def telegram_error(error_class, **kwargs):
+    return error_class(method=SendMessage(chat_id=1, text="x"), message="test", **kwargs)
+
+
+def test_delivers_once_and_dedupes():
+    """Everything is sent concurrently once; queued keys are not queued again and sent rows stay sent"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = make_outbox(tmp, list(range(1, 11)))
+        bot = FakeBot(delay=0.02)
+        dispatcher = NotificationDispatcher(sessions, concurrency=5, global_rate=0, chat_rate=0)
+
+        assert asyncio.run(dispatcher.drain(bot)) == 10
+        assert sorted(chat for chat, _ in bot.sent) == list(range(1, 11))
+        assert bot.max_in_flight == 5
+        assert statuses(sessions) == ['sent'] * 10
+
+        db = sessions()
+        user_id = db.query(User.id).first()[0]
+        assert enqueue_notifications(db, [
+            {'user_id': user_id, 'telegram_id': 1, 'text': "again", 'dedupe_key': "test:0"},
+            {'user_id': user_id, 'telegram_id': 1, 'text': "new", 'dedupe_key': "test:new"},
+            {'user_id': user_id, 'telegram_id': 1, 'text': "new", 'dedupe_key': "test:new"},
+        ]) == 1
+        db.commit()
+        db.close()
+        assert asyncio.run(dispatcher.drain(bot)) == 1
+        assert len(bot.sent) == 11
+
+
+def test_rate_limits():
+    """Sends to one chat are spaced by the per-chat rate and the total by the global rate"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = make_outbox(tmp, [1, 1, 1])
+        bot = FakeBot()
+        asyncio.run(NotificationDispatcher(sessions, global_rate=0, chat_rate=10).drain(bot))
+        assert len(bot.times) == 3
+        assert bot.times[-1] - bot.times[0] >= 0.18
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = make_outbox(tmp, [1, 2, 3, 4, 5])
+        bot = FakeBot()
+        asyncio.run(NotificationDispatcher(sessions, global_rate=20, chat_rate=0).drain(bot))
+        assert bot.times[-1] - bot.times[0] >= 0.18
+
+
+def test_busy_chat_does_not_hold_back_others():
+    """Messages to other chats go out while one chat works through its per-chat rate; idle limiters are dropped"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = make_outbox(tmp, [1] * 5 + [2, 3])
+        bot = FakeBot()
+        dispatcher = NotificationDispatcher(sessions, concurrency=2, global_rate=0, chat_rate=10)
+
+        asyncio.run(dispatcher.drain(bot))
+        assert [chat for chat, _ in bot.sent[:3]] == [1, 2, 3]
+        assert len(bot.sent) == 7
+        assert set(dispatcher._chat_limiters) == {1, 2, 3}
+
+        time.sleep(0.15)
+        asyncio.run(dispatcher.drain(bot))
+        assert dispatcher._chat_limiters == {}
+
+
+def test_retry_after_pauses_and_redelivers():
+    """A 429 pauses all sends for retry_after and the message goes out on a later drain"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = make_outbox(tmp, [1, 2])
+        bot = FakeBot(errors={1: [telegram_error(TelegramRetryAfter, retry_after=1)]})
+        dispatcher = NotificationDispatcher(sessions, concurrency=1, global_rate=0, chat_rate=0)
+
+        start = time.monotonic()
+        asyncio.run(dispatcher.drain(bot))
+        assert time.monotonic() - start >= 0.9  # chat 2 waited for the pause
+        assert bot.sent[0] == (2, "alert 1")
+        assert dispatcher.stats['rate_limited'] == 1
+
+        # The retried message is due again once the pause is over
+        time.sleep(1.1)
+        asyncio.run(dispatcher.drain(bot))
+        assert bot.sent == [(2, "alert 1"), (1, "alert 0")]
+        assert statuses(sessions) == ['sent', 'sent']
+
+
+def test_failures():
+    """Blocked chats fail at once; other errors are retried later and give up after max attempts"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = make_outbox(tmp, [1, 2])
+        bot = FakeBot(errors={1: [telegram_error(TelegramForbiddenError)], 2: [ConnectionError("reset")] * 2})
+        dispatcher = NotificationDispatcher(sessions, global_rate=0, chat_rate=0, max_attempts=2)
+
+        assert asyncio.run(dispatcher.drain(bot)) == 0
+        assert statuses(sessions) == ['failed', 'pending']
+        db = sessions()
+        retry = db.query(NotificationOutbox).filter(NotificationOutbox.telegram_id == 2).one()
+        assert retry.attempts == 1 and retry.next_attempt_at > datetime.utcnow()
+        retry.next_attempt_at = datetime.utcnow()
+        db.commit()
+        db.close()
+
+        assert asyncio.run(dispatcher.drain(bot)) == 0
+        assert statuses(sessions) == ['failed', 'failed']
+        assert bot.sent == []
+
+
+def test_stale_claim_is_resent_after_restart():
+    """A message claimed by a dispatcher that died mid-send is picked up again, a fresh claim is not"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sessions = make_outbox(tmp, [1, 2])
+        db = sessions()
+        rows = db.query(NotificationOutbox).order_by(NotificationOutbox.id).all()
+        rows[0].status, rows[0].claimed_at = 'sending', datetime.utcnow() - timedelta(minutes=10)
+        rows[1].status, rows[1].claimed_at = 'sending', datetime.utcnow()
+        db.commit()
+        db.close()
+
+        bot = FakeBot()
+        assert asyncio.run(NotificationDispatcher(sessions, global_rate=0, chat_rate=0).drain(bot)) == 1
+        assert bot.sent == [(1, "alert 0")]
+        assert statuses(sessions) == ['sent', 'sending']
+
+
+if __name__ == "__main__":
+    for test in (test_delivers_once_and_dedupes, test_rate_limits, test_busy_chat_does_not_hold_back_others,
+                 test_retry_after_pauses_and_redelivers, test_failures, test_stale_claim_is_resent_after_restart):
+        test()
+        print(f"✅ {test.__name__}")
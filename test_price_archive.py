@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar price history archive (in-memory database, temporary directory)
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from bot.core.price_archive import PriceArchive, decode_rows, encode_rows
+from bot.core.price_history import get_price_intervals
+from models.models import Game, PriceHistory
+from models.schema import merge_duplicate_games
+
+
+def test_encoding_round_trip_is_compact():
+    """Rows survive encoding, and a long daily history takes only a few bytes per row"""
+    start = datetime(2025, 1, 1, 9)
+    rows = [{
+        'price_cents': 5999 if day % 30 < 25 else 2999,
+        'currency': 'EUR' if day % 2 else 'USD',
+        'recorded_at': start + timedelta(days=day),
+        'last_seen_at': start + timedelta(days=day, hours=12) if day % 7 else None
+    } for day in range(365)]
+
+    data = encode_rows(rows)
+    assert decode_rows(data) == rows
+    assert len(data) < 365 * 4
+
+
+def test_old_rows_move_to_archive_and_reads_merge(db):
+    """Old rows leave the table, the newest row per game stays, and readers see the full history"""
+    game = Game(source_id="zelda", title="Zelda")
+    db.add(game)
+    db.flush()
+    now = datetime(2026, 6, 1)
+    for days_ago, price in ((200, 5999), (150, 3999), (120, 5999), (100, 4999), (10, 2999)):
+        db.add(PriceHistory(game_id=game.id, price_cents=price, currency="USD",
+                            recorded_at=now - timedelta(days=days_ago),
+                            last_seen_at=now - timedelta(days=days_ago - 1)))
+    # A game whose only row is old keeps that row
+    quiet = Game(source_id="quiet", title="Quiet")
+    db.add(quiet)
+    db.flush()
+    db.add(PriceHistory(game_id=quiet.id, price_cents=999, currency="USD", recorded_at=now - timedelta(days=300)))
+    db.commit()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = PriceArchive(tmp)
+        before = get_price_intervals(db, game.id, archive=archive)
+
+        summary = archive.archive_old_rows(db, older_than_days=90, now=now)
+        assert summary == {'games': 1, 'rows': 4, 'cutoff': now - timedelta(days=90)}
+        assert db.query(PriceHistory).filter(PriceHistory.game_id == game.id).count() == 1
+        assert db.query(PriceHistory).filter(PriceHistory.game_id == quiet.id).count() == 1
+        assert os.listdir(tmp) == [f"{game.id}.pha"]
+
+        assert get_price_intervals(db, game.id, archive=archive) == before
+        recent = get_price_intervals(db, game.id, since=now - timedelta(days=110), archive=archive)
+        assert [i['price_cents'] for i in recent] == [5999, 4999, 2999]
+
+        # Running again (e.g. after an interrupted run) does not duplicate archived rows
+        archive.append(game.id, archive.read(game.id))
+        assert len(archive.read(game.id)) == 4
+
+
+def test_merged_duplicate_keeps_archived_history(db):
+    """Merging a duplicate game moves its archive file along with its live rows"""
+    db.execute(text("DROP INDEX uq_games_source_currency"))
+    keep, duplicate = Game(source_id="zelda", title="Zelda"), Game(source_id="zelda", title="Zelda")
+    db.add_all([keep, duplicate])
+    db.flush()
+    now = datetime(2026, 6, 1)
+    for game, days_ago, price in ((duplicate, 300, 6999), (duplicate, 200, 5999), (keep, 150, 4999),
+                                  (keep, 120, 3999), (duplicate, 100, 2999), (keep, 10, 1999)):
+        db.add(PriceHistory(game_id=game.id, price_cents=price, currency="USD",
+                            recorded_at=now - timedelta(days=days_ago),
+                            last_seen_at=now - timedelta(days=days_ago - 1)))
+    db.commit()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = PriceArchive(tmp)
+        archive.archive_old_rows(db, older_than_days=90, now=now)
+        assert sorted(os.listdir(tmp)) == sorted([f"{keep.id}.pha", f"{duplicate.id}.pha"])
+
+        assert merge_duplicate_games(db.connection(), archive=archive) == 1
+        db.commit()
+        assert os.listdir(tmp) == [f"{keep.id}.pha"]
+        intervals = get_price_intervals(db, keep.id, archive=archive)
+        assert [i['price_cents'] for i in intervals] == [6999, 5999, 4999, 3999, 2999, 1999]
+
+
+if __name__ == "__main__":
+    from conftest import run
+
+    for test in (test_encoding_round_trip_is_compact, test_old_rows_move_to_archive_and_reads_merge,
+                 test_merged_duplicate_keeps_archived_history):
+        run(test)
+        print(f"✅ {test.__name__}")
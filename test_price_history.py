@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for change-only price history storage (in-memory database, no network needed)
+"""
+
+from datetime import datetime, timedelta
+
+from bot.core.price_history import expand_intervals, get_price_intervals, record_prices
+from models.models import Game, PriceHistory
+
+
+def observe(db, game_id, price_cents, when, currency="USD", mode="changes"):
+    result = record_prices(db, [{'game_id': game_id, 'price_cents': price_cents,
+                                 'currency': currency, 'recorded_at': when}], mode)
+    db.commit()
+    return result
+
+
+def test_unchanged_prices_extend_the_last_row(db):
+    """Only changes insert rows; repeats move last_seen_at forward"""
+    game = Game(source_id="zelda", title="Zelda")
+    db.add(game)
+    db.commit()
+    start = datetime(2026, 1, 1, 9)
+
+    assert observe(db, game.id, 5999, start) == (1, 0)
+    for half_days in range(1, 10):
+        assert observe(db, game.id, 5999, start + timedelta(hours=12 * half_days)) == (0, 1)
+    assert observe(db, game.id, 2999, start + timedelta(days=5)) == (1, 0)
+    assert observe(db, game.id, 2999, start + timedelta(days=5), currency="EUR") == (1, 0)
+
+    rows = db.query(PriceHistory).order_by(PriceHistory.id).all()
+    assert len(rows) == 3
+    assert rows[0].last_seen_at == start + timedelta(hours=108)
+
+    # Legacy mode still writes a row per check
+    assert observe(db, game.id, 2999, start + timedelta(days=6), currency="EUR", mode="all") == (1, 0)
+    assert db.query(PriceHistory).count() == 4
+
+
+def test_intervals_expand_to_full_series(db):
+    """The interval view reproduces the price at every point in time"""
+    game = Game(source_id="mario", title="Mario")
+    db.add(game)
+    db.commit()
+    start = datetime(2026, 1, 1)
+
+    for day, price in ((0, 5999), (1, 5999), (2, 5999), (3, 3999), (4, 3999), (5, 5999)):
+        observe(db, game.id, price, start + timedelta(days=day))
+
+    intervals = get_price_intervals(db, game.id)
+    assert [(i['price_cents'], i['valid_from'].day, i['valid_to'].day) for i in intervals] == [
+        (5999, 1, 4), (3999, 4, 6), (5999, 6, 6)
+    ]
+
+    series = list(expand_intervals(intervals, timedelta(days=1)))
+    assert [price for _, price, _ in series] == [5999, 5999, 5999, 3999, 3999, 5999]
+
+    recent = get_price_intervals(db, game.id, since=start + timedelta(days=4))
+    assert [i['price_cents'] for i in recent] == [3999, 5999]
+
+
+def test_legacy_duplicate_rows_are_merged(db):
+    """Rows written one per check before change-only storage read back as one interval"""
+    game = Game(source_id="kirby", title="Kirby")
+    db.add(game)
+    db.flush()
+    start = datetime(2026, 1, 1)
+    for day in range(4):
+        db.add(PriceHistory(game_id=game.id, price_cents=4999, currency="USD",
+                            recorded_at=start + timedelta(days=day)))
+    db.commit()
+
+    intervals = get_price_intervals(db, game.id)
+    assert len(intervals) == 1
+    assert intervals[0]['valid_to'] == start + timedelta(days=3)
+
+
+if __name__ == "__main__":
+    from conftest import run
+
+    for test in (test_unchanged_prices_extend_the_last_row, test_intervals_expand_to_full_series,
+                 test_legacy_duplicate_rows_are_merged):
+        run(test)
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the fetcher / notifier split: sweeps write price events, the bot turns them into alerts
+"""
+
+import asyncio
+import os
+import tempfile
+
+from sqlalchemy.orm import sessionmaker
+
+import bot.scheduler
+from bot.core.notification_dispatcher import NotificationDispatcher
+from bot.core.price_sweeper import PriceSweeper
+from bot.core.price_writer import GameRef
+from bot.scheduler import PriceChecker
+from models.database import make_engine
+from models.migrations import migrate
+from models.models import User, Game, UserWishlist, Notification, PriceEvent
+from providers.base_provider import AsyncPriceProvider
+
+
+class SaleProvider(AsyncPriceProvider):
+    """Every game is on sale for $19.99"""
+
+    async def get_game_info(self, game_id: str, region: str = "us"):
+        return {'id': game_id, 'current_price': 19.99, 'original_price': 59.99,
+                'discount_percent': 67, 'currency': 'USD'}
+
+    async def search_games(self, query: str, region: str = "us"):
+        return []
+
+    async def get_game_infos(self, game_ids, region: str = "us"):
+        return {game_id: await self.get_game_info(game_id, region) for game_id in game_ids}
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append(chat_id)
+
+
+def make_checker(role: str) -> PriceChecker:
+    checker = PriceChecker()
+    checker.role = role
+    checker.sweeper = PriceSweeper(SaleProvider())
+    checker.bot = FakeBot()
+    return checker
+
+
+def test_fetcher_publishes_and_notifier_sends_once():
+    """The fetcher sends nothing itself; the notifier alerts once per event and marks it processed"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'pipeline.db')}")
+        migrate(engine)
+        sessions = sessionmaker(bind=engine)
+        original_sessions = bot.scheduler.SessionLocal
+        bot.scheduler.SessionLocal = sessions
+        try:
+            db = sessions()
+            user = User(telegram_id=42)
+            game = Game(source_id="zelda", title="Zelda", currency="USD", last_price_cents=5999)
+            db.add_all([user, game])
+            db.flush()
+            db.add(UserWishlist(user_id=user.id, game_id=game.id, desired_price_cents=2000))
+            db.commit()
+            ref = GameRef(game.id, game.source_id, game.title, game.currency)
+
+            fetcher = make_checker('fetcher')
+            summary = asyncio.run(fetcher._check_games(db, [ref]))
+            db.commit()
+            assert summary['alerts'] == 0
+            assert fetcher.bot.sent == []
+            event = db.query(PriceEvent).one()
+            assert (event.game_id, event.price_cents, event.processed_at) == (game.id, 1999, None)
+            db.commit()  # release the connection, the notifier writes through the same one-connection engine
+
+            notifier = make_checker('notifier')
+            dispatcher = NotificationDispatcher(sessions)
+            assert asyncio.run(notifier.consume_price_events()) == 1
+            assert asyncio.run(dispatcher.drain(notifier.bot)) == 1
+            assert notifier.bot.sent == [42]
+            db.expire_all()
+            assert db.query(PriceEvent).one().processed_at is not None
+            assert db.query(Notification).count() == 1
+            db.commit()
+
+            # Already processed, and the same price again does not re-alert
+            assert asyncio.run(notifier.consume_price_events()) == 0
+            asyncio.run(fetcher._check_games(db, [ref]))
+            db.commit()
+            assert asyncio.run(notifier.consume_price_events()) == 0
+            assert asyncio.run(dispatcher.drain(notifier.bot)) == 0
+            assert notifier.bot.sent == [42]
+            db.close()
+        finally:
+            bot.scheduler.SessionLocal = original_sessions
+            engine.dispose()
+
+
+def test_inline_role_alerts_without_events():
+    """The default single-process setup still alerts straight from the sweep"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'pipeline.db')}")
+        migrate(engine)
+        db = sessionmaker(bind=engine)()
+        user = User(telegram_id=7)
+        game = Game(source_id="mario", title="Mario", currency="USD")
+        db.add_all([user, game])
+        db.flush()
+        db.add(UserWishlist(user_id=user.id, game_id=game.id, desired_price_cents=2500))
+        db.commit()
+
+        checker = make_checker('all')
+        summary = asyncio.run(checker._check_games(db, [GameRef(game.id, game.source_id, game.title, game.currency)]))
+        db.commit()
+        assert summary['alerts'] == 1
+        assert asyncio.run(NotificationDispatcher(sessionmaker(bind=engine)).drain(checker.bot)) == 1
+        assert checker.bot.sent == [7]
+        assert db.query(PriceEvent).count() == 0
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    for test in (test_fetcher_publishes_and_notifier_sends_once, test_inline_role_alerts_without_events):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for incrementally maintained price statistics (in-memory database, no network needed)
+"""
+
+from datetime import datetime, timedelta
+
+from bot.core.price_stats import PriceStatsService, weighted_average, weighted_median
+from bot.core.price_writer import PriceWriter
+from bot.utils.helpers import format_price_stats
+from models.models import Game
+
+
+def add_game(db):
+    game = Game(source_id="zelda", title="Zelda")
+    db.add(game)
+    db.commit()
+    return game.id
+
+
+def observe(service, db, game_id, price_cents, when, currency="USD"):
+    service.update_many(db, [{'game_id': game_id, 'price_cents': price_cents,
+                              'currency': currency, 'observed_at': when}])
+    db.commit()
+
+
+def test_lows_median_and_sales(db):
+    """ATL, rolling lows, time-weighted median and sale counters follow the observations"""
+    game_id = add_game(db)
+    service = PriceStatsService()
+    start = datetime(2026, 1, 1)
+
+    # 120 days at full price with two sales: -50% on days 10-14, -30% then -40% on days 40-44
+    for day in range(120):
+        if 10 <= day < 15:
+            price = 3000
+        elif 40 <= day < 42:
+            price = 4200
+        elif 42 <= day < 45:
+            price = 3600
+        else:
+            price = 6000
+        observe(service, db, game_id, price, start + timedelta(days=day))
+
+    stats = service.get(db, game_id)
+    assert stats['all_time_low_cents'] == 3000
+    assert stats['low_90d_cents'] == 3600  # the -50% sale is older than 90 days
+    assert stats['low_30d_cents'] == 6000
+    assert stats['median_cents'] == 6000
+    # 119 days are credited: 5 at 3000, 2 at 4200, 3 at 3600 and the rest at 6000
+    assert stats['average_cents'] == round((5 * 3000 + 2 * 4200 + 3 * 3600 + 109 * 6000) / 119)
+    assert stats['regular_price_cents'] == 6000
+    assert stats['sale_count'] == 2
+    assert abs(stats['avg_sale_depth_percent'] - 45) < 0.01
+    assert not stats['on_sale']
+
+    text = format_price_stats(stats, "$")
+    assert "$30.00" in text and "$36.00" in text and "2 sales, typically -45%" in text
+
+
+def test_currency_change_resets_stats(db):
+    """Prices in a new currency start fresh"""
+    game_id = add_game(db)
+    service = PriceStatsService()
+    observe(service, db, game_id, 2000, datetime(2026, 1, 1))
+    observe(service, db, game_id, 700000, datetime(2026, 1, 2), currency="JPY")
+
+    stats = service.get(db, game_id)
+    assert stats['currency'] == "JPY"
+    assert stats['all_time_low_cents'] == 700000
+
+
+def test_weighted_median():
+    assert weighted_median({1000: 10.0, 2000: 30.0}) == 2000
+    assert weighted_median({1000: 30.0, 2000: 10.0}) == 1000
+    assert weighted_median({1500: 0.0}) == 1500
+
+
+def test_weighted_average():
+    assert weighted_average({1000: 10.0, 2000: 30.0}) == 1750
+    assert weighted_average({1500: 0.0}) == 1500
+    assert weighted_average({}) is None
+
+
+def test_sweep_writes_update_stats_and_backfill_matches(db):
+    """The bulk writer keeps stats current, and a backfill from history gives the same lows"""
+    game_id = add_game(db)
+    start = datetime(2026, 3, 1)
+
+    writer = PriceWriter(db, chunk_size=2)
+    for day, price in enumerate((59.99, 59.99, 29.99, 29.99, 59.99)):
+        writer.add(game_id, {'current_price': price, 'original_price': 59.99, 'discount_percent': 0,
+                             'currency': 'USD'}, start + timedelta(days=day))
+    writer.flush()
+
+    service = PriceStatsService()
+    live = service.get(db, game_id)
+    assert (live['all_time_low_cents'], live['sale_count']) == (2999, 1)
+
+    service.rebuild(db, game_id, [
+        {'price_cents': 5999, 'currency': 'USD', 'valid_from': start, 'valid_to': start + timedelta(days=2)},
+        {'price_cents': 2999, 'currency': 'USD', 'valid_from': start + timedelta(days=2),
+         'valid_to': start + timedelta(days=4)},
+        {'price_cents': 5999, 'currency': 'USD', 'valid_from': start + timedelta(days=4),
+         'valid_to': start + timedelta(days=4)},
+    ])
+    db.commit()
+    rebuilt = service.get(db, game_id)
+    assert (rebuilt['all_time_low_cents'], rebuilt['low_30d_cents'], rebuilt['sale_count']) == (2999, 2999, 1)
+
+
+if __name__ == "__main__":
+    from conftest import run
+
+    for test in (test_lows_median_and_sales, test_currency_change_resets_stats, test_weighted_median, test_weighted_average,
+                 test_sweep_writes_update_stats_and_backfill_matches):
+        run(test)
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent price sweep engine (no network needed)
+"""
+
+import asyncio
+import threading
+import time
+
+from bot.core.price_sweeper import PriceSweeper, SweepReport
+from bot.utils.rate_limiter import RateLimiter
+from providers.base_provider import AsyncPriceProvider
+
+
+class SlowProvider:
+    """Fake blocking provider that records how many calls run at once"""
+
+    BASE_URL = "https://example.test"
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get_game_info(self, game_id: str, region: str = "us"):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if game_id == "missing":
+            return None
+        return {'id': game_id, 'current_price': 9.99, 'region': region}
+
+
+class BatchProvider(AsyncPriceProvider):
+    """Fake async provider that records batch calls"""
+
+    def __init__(self):
+        self.batches = []
+
+    async def get_game_info(self, game_id: str, region: str = "us"):
+        return {'id': game_id, 'region': region}
+
+    async def search_games(self, query: str, region: str = "us"):
+        return []
+
+    async def get_game_infos(self, game_ids, region: str = "us"):
+        self.batches.append((region, list(game_ids)))
+        return {game_id: {'id': game_id, 'region': region} for game_id in game_ids if game_id != "missing"}
+
+
+async def _collect(sweeper, targets):
+    return [result async for result in sweeper.sweep(targets)]
+
+
+def test_sweep_limits_concurrency():
+    """Sweep returns every result and never exceeds the configured concurrency"""
+    provider = SlowProvider()
+    sweeper = PriceSweeper(provider, concurrency=4, rate_per_host=0)
+    targets = [(i, f"game-{i}", "us") for i in range(20)] + [("x", "missing", "eu")]
+
+    results = dict(asyncio.run(_collect(sweeper, targets)))
+    sweeper.shutdown()
+
+    assert len(results) == 21
+    assert results["x"] is None
+    assert results[3]['id'] == "game-3"
+    assert provider.max_in_flight == 4
+
+
+def test_sweep_uses_batch_api_for_async_providers():
+    """Async providers get one get_game_infos call per region chunk"""
+    provider = BatchProvider()
+    sweeper = PriceSweeper(provider, batch_size=3)
+    targets = [(i, f"us-{i}", "us") for i in range(5)] + [("jp", "missing", "jp")]
+
+    results = dict(asyncio.run(_collect(sweeper, targets)))
+
+    assert len(results) == 6
+    assert results["jp"] is None
+    assert results[4] == {'id': "us-4", 'region': "us"}
+    assert [len(ids) for _, ids in provider.batches] == [3, 2, 1]
+
+
+def test_sweep_keeps_event_loop_responsive():
+    """Blocking provider calls must not stall other coroutines"""
+    provider = SlowProvider(delay=0.2)
+    sweeper = PriceSweeper(provider, concurrency=2, rate_per_host=0)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.02)
+
+    async def run():
+        await asyncio.gather(_collect(sweeper, [(i, str(i), "us") for i in range(2)]), ticker())
+
+    asyncio.run(run())
+    sweeper.shutdown()
+
+    assert len(ticks) == 5
+    assert ticks[-1] - ticks[0] < 0.2
+
+
+def test_rate_limiter_spacing():
+    """RateLimiter spaces calls by 1/rate seconds"""
+    limiter = RateLimiter(rate=50)
+
+    async def run():
+        start = time.monotonic()
+        for _ in range(6):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    assert elapsed >= 0.09
+
+
+def test_sweep_report():
+    """SweepReport counts results and computes throughput"""
+    report = SweepReport(total=3)
+    report.record(True)
+    report.record(True)
+    report.record(False)
+    summary = report.finish()
+
+    assert summary['fetched'] == 2
+    assert summary['failed'] == 1
+    assert summary['games_per_second'] > 0
+
+
+if __name__ == "__main__":
+    for test in (test_sweep_limits_concurrency, test_sweep_uses_batch_api_for_async_providers,
+                 test_sweep_keeps_event_loop_responsive,
+                 test_rate_limiter_spacing, test_sweep_report):
+        test()
+        print(f"✅ {test.__name__}")
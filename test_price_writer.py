@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the bulk sweep write path (in-memory database, no network needed)
+"""
+
+import asyncio
+import threading
+
+from sqlalchemy import event
+
+from bot.core.price_writer import PriceWriter, GAME_REF_COLUMNS, load_game_refs
+from bot.scheduler import PriceChecker
+from models.models import User, Game, UserWishlist, PriceHistory, Notification
+
+
+def game_info(price, currency="USD"):
+    return {'current_price': price, 'original_price': 59.99, 'discount_percent': 50, 'currency': currency}
+
+
+def test_writer_flushes_in_chunks(db):
+    """Results are written and committed chunk by chunk, with history only for priced games"""
+    db.add_all([Game(source_id=f"game-{i}", title=f"Game {i}") for i in range(5)])
+    db.commit()
+    ids = [game.id for game in load_game_refs(db.query(*GAME_REF_COLUMNS))]
+
+    writer = PriceWriter(db, chunk_size=2)
+    for game_id in ids[:4]:
+        writer.add(game_id, game_info(19.99))
+    writer.add(ids[4], game_info(None))
+    assert writer.chunks == 2  # two full chunks written, one game still buffered
+    writer.flush()
+
+    assert writer.chunks == 3
+    assert writer.games_written == 5
+    assert writer.history_written == 4
+    assert db.query(PriceHistory).count() == 4
+    game = db.get(Game, ids[0])
+    assert (game.last_price_cents, game.original_price_cents, game.currency) == (1999, 5999, "USD")
+    assert game.last_checked is not None
+
+
+def test_sweep_results_go_through_bulk_writer(db):
+    """A sweep stores prices in bulk and still fires alerts"""
+    user = User(telegram_id=42)
+    cheap = Game(source_id="cheap", title="Cheap", currency="EUR")
+    pricey = Game(source_id="pricey", title="Pricey", currency="EUR")
+    db.add_all([user, cheap, pricey])
+    db.flush()
+    db.add(UserWishlist(user_id=user.id, game_id=cheap.id, desired_price_cents=1500))
+    db.add(UserWishlist(user_id=user.id, game_id=pricey.id, desired_price_cents=1500))
+    db.commit()
+
+    checker = PriceChecker()
+    prices = {"cheap": game_info(9.99, "EUR"), "pricey": game_info(39.99, "EUR")}
+
+    async def fake_sweep(targets):
+        for key, source_id, region in targets:
+            yield key, prices.get(source_id)
+
+    checker.sweeper.sweep = fake_sweep
+    games = load_game_refs(db.query(*GAME_REF_COLUMNS))
+    threads = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: threads.append(threading.get_ident()))
+    summary = asyncio.run(checker._check_games(db, games))
+    assert threads and threading.get_ident() not in threads  # writes and matching ran off the event loop
+    db.commit()
+
+    assert summary['fetched'] == 2
+    assert db.get(Game, cheap.id).last_price_cents == 999
+    assert db.get(Game, pricey.id).last_price_cents == 3999
+    assert db.query(PriceHistory).count() == 2
+    assert [n.game_id for n in db.query(Notification).all()] == [cheap.id]
+
+
+def test_failed_chunk_is_dropped(db):
+    """A chunk that fails to write is not retried by the next flush of the same sweep"""
+    db.add(Game(source_id="zelda", title="Zelda"))
+    db.commit()
+    game_id = db.query(Game.id).scalar()
+    writer = PriceWriter(db, chunk_size=10)
+    writer.add(game_id, game_info(19.99))
+    writer.add(None, game_info(9.99))  # no such row to update
+    try:
+        writer.flush()
+        failed = False
+    except Exception:
+        failed = True
+    assert failed and writer.chunks == 0
+
+    writer.add(game_id, game_info(14.99))
+    writer.flush()
+    assert writer.chunks == 1 and writer.games_written == 1
+    assert db.get(Game, game_id).last_price_cents == 1499
+
+
+if __name__ == "__main__":
+    from conftest import run
+
+    for test in (test_writer_flushes_in_chunks, test_sweep_results_go_through_bulk_writer,
+                 test_failed_chunk_is_dropped):
+        run(test)
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Query-plan checks: the hot queries must be served by indexes, not table scans (in-memory SQLite)
+"""
+
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from bot.core.alert_matcher import AlertMatcher
+from models.models import (Base, User, Game, UserWishlist, UserPremiumPurchase, PriceHistory,
+                           Notification, GameCheckSchedule, DealRanking)
+from models.schema import ensure_indexes
+
+
+def plan(db, query) -> list:
+    """EXPLAIN QUERY PLAN detail lines for an ORM query"""
+    sql = str(query.statement.compile(bind=db.get_bind(), compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def assert_indexed(db, query, table):
+    """Every step touching the table is an index SEARCH; any SCAN, even of a covering index, reads every row"""
+    steps = [step for step in plan(db, query) if f" {table} " in f" {step} "]
+    assert steps, f"{table} not in plan"
+    for step in steps:
+        assert step.startswith("SEARCH ") and "USING" in step, f"full scan of {table}: {step}"
+
+
+def test_user_and_wishlist_lookups(db):
+    """Handlers: user by telegram_id, then the wishlist by user_id / (user_id, game_id)"""
+    assert_indexed(db, db.query(User).filter(User.telegram_id == 42), "users")
+    assert_indexed(db, db.query(UserWishlist).filter(UserWishlist.user_id == 1), "user_wishlist")
+    assert_indexed(db, db.query(UserWishlist).filter(UserWishlist.user_id == 1, UserWishlist.game_id == 2),
+                   "user_wishlist")
+    assert_indexed(db, db.query(UserWishlist).filter(UserWishlist.game_id == 2), "user_wishlist")
+    assert_indexed(db, db.query(UserPremiumPurchase).filter(UserPremiumPurchase.user_id == 1,
+                                                            UserPremiumPurchase.expires_at > datetime(2026, 1, 1)),
+                   "user_premium_purchases")
+
+
+def test_game_history_and_notification_lookups(db):
+    """Game by source_id, a game's history in time order, a user's latest notifications"""
+    assert_indexed(db, db.query(Game).filter(Game.source_id == "zelda"), "games")
+    assert_indexed(db, db.query(Game).filter(Game.source_id == "zelda", Game.currency == "USD"), "games")
+    assert_indexed(db, db.query(PriceHistory).filter(PriceHistory.game_id == 1)
+                   .order_by(PriceHistory.recorded_at), "price_history")
+    assert_indexed(db, db.query(PriceHistory.game_id).filter(PriceHistory.recorded_at < datetime(2026, 1, 1)),
+                   "price_history")
+    assert_indexed(db, db.query(Notification).filter(Notification.user_id == 1)
+                   .order_by(Notification.sent_at.desc()), "notifications")
+
+
+def test_sweep_queries(db):
+    """Alert matching, due games and the /deals read"""
+    alert_query = AlertMatcher()._query(db).filter(UserWishlist.game_id.in_([1, 2, 3]))
+    assert_indexed(db, alert_query, "user_wishlist")
+    assert_indexed(db, db.query(GameCheckSchedule.game_id)
+                   .filter(GameCheckSchedule.next_check_at <= datetime(2026, 1, 1)), "game_check_schedule")
+    assert_indexed(db, db.query(DealRanking).filter(DealRanking.currency == "USD").order_by(DealRanking.rank),
+                   "deal_rankings")
+
+
+def test_scans_are_rejected(db):
+    """A full scan fails the check even when it reads a covering index instead of the table"""
+    for query, table in ((db.query(UserWishlist.user_id), "user_wishlist"),
+                         (db.query(Game).filter(Game.title == "Zelda"), "games")):
+        try:
+            assert_indexed(db, query, table)
+        except AssertionError as e:
+            assert "full scan" in str(e)
+        else:
+            assert False, f"scan of {table} accepted"
+
+
+def test_ensure_indexes_upgrades_existing_database():
+    """Missing indexes are added to an old database after merging the rows that would violate them"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for name in ("uq_games_source_currency", "uq_user_wishlist_user_game", "ix_price_history_game_recorded"):
+            conn.execute(text(f"DROP INDEX {name}"))
+    db = sessionmaker(bind=engine)()
+    user = User(telegram_id=1)
+    first, second = Game(source_id="zelda", title="Zelda", currency="USD"), \
+        Game(source_id="zelda", title="Zelda", currency="USD")
+    db.add_all([user, first, second])
+    db.flush()
+    db.add_all([UserWishlist(user_id=user.id, game_id=first.id), UserWishlist(user_id=user.id, game_id=second.id),
+                PriceHistory(game_id=second.id, price_cents=1000, currency="USD")])
+    db.commit()
+    first_id = first.id
+    db.close()
+
+    with engine.begin() as conn:
+        assert ensure_indexes(conn) == 3
+    with engine.begin() as conn:
+        assert ensure_indexes(conn) == 0
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT id FROM games")).scalars().all() == [first_id]
+        assert conn.execute(text("SELECT game_id FROM user_wishlist")).scalars().all() == [first_id]
+        assert conn.execute(text("SELECT game_id FROM price_history")).scalars().all() == [first_id]
+
+
+if __name__ == "__main__":
+    from conftest import run
+
+    for test in (test_user_and_wishlist_lookups, test_game_history_and_notification_lookups,
+                 test_sweep_queries, test_scans_are_rejected, test_ensure_indexes_upgrades_existing_database):
+        run(test)
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Offline regression tests for the DekuDeals scraper, using the recorded pages in fixtures/dekudeals
+
+Run `python test_scraper.py --update` to regenerate fixtures/dekudeals/expected.json
+after an intended parser change.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+from benchmarks.fixture_server import FIXTURES_DIR, REGIONS, FixtureServer
+from benchmarks.bench_scraper import CURRENCIES, SEARCH_QUERIES, item_ids, read_fixture
+from providers.deku_deals_parser import DekuDealsParser, LXML_AVAILABLE
+from providers.deku_deals_provider import AsyncDekuDealsProvider
+from providers.http_cache import HttpValidatorCache
+from providers.parse_pool import ParsePool
+
+EXPECTED_PATH = os.path.join(FIXTURES_DIR, "expected.json")
+BASE_URL = "https://www.dekudeals.com"
+
+
+def parse_fixtures(parser: DekuDealsParser) -> dict:
+    """Parse every recorded page the way the provider does"""
+    result = {}
+    for region in REGIONS:
+        currency = CURRENCIES[region]
+        search_page = read_fixture(region, "search.html")
+        result[region] = {
+            "search": {query: parser.parse_search_results(search_page, query, currency) for query in SEARCH_QUERIES},
+            "deals": parser.parse_listing(read_fixture(region, "deals.html"), currency),
+            "items": {
+                game_id: parser.parse_game_page(
+                    read_fixture(region, f"item_{game_id}.html"), game_id, currency, f"{BASE_URL}/items/{game_id}"
+                )
+                for game_id in item_ids(region)
+            }
+        }
+    return result
+
+
+def load_expected() -> dict:
+    with open(EXPECTED_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def localize(value, base_url: str):
+    """Rewrite recorded URLs to point at the local fixture server"""
+    return json.loads(json.dumps(value).replace(BASE_URL, base_url))
+
+
+def test_every_parser_backend_matches_expected():
+    """All backend/mode combinations return the recorded results"""
+    expected = load_expected()
+    backends = ["html.parser"] + (["lxml"] if LXML_AVAILABLE else [])
+    for backend in backends:
+        for selective in (False, True):
+            parser = DekuDealsParser(BASE_URL, backend=backend, selective=selective)
+            assert parse_fixtures(parser) == expected, f"{backend} (selective={selective}) differs"
+
+
+def test_parse_pool_matches_in_process():
+    """Pages parsed in worker processes, chunked, come back identical to in-process parsing"""
+    parser = DekuDealsParser(BASE_URL)
+    jobs = []
+    for region in REGIONS:
+        currency = CURRENCIES[region]
+        jobs.append(("parse_search_results", read_fixture(region, "search.html"), "zelda", currency))
+        jobs.append(("parse_listing", read_fixture(region, "deals.html"), currency))
+        for game_id in item_ids(region):
+            jobs.append(("parse_game_page", read_fixture(region, f"item_{game_id}.html"), game_id, currency,
+                         f"{BASE_URL}/items/{game_id}"))
+    expected = [getattr(parser, method)(content, *args) for method, content, *args in jobs]
+
+    async def run(pool):
+        try:
+            return await asyncio.gather(*(pool.parse(parser, method, content, *args)
+                                          for method, content, *args in jobs))
+        finally:
+            pool.shutdown()
+
+    pool = ParsePool(workers=2, chunk_size=3)
+    assert asyncio.run(run(pool)) == expected
+    assert pool.stats['pages'] == len(jobs)
+    assert pool.stats['chunks'] == -(-len(jobs) // 3)
+
+
+def test_regional_prices():
+    """Prices in every regional format are parsed"""
+    expected = load_expected()
+    for region in REGIONS:
+        deals = expected[region]["deals"]
+        assert deals, f"no deals parsed for {region}"
+        assert all(game["current_price"] is not None for game in deals)
+        assert all(game["currency"] == CURRENCIES[region] for game in deals)
+
+
+def test_provider_against_fixture_server():
+    """search_games and get_game_info work end-to-end against the local stand-in"""
+    expected = load_expected()
+
+    async def run(base_url):
+        provider = AsyncDekuDealsProvider(base_url=base_url)
+        try:
+            for region in REGIONS:
+                games = await provider.search_games("Zelda", region)
+                assert games == localize(expected[region]["search"]["zelda"], base_url)
+                for game_id in item_ids(region):
+                    info = await provider.get_game_info(game_id, region)
+                    assert info == localize(expected[region]["items"][game_id], base_url)
+            assert await provider.get_game_info("does-not-exist") is None
+        finally:
+            await provider.close()
+
+    with FixtureServer() as server:
+        asyncio.run(run(server.base_url))
+
+
+def test_provider_with_parse_pool():
+    """The provider returns the same results when parsing in worker processes"""
+    expected = load_expected()["jp"]
+
+    async def run(base_url, pool):
+        provider = AsyncDekuDealsProvider(base_url=base_url, parse_pool=pool)
+        try:
+            games = await provider.search_games("Zelda", "jp")
+            infos = await provider.get_game_infos(item_ids("jp"), "jp")
+        finally:
+            await provider.close()
+            pool.shutdown()
+        return games, infos
+
+    with FixtureServer() as server:
+        games, infos = asyncio.run(run(server.base_url, ParsePool(workers=2)))
+        assert games == localize(expected["search"]["zelda"], server.base_url)
+        assert infos == {game_id: localize(expected["items"][game_id], server.base_url)
+                         for game_id in item_ids("jp")}
+
+
+def test_batch_lookup_uses_listing_pages():
+    """get_game_infos covers listed games with one listing request and fetches only the rest"""
+    expected = load_expected()["us"]
+    listed_ids = [game["id"] for game in expected["deals"][:10]]
+    unlisted_ids = [game_id for game_id in item_ids("us") if game_id not in {g["id"] for g in expected["deals"]}]
+
+    async def run(base_url):
+        provider = AsyncDekuDealsProvider(base_url=base_url)
+        try:
+            infos = await provider.get_game_infos(listed_ids + unlisted_ids, "us")
+        finally:
+            await provider.close()
+        return infos, provider.request_count
+
+    with FixtureServer() as server:
+        infos, request_count = asyncio.run(run(server.base_url))
+
+    assert set(infos) == set(listed_ids + unlisted_ids)
+    assert all(infos[game_id] is not None for game_id in infos)
+    # /deals + /recent-drops probe + one item page per unlisted game
+    assert request_count == 2 + len(unlisted_ids)
+
+
+def test_failed_listing_is_fetched_again():
+    """A listing that failed, or covered none of an earlier batch, is fetched again on a later batch"""
+    expected = load_expected()["us"]
+    listed_ids = [game["id"] for game in expected["deals"][:10]]
+
+    class FlakyProvider(AsyncDekuDealsProvider):
+        failures = 1
+
+        async def _request(self, url, region, params=None, extra_headers=None):
+            if url.endswith("/deals") and self.failures:
+                self.failures -= 1
+                self.request_count += 1
+                raise TimeoutError("listing timed out")
+            return await super()._request(url, region, params, extra_headers)
+
+    async def run(base_url):
+        provider = FlakyProvider(base_url=base_url)
+        try:
+            await provider.get_game_infos(listed_ids, "us")
+            first_requests = provider.request_count
+            second = await provider.get_game_infos(listed_ids, "us")
+            second_requests = provider.request_count - first_requests
+
+            # Coverage from a batch that matched nothing on the page expires instead of sticking
+            provider.listing_coverage_ttl = 0
+            await provider.get_game_infos(["not-listed-1", "not-listed-2"], "us")
+            third_requests = provider.request_count
+            await provider.get_game_infos(listed_ids, "us")
+            fourth_requests = provider.request_count - third_requests
+        finally:
+            await provider.close()
+        return second, second_requests, fourth_requests
+
+    with FixtureServer() as server:
+        second, second_requests, fourth_requests = asyncio.run(run(server.base_url))
+
+    assert second == {game["id"]: localize(game, server.base_url) for game in expected["deals"][:10]}
+    # The second batch comes from /deals again instead of one item page per game
+    assert second_requests == 1
+    assert fourth_requests == 1
+
+
+def test_conditional_requests_skip_parsing():
+    """Unchanged pages come back as 304 and are not parsed again"""
+    game_id = item_ids("eu")[0]
+
+    async def run(base_url, cache):
+        provider = AsyncDekuDealsProvider(base_url=base_url, http_cache=cache)
+        try:
+            first = await provider.get_game_info(game_id, "eu")
+            second = await provider.get_game_info(game_id, "eu")
+        finally:
+            await provider.close()
+        return first, second, provider.cache_stats
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = HttpValidatorCache(os.path.join(tmp, "http_cache.db"))
+        with FixtureServer() as server:
+            first, second, stats = asyncio.run(run(server.base_url, cache))
+        cache.close()
+
+    assert first == second
+    assert stats == {'not_modified': 1, 'unchanged': 0, 'parsed': 1}
+
+
+def test_http_cache_is_versioned_and_purged():
+    """A new parser version parses pages again instead of reusing old results; stale entries are purged"""
+    game_id = item_ids("eu")[0]
+
+    async def run(base_url, cache, version):
+        provider = AsyncDekuDealsProvider(base_url=base_url, http_cache=cache)
+        provider.parser.VERSION = version
+        try:
+            await provider.get_game_info(game_id, "eu")
+        finally:
+            await provider.close()
+        return provider.cache_stats
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = HttpValidatorCache(os.path.join(tmp, "http_cache.db"))
+        with FixtureServer() as server:
+            assert asyncio.run(run(server.base_url, cache, 1))['parsed'] == 1
+            assert asyncio.run(run(server.base_url, cache, 1))['not_modified'] == 1
+            assert asyncio.run(run(server.base_url, cache, 2))['parsed'] == 1
+        assert cache.purge(3600) == 0
+        assert cache.purge(-1) == 2
+        cache.close()
+
+
+if __name__ == "__main__":
+    if "--update" in sys.argv:
+        with open(EXPECTED_PATH, "w", encoding="utf-8") as f:
+            json.dump(parse_fixtures(DekuDealsParser(BASE_URL, backend="html.parser", selective=False)),
+                      f, indent=1, ensure_ascii=False)
+        print(f"💾 Updated {EXPECTED_PATH}")
+        sys.exit(0)
+
+    for test in (test_every_parser_backend_matches_expected, test_parse_pool_matches_in_process, test_regional_prices,
+                 test_provider_against_fixture_server, test_provider_with_parse_pool,
+                 test_batch_lookup_uses_listing_pages, test_failed_listing_is_fetched_again,
+                 test_conditional_requests_skip_parsing, test_http_cache_is_versioned_and_purged):
+        test()
+        print(f"✅ {test.__name__}")
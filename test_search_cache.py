@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for the search result cache (no network needed)
+"""
+
+import asyncio
+import time
+
+from providers.search_cache import SearchCache
+
+
+def test_hit_after_miss_with_normalized_key():
+    """Queries differing only in case and spacing share one entry"""
+    cache = SearchCache(ttl=60, maxsize=10)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return [{'id': 'zelda'}]
+
+    async def run():
+        first = await cache.get_or_load("Zelda", "us", loader)
+        second = await cache.get_or_load("  zelda ", "US", loader)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == [{'id': 'zelda'}]
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_ttl_expiry_and_lru_eviction():
+    """Expired entries are reloaded and the least recently used entry is evicted"""
+    cache = SearchCache(ttl=0.05, maxsize=2)
+
+    async def loader():
+        return []
+
+    async def run():
+        await cache.get_or_load("a", "us", loader)
+        await cache.get_or_load("b", "us", loader)
+        await cache.get_or_load("a", "us", loader)  # refresh "a"
+        await cache.get_or_load("c", "us", loader)  # evicts "b"
+        assert ("b", "us") not in cache._entries
+        assert ("a", "us") in cache._entries
+        time.sleep(0.06)
+        await cache.get_or_load("a", "us", loader)
+
+    asyncio.run(run())
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['misses'] == 4
+
+
+def test_single_flight():
+    """Concurrent identical queries share one upstream fetch"""
+    cache = SearchCache(ttl=60, maxsize=10)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return [{'id': 'mario'}]
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("mario", "eu", loader) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == [{'id': 'mario'}] for result in results)
+    assert cache.stats()['coalesced'] == 9
+
+
+def test_errors_are_not_cached():
+    """A failed fetch is raised to every waiter and retried next time"""
+    cache = SearchCache(ttl=60, maxsize=10)
+    attempts = []
+
+    async def failing_loader():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        results = await asyncio.gather(
+            *(cache.get_or_load("pokemon", "us", failing_loader) for _ in range(3)),
+            return_exceptions=True
+        )
+        assert all(isinstance(result, RuntimeError) for result in results)
+        try:
+            await cache.get_or_load("pokemon", "us", failing_loader)
+        except RuntimeError:
+            pass
+
+    asyncio.run(run())
+    assert len(attempts) == 2
+
+
+if __name__ == "__main__":
+    for test in (test_hit_after_miss_with_normalized_key, test_ttl_expiry_and_lru_eviction,
+                 test_single_flight, test_errors_are_not_cached):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-update database session middleware and the session leak metric (no network needed)
+"""
+
+import asyncio
+import gc
+
+from aiogram.dispatcher.event.handler import HandlerObject
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from bot.handlers.middleware import DbSessionMiddleware
+from models.database import TrackedSession, session_stats
+
+
+def make_middleware():
+    engine = create_engine("sqlite://")
+    write = sessionmaker(bind=engine, class_=TrackedSession)
+    read = sessionmaker(bind=engine, class_=TrackedSession)
+    return DbSessionMiddleware(write, read), write, read
+
+
+def handler_data(read_only: bool = False) -> dict:
+    async def callback(event, db):
+        return db
+    return {"handler": HandlerObject(callback, flags={"read_only": True} if read_only else {})}
+
+
+def test_session_injected_and_closed():
+    """The handler gets a session, and it is closed as soon as the handler returns"""
+    middleware, write, _ = make_middleware()
+    before = session_stats()['open_sessions']
+    seen = {}
+
+    async def handler(event, data):
+        seen['db'] = data['db']
+        seen['open'] = session_stats()['open_sessions']
+        return "done"
+
+    assert asyncio.run(middleware(handler, object(), handler_data())) == "done"
+    assert seen['open'] == before + 1
+    assert session_stats()['open_sessions'] == before
+    assert seen['db'].bind is write.kw['bind']
+
+
+def test_session_closed_when_handler_fails():
+    middleware, _, _ = make_middleware()
+    before = session_stats()['open_sessions']
+
+    async def handler(event, data):
+        raise RuntimeError("boom")
+
+    try:
+        asyncio.run(middleware(handler, object(), handler_data()))
+        assert False, "exception swallowed"
+    except RuntimeError:
+        pass
+    assert session_stats()['open_sessions'] == before
+
+
+def test_read_only_flag_uses_read_factory():
+    read_engine = create_engine("sqlite://")
+    middleware = DbSessionMiddleware(sessionmaker(bind=create_engine("sqlite://"), class_=TrackedSession),
+                                     sessionmaker(bind=read_engine, class_=TrackedSession))
+    seen = {}
+
+    async def handler(event, data):
+        seen['bind'] = data['db'].bind
+
+    asyncio.run(middleware(handler, object(), handler_data(read_only=True)))
+    assert seen['bind'] is read_engine
+
+
+def test_leaked_session_is_counted():
+    """A session dropped without close() shows up in the leak counter"""
+    _, write, _ = make_middleware()
+    leaked = session_stats()['sessions_leaked']
+    session = write()
+    del session
+    gc.collect()
+    assert session_stats()['sessions_leaked'] == leaked + 1
+
+    with write() as session:
+        session.connection()
+    gc.collect()
+    assert session_stats()['sessions_leaked'] == leaked + 1
+
+
+if __name__ == "__main__":
+    for test in (test_session_injected_and_closed, test_session_closed_when_handler_fails,
+                 test_read_only_flag_uses_read_factory, test_leaked_session_is_counted):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded in-memory and SQLite FSM storages (no network needed)
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.core.state_storage import BoundedMemoryStorage, SQLiteStorage
+
+SEARCH_RESULTS = [{'id': 'zelda', 'title': 'Zelda', 'current_price': 49.99, 'original_price': 69.99,
+                   'discount_percent': 29, 'currency': 'USD', 'url': 'https://example.com/zelda',
+                   'platform': 'Nintendo Switch'}]
+
+
+def key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+async def roundtrip(storage):
+    await storage.set_state(key(1), 'search_game')
+    await storage.update_data(key(1), {'search_results': SEARCH_RESULTS})
+    assert await storage.get_state(key(1)) == 'search_game'
+    assert (await storage.get_data(key(1)))['search_results'] == SEARCH_RESULTS
+
+    # Leaving the state keeps the results for the add buttons, clearing drops both
+    await storage.set_state(key(1), None)
+    assert await storage.get_state(key(1)) is None
+    assert (await storage.get_data(key(1)))['search_results'] == SEARCH_RESULTS
+    await storage.set_data(key(1), {})
+    assert await storage.get_data(key(1)) == {}
+    assert await storage.get_state(key(2)) is None
+
+
+def test_memory_roundtrip():
+    """State and data are kept per user and cleared like aiogram's MemoryStorage"""
+    storage = BoundedMemoryStorage()
+    asyncio.run(roundtrip(storage))
+    assert storage.stats()['size'] == 0
+
+
+def test_memory_expiry():
+    """Idle conversations are forgotten after the TTL"""
+    storage = BoundedMemoryStorage(ttl=0.05)
+
+    async def run():
+        await storage.set_state(key(1), 'select_game')
+        await storage.update_data(key(1), {'search_results': SEARCH_RESULTS})
+        time.sleep(0.06)
+        assert await storage.get_state(key(1)) is None
+        assert await storage.get_data(key(1)) == {}
+
+    asyncio.run(run())
+    assert storage.stats()['expired'] == 1
+
+
+def test_memory_ceiling():
+    """Least recently used users are evicted past the entry and byte limits"""
+    storage = BoundedMemoryStorage(max_entries=3)
+
+    async def fill():
+        for user_id in range(1, 5):
+            await storage.set_state(key(user_id), 'search_game')
+            if user_id == 3:
+                await storage.get_state(key(1))  # user 1 is now more recent than user 2
+
+    asyncio.run(fill())
+    assert storage.stats()['size'] == 3
+    assert storage.stats()['evictions'] == 1
+    assert asyncio.run(storage.get_state(key(2))) is None
+    assert asyncio.run(storage.get_state(key(1))) == 'search_game'
+
+    storage = BoundedMemoryStorage(max_bytes=1000)
+
+    async def fill_data():
+        for user_id in range(1, 11):
+            await storage.set_data(key(user_id), {'search_results': SEARCH_RESULTS})
+
+    asyncio.run(fill_data())
+    assert 0 < storage.stats()['bytes'] <= 1000
+    assert asyncio.run(storage.get_data(key(10)))['search_results'] == SEARCH_RESULTS
+
+
+def test_sqlite_roundtrip_and_restart():
+    """The SQLite storage behaves the same and keeps conversations across a restart"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'state.db')
+        storage = SQLiteStorage(path)
+        asyncio.run(roundtrip(storage))
+
+        asyncio.run(storage.set_state(key(3), 'set_threshold'))
+        asyncio.run(storage.update_data(key(3), {'price': 19.99}))
+        asyncio.run(storage.close())
+
+        restarted = SQLiteStorage(path)
+        assert asyncio.run(restarted.get_state(key(3))) == 'set_threshold'
+        assert asyncio.run(restarted.get_data(key(3))) == {'price': 19.99}
+        asyncio.run(restarted.close())
+
+
+def test_sqlite_expiry_and_ceiling():
+    """Expired rows are not returned and are purged along with rows past the entry limit"""
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'state.db'), ttl=0.05, max_entries=2)
+        asyncio.run(storage.set_state(key(1), 'search_game'))
+        time.sleep(0.06)
+        assert asyncio.run(storage.get_state(key(1))) is None
+
+        storage.ttl = 60
+        for user_id in range(2, 6):
+            storage._next_purge = 0
+            asyncio.run(storage.set_state(key(user_id), 'search_game'))
+        rows = storage._get_conn().execute("SELECT COUNT(*) FROM fsm_state").fetchone()[0]
+        assert rows == 2
+        assert asyncio.run(storage.get_state(key(5))) == 'search_game'
+        asyncio.run(storage.close())
+
+
+def test_sqlite_lock_waits_keep_the_loop_running():
+    """While another worker holds the state file's write lock, other updates on this loop keep being served"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'state.db')
+        storage = SQLiteStorage(path)
+
+        async def scenario():
+            await storage.get_state(key(1))
+            other_worker = sqlite3.connect(path)
+            other_worker.execute("BEGIN IMMEDIATE")
+            asyncio.get_running_loop().call_later(0.2, other_worker.rollback)
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            ticker = asyncio.create_task(tick())
+            await storage.set_state(key(1), 'search_game')
+            ticker.cancel()
+            other_worker.close()
+            assert ticks >= 10
+            assert await storage.get_state(key(1)) == 'search_game'
+            await storage.close()
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    for test in (test_memory_roundtrip, test_memory_expiry, test_memory_ceiling,
+                 test_sqlite_roundtrip_and_restart, test_sqlite_expiry_and_ceiling,
+                 test_sqlite_lock_waits_keep_the_loop_running):
+        test()
+        print(f"✅ {test.__name__}")
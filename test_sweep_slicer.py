@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the time-sliced sweep (in-memory database, no network needed)
+"""
+
+from datetime import datetime, timedelta
+
+from bot.core.sweep_slicer import SweepSlicer
+from models.models import User, Game, UserWishlist
+
+
+def add_wishlisted_games(db, count):
+    user = User(telegram_id=1)
+    db.add(user)
+    db.flush()
+    for i in range(count):
+        game = Game(source_id=f"game-{i}", title=f"Game {i}")
+        db.add(game)
+        db.flush()
+        db.add(UserWishlist(user_id=user.id, game_id=game.id))
+    db.add(Game(source_id="not-wishlisted", title="Nobody wants this"))
+    db.commit()
+
+
+def test_shards_cover_every_game_once(db):
+    """Every wishlisted game lands in exactly one shard"""
+    add_wishlisted_games(db, 25)
+    slicer = SweepSlicer(window_seconds=3600, slice_seconds=600)
+    assert slicer.shard_count == 6
+
+    seen = []
+    for shard in range(slicer.shard_count):
+        seen += [game.source_id for game in slicer.shard_games(db, shard)]
+    assert sorted(seen) == sorted(f"game-{i}" for i in range(25))
+
+
+def test_shards_are_spread_over_the_window(db):
+    """Shards only become due one slice after another, and a finished cycle waits for the window to end"""
+    add_wishlisted_games(db, 5)
+    slicer = SweepSlicer(window_seconds=3600, slice_seconds=1200)
+    start = datetime(2026, 6, 1, 9, 0)
+
+    assert slicer.next_shard(db, start) == 0
+    slicer.complete_shard(db, 0, start)
+    assert slicer.next_shard(db, start + timedelta(seconds=60)) is None
+    assert slicer.next_shard(db, start + timedelta(seconds=1200)) == 1
+    slicer.complete_shard(db, 1, start + timedelta(seconds=1200))
+    assert slicer.next_shard(db, start + timedelta(seconds=2400)) == 2
+    slicer.complete_shard(db, 2, start + timedelta(seconds=2400))
+
+    # Cycle done - nothing until the window is over, then a new cycle starts
+    assert slicer.next_shard(db, start + timedelta(seconds=3000)) is None
+    assert slicer.next_shard(db, start + timedelta(seconds=3600)) == 0
+
+
+def test_restart_resumes_where_it_stopped(db):
+    """A new slicer (e.g. after a restart) continues with the first unfinished shard"""
+    add_wishlisted_games(db, 5)
+    start = datetime(2026, 6, 1, 9, 0)
+
+    slicer = SweepSlicer(window_seconds=3600, slice_seconds=600)
+    for shard in range(3):
+        assert slicer.next_shard(db, start + timedelta(seconds=600 * shard)) == shard
+        slicer.complete_shard(db, shard, start)
+    db.commit()
+
+    restarted = SweepSlicer(window_seconds=3600, slice_seconds=600)
+    assert restarted.next_shard(db, start + timedelta(hours=2)) == 3
+
+    # Changing the window re-shards, so the cycle starts over
+    resized = SweepSlicer(window_seconds=7200, slice_seconds=600)
+    assert resized.next_shard(db, start + timedelta(hours=2)) == 0
+
+
+if __name__ == "__main__":
+    from conftest import run
+
+    for test in (test_shards_cover_every_game_once, test_shards_are_spread_over_the_window,
+                 test_restart_resumes_where_it_stopped):
+        run(test)
+        print(f"✅ {test.__name__}")